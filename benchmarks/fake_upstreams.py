@@ -0,0 +1,323 @@
+"""Local stand-ins for the OSRM ``route``/``table`` and Nominatim ``search`` endpoints.
+
+Responses are replayed from JSON fixtures in ``benchmarks/fixtures``. A missing fixture file is
+an error at startup and a request with no fixture is answered with a 500, so a benchmark never
+measures made-up upstreams by accident. With ``--record``, fixture misses are fetched from the
+real upstreams and saved, so later runs replay them offline. With ``--synthesize``, they get a
+synthesized response instead: geocodes are derived from a hash of the query, and routes and
+tables follow straight lines at 1.2x great-circle distance and 55 mph.
+
+Point the app at the stand-ins with::
+
+    OSRM_BASE_URL=http://127.0.0.1:8900 GEOCODING_BASE_URL=http://127.0.0.1:8900
+
+Usage:
+    uv run python benchmarks/fake_upstreams.py --port 8900 --latency-ms 40 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+EARTH_RADIUS_METERS = 6_371_008.8
+ROAD_FACTOR = 1.2
+METERS_PER_SECOND = 24.6  # 55 mph
+ROUTE_POINTS_PER_100_MILES = 120
+SERVICES = ("osrm", "nominatim")
+
+
+class MissingFixtureError(LookupError):
+    pass
+
+
+class FixtureStore:
+    """Recorded responses per service, keyed by the request path and query that produced them."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._fixtures: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        for service in SERVICES:
+            path = directory / f"{service}.json"
+            self._fixtures[service] = (
+                json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+            )
+
+    def missing_files(self) -> list[Path]:
+        return [
+            path
+            for path in (self.directory / f"{service}.json" for service in SERVICES)
+            if not path.exists()
+        ]
+
+    def get(self, service: str, key: str) -> Any | None:
+        return self._fixtures[service].get(key)
+
+    def entries(self, service: str) -> dict[str, Any]:
+        return dict(self._fixtures[service])
+
+    def record(self, service: str, key: str, payload: Any) -> None:
+        with self._lock:
+            self._fixtures[service][key] = payload
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{service}.json").write_text(
+                json.dumps(self._fixtures[service], indent=1, sort_keys=True) + "\n",
+                encoding="utf-8",
+            )
+
+
+class FakeUpstreams:
+    def __init__(
+        self,
+        fixtures: FixtureStore,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        record_osrm: str | None = None,
+        record_nominatim: str | None = None,
+        synthesize: bool = False,
+    ) -> None:
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.record_osrm = record_osrm
+        self.record_nominatim = record_nominatim
+        self.synthesize = synthesize
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.synthesized: Counter[str] = Counter()
+        self.missing: Counter[str] = Counter()
+
+    def handle(self, path: str, query: dict[str, list[str]]) -> tuple[int, Any]:
+        with self._rng_lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-1, 1) * self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay / 1000)
+        if fail:
+            return 503, {"message": "injected failure"}
+
+        try:
+            if path == "/search":
+                return 200, self._search(query)
+            if path.startswith("/route/v1/driving/"):
+                return 200, self._osrm("route", path, query)
+            if path.startswith("/table/v1/driving/"):
+                return 200, self._osrm("table", path, query)
+        except MissingFixtureError as exc:
+            return 500, {"message": str(exc)}
+        return 404, {"message": "not found"}
+
+    def _synthesizing(self, service: str, key: str) -> None:
+        with self._rng_lock:
+            if not self.synthesize:
+                self.missing[service] += 1
+                raise MissingFixtureError(f"No {service} fixture for {key!r}")
+            self.synthesized[service] += 1
+
+    def _search(self, query: dict[str, list[str]]) -> Any:
+        text = " ".join(query.get("q", [""])[0].lower().split())
+        recorded = self.fixtures.get("nominatim", text)
+        if recorded is not None:
+            return recorded
+        if self.record_nominatim:
+            payload = _fetch(f"{self.record_nominatim}/search", query, user_agent=True)
+            self.fixtures.record("nominatim", text, payload)
+            return payload
+        self._synthesizing("nominatim", text)
+
+        digest = hashlib.sha256(text.encode()).digest()
+        latitude = 30.0 + digest[0] / 255 * 15.0
+        longitude = -120.0 + digest[1] / 255 * 45.0
+        return [
+            {
+                "lat": f"{latitude:.6f}",
+                "lon": f"{longitude:.6f}",
+                "display_name": text,
+                "address": {"country_code": "us"},
+            }
+        ]
+
+    def _osrm(self, service: str, path: str, query: dict[str, list[str]]) -> Any:
+        key = (
+            path
+            + "?"
+            + "&".join(
+                f"{name}={query[name][0]}" for name in ("sources", "destinations") if name in query
+            )
+        )
+        recorded = self.fixtures.get("osrm", key)
+        if recorded is not None:
+            return recorded
+        if self.record_osrm:
+            payload = _fetch(f"{self.record_osrm}{path}", query)
+            self.fixtures.record("osrm", key, payload)
+            return payload
+        self._synthesizing("osrm", key)
+
+        points = [
+            tuple(float(value) for value in pair.split(","))
+            for pair in path.rsplit("/", 1)[1].split(";")
+        ]
+        if service == "route":
+            return _synthetic_route(points)
+        sources = [int(index) for index in query["sources"][0].split(";")]
+        destinations = [int(index) for index in query["destinations"][0].split(";")]
+        distances = [
+            [_road_meters(points[source], points[destination]) for destination in destinations]
+            for source in sources
+        ]
+        return {
+            "code": "Ok",
+            "distances": distances,
+            "durations": [[meters / METERS_PER_SECOND for meters in row] for row in distances],
+        }
+
+
+def _road_meters(start: tuple[float, ...], finish: tuple[float, ...]) -> float:
+    lon1, lat1, lon2, lat2 = map(math.radians, (*start, *finish))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return ROAD_FACTOR * 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def _synthetic_route(points: list[tuple[float, ...]]) -> dict[str, Any]:
+    coordinates: list[list[float]] = []
+    distance = 0.0
+    for start, finish in itertools.pairwise(points):
+        meters = _road_meters(start, finish)
+        distance += meters
+        steps = max(2, int(meters / 160_934 * ROUTE_POINTS_PER_100_MILES))
+        for step in range(steps):
+            fraction = step / steps
+            coordinates.append(
+                [
+                    round(start[0] + (finish[0] - start[0]) * fraction, 6),
+                    round(start[1] + (finish[1] - start[1]) * fraction, 6),
+                ]
+            )
+    coordinates.append([round(points[-1][0], 6), round(points[-1][1], 6)])
+    return {
+        "code": "Ok",
+        "routes": [
+            {
+                "distance": distance,
+                "duration": distance / METERS_PER_SECOND,
+                "geometry": {"type": "LineString", "coordinates": coordinates},
+            }
+        ],
+    }
+
+
+def _fetch(url: str, query: dict[str, list[str]], user_agent: bool = False) -> Any:
+    import httpx
+
+    headers = {"User-Agent": "fuel-route-planner-fixture-recorder"} if user_agent else {}
+    params = {name: values[0] for name, values in query.items()}
+    response = httpx.get(url, params=params, headers=headers, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def make_server(upstreams: FakeUpstreams, host: str, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            parts = urlsplit(self.path)
+            status, payload = upstreams.handle(parts.path, parse_qs(parts.query))
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_upstream_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Fetch fixture misses from the public OSRM/Nominatim servers and save them",
+    )
+    parser.add_argument(
+        "--synthesize",
+        action="store_true",
+        help="Answer fixture misses with synthetic straight-line responses instead of a 500",
+    )
+
+
+def require_fixtures(
+    parser: argparse.ArgumentParser, args: argparse.Namespace, fixtures: FixtureStore
+) -> None:
+    missing = fixtures.missing_files()
+    if missing and not (args.record or args.synthesize):
+        parser.error(
+            f"missing fixtures {', '.join(str(path) for path in missing)}; "
+            "record them with --record or pass --synthesize to fake the misses"
+        )
+
+
+def recording_upstreams(record: bool) -> dict[str, str | None]:
+    return {
+        "record_osrm": "https://router.project-osrm.org" if record else None,
+        "record_nominatim": "https://nominatim.openstreetmap.org" if record else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=0)
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    fixtures = FixtureStore(args.fixtures)
+    require_fixtures(parser, args, fixtures)
+    upstreams = FakeUpstreams(
+        fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        synthesize=args.synthesize,
+        **recording_upstreams(args.record),
+    )
+    server = make_server(upstreams, args.host, args.port)
+    print(f"Fake OSRM/Nominatim listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Time fuel price imports across write paths and feed sizes.
+
+Each size gets a fresh SQLite database. Every mode is timed twice: a cold import into
+an empty table, then a re-import of the same feed with ~1% of prices changed, which is
+the shape of the nightly refresh.
+
+Usage:
+    uv run python benchmarks/import_upsert.py --rows 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+MODES: dict[str, dict[str, object]] = {
+    "orm": {},
+    "orm-stream": {"stream": True},
+    "upsert": {"upsert": True},
+    "upsert-stream": {"upsert": True, "stream": True},
+}
+HEADER = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+STATES = ("TX", "OK", "CA", "NV", "IL", "OH", "GA", "FL", "NY", "PA")
+
+
+def write_feed(path: Path, rows: int, seed: int, changed_fraction: float = 0.0) -> None:
+    rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(HEADER + "\n")
+        for index in range(rows):
+            price = round(rng.uniform(2.8, 5.2), 3)
+            if changed_fraction and change_rng.random() < changed_fraction:
+                price = round(price + 0.05, 3)
+            handle.write(
+                f"{index},Stop {index},{index} Main St,City {index % 997},"
+                f"{STATES[index % len(STATES)]},{index % 300},{price}\n"
+            )
+
+
+def run_import(csv_path: Path, options: dict[str, object]) -> float:
+    from django.core.management import call_command
+
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        call_command("import_fuel_prices", csv_path=str(csv_path), **options)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["SQLITE_DB_PATH"] = str(Path(workdir) / "bench.sqlite3")
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command("migrate", verbosity=0)
+
+        from route_planner.models import FuelStation
+
+        print("rows\tmode\tcold_import_s\treimport_1pct_changed_s")
+        for rows in args.rows:
+            initial = Path(workdir) / f"feed-{rows}.csv"
+            refreshed = Path(workdir) / f"feed-{rows}-refresh.csv"
+            write_feed(initial, rows, args.seed)
+            write_feed(refreshed, rows, args.seed, changed_fraction=0.01)
+
+            for mode in args.modes:
+                FuelStation.objects.all().delete()
+                try:
+                    cold = f"{run_import(initial, MODES[mode]):.3f}"
+                    warm = f"{run_import(refreshed, MODES[mode]):.3f}"
+                except Exception as exc:
+                    cold = warm = f"error: {type(exc).__name__}"
+                print(f"{rows}\t{mode}\t{cold}\t{warm}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
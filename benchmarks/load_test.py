@@ -0,0 +1,260 @@
+"""Drive POST /api/v1/route-plan through the local fake upstreams under a concurrency sweep.
+
+Starts the fake OSRM/Nominatim server in-process. Migrates a temporary SQLite database and
+seeds it with stations, then serves the app with gunicorn (or ``runserver``). Each concurrency
+level sends ``--requests`` plans for seeded random lanes between the fixture cities. Plan,
+route, geocode and candidate caches are disabled unless ``--cache`` is given, so every request
+pays the full upstream path.
+
+Output is one TSV row per level: throughput, status counts, and latency percentiles in ms.
+Fixture misses fail the run unless ``--record`` fetches them from the public servers into the
+fixtures or ``--synthesize`` fakes them; either way they are counted on stderr at the end.
+
+Usage:
+    uv run python benchmarks/load_test.py --concurrency 1 4 16 --requests 200 \\
+        --latency-ms 40 --error-rate 0.01 --workers 2 --threads 4 --synthesize
+    uv run python benchmarks/load_test.py --target http://127.0.0.1:8000  # existing server
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+from fake_upstreams import (
+    FakeUpstreams,
+    FixtureStore,
+    add_upstream_arguments,
+    make_server,
+    recording_upstreams,
+    require_fixtures,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(env: dict[str, str], stations: int, seed: int) -> None:
+    script = f"""
+import random
+import django
+django.setup()
+from django.core.management import call_command
+call_command("migrate", verbosity=0)
+from route_planner.models import FuelStation
+from route_planner.services.data_version import bump_station_data_version
+rng = random.Random({seed})
+FuelStation.objects.bulk_create(
+    [
+        FuelStation(
+            opis_truckstop_id=index,
+            truckstop_name=f"Stop {{index}}",
+            address=f"{{index}} Interstate Hwy",
+            city="City",
+            state="TX",
+            retail_price=round(rng.uniform(2.8, 5.2), 3),
+            canonical_key=f"{{index}} INTERSTATE HWY|CITY|TX",
+            latitude=rng.uniform(25, 49),
+            longitude=rng.uniform(-124, -67),
+        )
+        for index in range({stations})
+    ],
+    batch_size=5000,
+)
+bump_station_data_version()
+"""
+    subprocess.run([sys.executable, "-c", script], env=env, cwd=ROOT / "src", check=True)
+
+
+def start_app(env: dict[str, str], args: argparse.Namespace, port: int) -> subprocess.Popen:
+    if args.server == "gunicorn":
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "python:config.gunicorn",
+            "config.wsgi:application",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(args.workers),
+            "--threads",
+            str(args.threads),
+        ]
+    else:
+        command = [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"]
+    process = subprocess.Popen(
+        command, env=env, cwd=ROOT / "src", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/v1/health", timeout=1).is_success:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{args.server} did not become healthy on port {port}")
+
+
+def lanes(count: int, seed: int, fixtures: FixtureStore) -> list[dict[str, str]]:
+    cities = sorted(
+        query
+        for query, results in fixtures.entries("nominatim").items()
+        if results and results[0].get("address", {}).get("country_code") == "us"
+    )
+    rng = random.Random(seed)
+    return [
+        dict(zip(("start_location", "finish_location"), rng.sample(cities, 2), strict=True))
+        for _ in range(count)
+    ]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[max(0, math.ceil(len(values) * fraction) - 1)]
+
+
+def run_level(base_url: str, bodies: list[dict[str, str]], concurrency: int) -> str:
+    local = threading.local()
+
+    def send(body: dict[str, str]) -> tuple[int, float]:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base_url, timeout=120)
+        started = time.perf_counter()
+        try:
+            status = client.post("/api/v1/route-plan", content=json.dumps(body)).status_code
+        except httpx.HTTPError:
+            status = 0
+        return status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, bodies))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    other = sum(count for status, count in statuses.items() if status not in (200, 503))
+    return "\t".join(
+        str(value)
+        for value in (
+            concurrency,
+            len(results),
+            f"{len(results) / elapsed:.1f}",
+            statuses[200],
+            statuses[503],
+            other,
+            f"{percentile(latencies, 0.50):.1f}",
+            f"{percentile(latencies, 0.90):.1f}",
+            f"{percentile(latencies, 0.99):.1f}",
+            f"{latencies[-1]:.1f}",
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per level")
+    parser.add_argument("--target", help="Base URL of an already running app; skips setup")
+    parser.add_argument("--server", choices=("gunicorn", "runserver"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--stations", type=int, default=8_000)
+    parser.add_argument("--cache", action="store_true", help="Keep application caches enabled")
+    parser.add_argument("--seed", type=int, default=3)
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    fixtures = FixtureStore(args.fixtures)
+    bodies = lanes(args.requests, args.seed, fixtures)
+    header = (
+        "concurrency\trequests\trps\tok\tstatus_503\tother_errors\tp50_ms\tp90_ms\tp99_ms\tmax_ms"
+    )
+
+    if args.target:
+        print(header, flush=True)
+        for concurrency in args.concurrency:
+            print(run_level(args.target.rstrip("/"), bodies, concurrency), flush=True)
+        return
+
+    require_fixtures(parser, args, fixtures)
+    upstream_port = free_port()
+    upstreams = FakeUpstreams(
+        fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        synthesize=args.synthesize,
+        **recording_upstreams(args.record),
+    )
+    upstream_server = make_server(upstreams, "127.0.0.1", upstream_port)
+    threading.Thread(target=upstream_server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        upstream_url = f"http://127.0.0.1:{upstream_port}"
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT / "src"),
+            "DJANGO_SETTINGS_MODULE": "config.settings",
+            "DJANGO_DEBUG": "0",
+            "DJANGO_ALLOWED_HOSTS": "127.0.0.1,localhost",
+            "SQLITE_DB_PATH": str(Path(workdir) / "load.sqlite3"),
+            "OSRM_BASE_URL": upstream_url,
+            "GEOCODING_BASE_URL": upstream_url,
+        }
+        if not args.cache:
+            for name in (
+                "PLAN_CACHE_TTL_SECONDS",
+                "CANDIDATE_CACHE_TTL_SECONDS",
+                "ROUTE_CACHE_TTL_SECONDS",
+                "GEOCODE_CACHE_TTL_SECONDS",
+            ):
+                env[name] = "0"
+
+        seed_database(env, args.stations, args.seed)
+        app_port = free_port()
+        app = start_app(env, args, app_port)
+        try:
+            print(header, flush=True)
+            for concurrency in args.concurrency:
+                print(run_level(f"http://127.0.0.1:{app_port}", bodies, concurrency), flush=True)
+        finally:
+            app.terminate()
+            app.wait(timeout=10)
+            upstream_server.shutdown()
+            for service, count in sorted(upstreams.synthesized.items()):
+                print(f"{count} {service} responses synthesized (no fixture)", file=sys.stderr)
+            for service, count in sorted(upstreams.missing.items()):
+                print(f"{count} {service} requests failed (no fixture)", file=sys.stderr)
+    if upstreams.missing:
+        raise SystemExit("Fixture misses answered with 500s; record them or pass --synthesize")
+
+
+if __name__ == "__main__":
+    main()
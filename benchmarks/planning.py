@@ -0,0 +1,295 @@
+"""Time station selection and fuel optimization across route, station and candidate sizes.
+
+Every input is synthetic and seeded, so two runs with the same arguments time the same work.
+Selection runs against a temporary SQLite database for each station count. It crosses every
+route length with every backend, and the candidate cache is disabled. Optimization runs each
+optimizer over candidate lists spread along a 1,500 mile route.
+
+Results are one row per case, as TSV (default) or JSON lines (``--format json``). Each row
+carries the git commit, so outputs from different commits can be concatenated and compared.
+
+The default grid finishes in a few minutes. Selection cost grows with stations inside the
+route's bounding box, so the 100k station set is opt-in.
+
+Usage:
+    uv run python benchmarks/planning.py
+    uv run python benchmarks/planning.py --route-points 500 20000 --stations 1000 100000 \\
+        --candidates 10 2000 --format json > planning-$(git rev-parse --short HEAD).jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ["CANDIDATE_CACHE_TTL_SECONDS"] = "0"
+
+COLUMNS = (
+    "commit",
+    "suite",
+    "stage",
+    "variant",
+    "route_points",
+    "stations",
+    "candidates",
+    "runs",
+    "median_ms",
+    "p95_ms",
+    "min_ms",
+    "result",
+)
+ROUTE_DISTANCE_MILES = 1500.0
+
+
+def synthetic_route(points: int, seed: int) -> list[tuple[float, float]]:
+    """A gently winding west-to-east polyline of roughly 2,000 miles."""
+    rng = random.Random(seed)
+    base_lat = rng.uniform(33.0, 41.0)
+    phase = rng.uniform(0, math.pi)
+    route = []
+    for index in range(points):
+        fraction = index / (points - 1)
+        longitude = -118.0 + 40.0 * fraction
+        latitude = base_lat + 2.0 * math.sin(phase + fraction * 3 * math.pi)
+        route.append(
+            (
+                round(longitude + rng.uniform(-0.002, 0.002), 6),
+                round(latitude + rng.uniform(-0.002, 0.002), 6),
+            )
+        )
+    return route
+
+
+def populate_stations(count: int, seed: int) -> None:
+    """Scatter stations over the continental US with a fifth clustered along route corridors."""
+    from route_planner.models import FuelStation
+
+    rng = random.Random(seed)
+    corridor = synthetic_route(2_000, seed)
+    FuelStation.objects.all().delete()
+    stations = []
+    for index in range(count):
+        if rng.random() < 0.2:
+            longitude, latitude = rng.choice(corridor)
+            latitude += rng.uniform(-0.15, 0.15)
+            longitude += rng.uniform(-0.15, 0.15)
+        else:
+            latitude, longitude = rng.uniform(25, 49), rng.uniform(-124, -67)
+        stations.append(
+            FuelStation(
+                opis_truckstop_id=index,
+                truckstop_name=f"Stop {index}",
+                address=f"{index} Main St",
+                city="City",
+                state="TX",
+                retail_price=round(rng.uniform(2.8, 5.2), 3),
+                canonical_key=f"{index} MAIN ST|CITY|TX",
+                latitude=latitude,
+                longitude=longitude,
+            )
+        )
+    FuelStation.objects.bulk_create(stations, batch_size=5_000)
+
+
+def synthetic_candidates(count: int, seed: int) -> list[Any]:
+    from route_planner.services.types import CandidateStation
+
+    rng = random.Random(seed)
+    spacing = ROUTE_DISTANCE_MILES / count
+    return [
+        CandidateStation(
+            station_id=index,
+            station_name=f"Stop {index}",
+            address=f"{index} Main St",
+            city="City",
+            state="TX",
+            latitude=30.0,
+            longitude=-97.0,
+            price_per_gallon=round(rng.uniform(2.8, 5.2), 3),
+            milepost=(index + rng.random()) * spacing,
+            distance_from_route_miles=rng.uniform(0, 8),
+        )
+        for index in range(count)
+    ]
+
+
+def time_runs(function: Callable[[], Any], runs: int) -> tuple[list[float], Any]:
+    result = function()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings, result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Reporter:
+    def __init__(self, output_format: str, commit: str) -> None:
+        self.output_format = output_format
+        self.commit = commit
+        if output_format == "tsv":
+            print("\t".join(COLUMNS), flush=True)
+
+    def row(self, timings: list[float], **fields: Any) -> None:
+        record = {column: fields.get(column) for column in COLUMNS}
+        record.update(
+            commit=self.commit,
+            runs=len(timings),
+            median_ms=round(statistics.median(timings), 3),
+            p95_ms=round(timings[max(0, math.ceil(len(timings) * 0.95) - 1)], 3),
+            min_ms=round(timings[0], 3),
+        )
+        if self.output_format == "json":
+            print(json.dumps(record), flush=True)
+        else:
+            values = ("-" if record[column] is None else str(record[column]) for column in COLUMNS)
+            print("\t".join(values), flush=True)
+
+
+def bench_selection(args: argparse.Namespace, reporter: Reporter) -> None:
+    from route_planner.services import station_index
+    from route_planner.services.station_index import StationSnapshotProvider
+    from route_planner.services.station_selection import StationSelector
+    from route_planner.services.types import BoundingBox
+
+    for station_count in args.stations:
+        populate_stations(station_count, args.seed)
+        station_index._snapshot_provider = StationSnapshotProvider(check_interval_seconds=3600)
+        station_index._snapshot_provider.current()
+        for route_points in args.route_points:
+            route = synthetic_route(route_points, args.seed)
+            margin = args.corridor_miles / 69.0
+            bbox = BoundingBox(
+                min_latitude=min(lat for _, lat in route) - margin,
+                max_latitude=max(lat for _, lat in route) + margin,
+                min_longitude=min(lon for lon, _ in route) - margin,
+                max_longitude=max(lon for lon, _ in route) + margin,
+            )
+            for backend in args.backends:
+                selector = StationSelector(backend=backend)
+                timings, rows = time_runs(
+                    lambda selector=selector, bbox=bbox: sum(
+                        1 for _ in selector._stations_in_bbox(bbox)
+                    ),
+                    args.runs,
+                )
+                reporter.row(
+                    timings,
+                    suite="selection",
+                    stage="stations_in_bbox",
+                    variant=backend,
+                    route_points=route_points,
+                    stations=station_count,
+                    result=f"{rows} rows",
+                )
+                timings, candidates = time_runs(
+                    lambda selector=selector, route=route: selector.select_candidate_stations(
+                        route, args.corridor_miles
+                    ),
+                    args.runs,
+                )
+                reporter.row(
+                    timings,
+                    suite="selection",
+                    stage="select_candidates",
+                    variant=backend,
+                    route_points=route_points,
+                    stations=station_count,
+                    result=f"{len(candidates)} candidates",
+                )
+
+
+def bench_optimization(args: argparse.Namespace, reporter: Reporter) -> None:
+    from route_planner.exceptions import NoFeasibleFuelPlanError
+    from route_planner.services.optimization import optimize_fuel_plan
+
+    for candidate_count in args.candidates:
+        candidates = synthetic_candidates(candidate_count, args.seed)
+        for optimizer in args.optimizers:
+
+            def run(candidates: list[Any] = candidates, optimizer: str = optimizer) -> str:
+                try:
+                    result = optimize_fuel_plan(
+                        candidates=candidates,
+                        route_distance_miles=ROUTE_DISTANCE_MILES,
+                        start_fuel_gallons=25.0,
+                        mpg=10.0,
+                        tank_capacity_gallons=50.0,
+                        max_range_miles=500.0,
+                        optimizer=optimizer,
+                    )
+                except NoFeasibleFuelPlanError:
+                    return "infeasible"
+                return f"{result.optimizer_used}: {len(result.stops)} stops"
+
+            timings, outcome = time_runs(run, args.runs)
+            reporter.row(
+                timings,
+                suite="optimization",
+                stage="optimize",
+                variant=optimizer,
+                candidates=candidate_count,
+                result=outcome,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=("all", "selection", "optimization"), default="all")
+    parser.add_argument("--route-points", type=int, nargs="+", default=[500, 5_000, 20_000])
+    parser.add_argument("--stations", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 100, 500, 2_000])
+    parser.add_argument("--backends", nargs="+", default=["database", "rtree", "memory"])
+    parser.add_argument("--optimizers", nargs="+", default=["baseline", "ortools"])
+    parser.add_argument("--corridor-miles", type=float, default=8.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--format", choices=("tsv", "json"), default="tsv")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["SQLITE_DB_PATH"] = str(Path(workdir) / "bench.sqlite3")
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command("migrate", verbosity=0)
+
+        reporter = Reporter(args.format, git_commit())
+        if args.suite in ("all", "optimization"):
+            bench_optimization(args, reporter)
+        if args.suite in ("all", "selection"):
+            bench_selection(args, reporter)
+
+
+if __name__ == "__main__":
+    main()
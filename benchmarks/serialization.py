@@ -0,0 +1,129 @@
+"""Microbenchmark RoutePlanResponse construction and serialization on long routes.
+
+Compares the previous path (validated models, ``model_dump(mode="json")`` re-encoded by
+the stdlib ``json`` module, as ``JsonResponse`` did) with the current one
+(``model_construct`` plus ``model_dump_json`` straight to bytes).
+
+Usage:
+    uv run python benchmarks/serialization.py --points 5000 20000 80000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import timeit
+from functools import partial
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from route_planner.schemas import (  # noqa: E402
+    Coordinate,
+    FuelStopResponse,
+    RoutePlanResponse,
+    RouteSummaryResponse,
+)
+
+
+def build_fields(points: int, stops: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    coordinates = [
+        (
+            round(-97.7 + index * 0.0004 + rng.uniform(-1e-4, 1e-4), 6),
+            round(30.2 + index * 0.0002, 6),
+        )
+        for index in range(points)
+    ]
+    stop_fields = [
+        {
+            "station_id": index,
+            "station_name": f"Stop {index}",
+            "address": f"{index} Interstate Hwy",
+            "city": "Somewhere",
+            "state": "TX",
+            "latitude": 30.0 + index,
+            "longitude": -97.0 - index,
+            "milepost": round(rng.uniform(0, 2000), 3),
+            "distance_from_route_miles": round(rng.uniform(0, 8), 3),
+            "price_per_gallon": round(rng.uniform(2.8, 5.2), 3),
+            "gallons_purchased": round(rng.uniform(5, 50), 3),
+            "cost": round(rng.uniform(20, 250), 2),
+            "fuel_before_gallons": round(rng.uniform(0, 10), 3),
+            "fuel_after_gallons": round(rng.uniform(10, 50), 3),
+        }
+        for index in range(stops)
+    ]
+    return {
+        "coordinates": coordinates,
+        "stops": stop_fields,
+        "summary": {
+            "distance_miles": 2000.0,
+            "duration_minutes": 1800.0,
+            "total_gallons_purchased": 150.0,
+            "total_fuel_cost": 520.0,
+            "estimated_fuel_needed_gallons": 200.0,
+        },
+    }
+
+
+def build_validated(fields: dict) -> RoutePlanResponse:
+    return RoutePlanResponse(
+        start=Coordinate(latitude=30.2, longitude=-97.7),
+        finish=Coordinate(latitude=41.8, longitude=-87.6),
+        optimizer_used="baseline",
+        route_geojson={"type": "LineString", "coordinates": fields["coordinates"]},
+        route_with_stops_geojson={"type": "LineString", "coordinates": fields["coordinates"]},
+        stops=[FuelStopResponse(**stop) for stop in fields["stops"]],
+        summary=RouteSummaryResponse(**fields["summary"]),
+        assumptions={"vehicle_mpg": 10.0},
+    )
+
+
+def build_constructed(fields: dict) -> RoutePlanResponse:
+    return RoutePlanResponse.model_construct(
+        start=Coordinate.model_construct(latitude=30.2, longitude=-97.7),
+        finish=Coordinate.model_construct(latitude=41.8, longitude=-87.6),
+        optimizer_used="baseline",
+        route_geojson={"type": "LineString", "coordinates": fields["coordinates"]},
+        route_with_stops_geojson={"type": "LineString", "coordinates": fields["coordinates"]},
+        stops=[FuelStopResponse.model_construct(**stop) for stop in fields["stops"]],
+        summary=RouteSummaryResponse.model_construct(**fields["summary"]),
+        assumptions={"vehicle_mpg": 10.0},
+    )
+
+
+def legacy_bytes(fields: dict) -> bytes:
+    return json.dumps(build_validated(fields).model_dump(mode="json")).encode()
+
+
+def fast_bytes(fields: dict) -> bytes:
+    return build_constructed(fields).model_dump_json().encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[5_000, 20_000, 80_000])
+    parser.add_argument("--stops", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    print("route_points\tpath\tms_per_response\tbytes")
+    for points in args.points:
+        fields = build_fields(points, args.stops, args.seed)
+        paths = {
+            "model_dump+json.dumps": partial(legacy_bytes, fields),
+            "model_construct+model_dump_json": partial(fast_bytes, fields),
+        }
+        for name, run in paths.items():
+            body = run()
+            seconds = min(timeit.repeat(run, number=1, repeat=args.repeat))
+            print(f"{points}\t{name}\t{seconds * 1000:.2f}\t{len(body)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
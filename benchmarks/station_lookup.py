@@ -0,0 +1,120 @@
+"""Compare station bbox lookups across StationSelector backends.
+
+Stations are scattered over the continental US. Query boxes follow synthetic
+interstate-like corridors, so some are long and thin in one axis. That shape is
+where a one-dimensional latitude index falls back to scanning.
+
+Usage:
+    uv run python benchmarks/station_lookup.py --stations 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+BACKENDS = ("database", "rtree", "memory")
+
+
+def populate(count: int, seed: int) -> None:
+    from route_planner.models import FuelStation
+
+    rng = random.Random(seed)
+    FuelStation.objects.all().delete()
+    FuelStation.objects.bulk_create(
+        (
+            FuelStation(
+                opis_truckstop_id=index,
+                truckstop_name=f"Stop {index}",
+                address=f"{index} Main St",
+                city="City",
+                state="TX",
+                retail_price=round(rng.uniform(2.8, 5.2), 3),
+                canonical_key=f"{index} MAIN ST|CITY|TX",
+                latitude=rng.uniform(25.0, 49.0),
+                longitude=rng.uniform(-124.0, -67.0),
+            )
+            for index in range(count)
+        ),
+        batch_size=2000,
+    )
+
+
+def corridor_boxes(count: int, seed: int):
+    from route_planner.services.types import BoundingBox
+
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        start_lat, start_lon = rng.uniform(26, 48), rng.uniform(-122, -69)
+        if rng.random() < 0.5:
+            end_lat, end_lon = rng.uniform(26, 48), start_lon + rng.uniform(-0.5, 0.5)
+        else:
+            end_lat, end_lon = start_lat + rng.uniform(-0.5, 0.5), rng.uniform(-122, -69)
+        margin = 8 / 69.0
+        boxes.append(
+            BoundingBox(
+                min_latitude=min(start_lat, end_lat) - margin,
+                max_latitude=max(start_lat, end_lat) + margin,
+                min_longitude=min(start_lon, end_lon) - margin,
+                max_longitude=max(start_lon, end_lon) + margin,
+            )
+        )
+    return boxes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["SQLITE_DB_PATH"] = str(Path(workdir) / "bench.sqlite3")
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command("migrate", verbosity=0)
+
+        from route_planner.services import station_index
+        from route_planner.services.station_index import StationSnapshotProvider
+        from route_planner.services.station_selection import StationSelector
+
+        print("stations\tbackend\tqueries\tmedian_ms\tp95_ms\tavg_rows")
+        for station_count in args.stations:
+            populate(station_count, args.seed)
+            boxes = corridor_boxes(args.queries, args.seed)
+            station_index._snapshot_provider = StationSnapshotProvider(check_interval_seconds=3600)
+            station_index._snapshot_provider.current()
+            for backend in BACKENDS:
+                selector = StationSelector(backend=backend)
+                timings = []
+                rows = 0
+                for bbox in boxes:
+                    started = time.perf_counter()
+                    rows += sum(1 for _ in selector._stations_in_bbox(bbox))
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(
+                    f"{station_count}\t{backend}\t{len(boxes)}\t"
+                    f"{statistics.median(timings):.2f}\t"
+                    f"{timings[int(len(timings) * 0.95) - 1]:.2f}\t{rows / len(boxes):.0f}",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
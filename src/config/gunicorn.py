@@ -0,0 +1,25 @@
+"""Gunicorn settings, used with ``gunicorn -c python:config.gunicorn config.wsgi:application``.
+
+The app is loaded in the master and planner state is preloaded before workers fork, so each
+worker starts with warm, copy-on-write shared station data instead of building its own on the
+first request.
+"""
+
+from __future__ import annotations
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+accesslog = "-"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server) -> None:
+    if not preload_app:
+        return
+    from route_planner.preload import preload_planner_state
+
+    preload_planner_state()
+    server.log.info("Preloaded planner state before forking workers")
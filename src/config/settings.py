@@ -23,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "route_planner.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -56,6 +57,15 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": Path(os.getenv("SQLITE_DB_PATH", PROJECT_ROOT / "db.sqlite3")),
+        "OPTIONS": {
+            # Writers from concurrent plans and job workers queue for the write lock up
+            # front and wait for it, instead of failing with "database is locked".
+            "timeout": float(os.getenv("SQLITE_TIMEOUT_SECONDS", "20")),
+            "transaction_mode": "IMMEDIATE",
+        },
+        # A file, not shared-cache memory, so threads lock the test database as they would
+        # the real one.
+        "TEST": {"NAME": str(PROJECT_ROOT / "test_db.sqlite3")},
     }
 }
 
@@ -85,14 +95,17 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "route-planner-cache",
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "route-planner-cache"),
     }
 }
 
 OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "https://router.project-osrm.org")
 OSRM_TIMEOUT_SECONDS = float(os.getenv("OSRM_TIMEOUT_SECONDS", "12"))
 OSRM_RETRY_COUNT = int(os.getenv("OSRM_RETRY_COUNT", "2"))
+OSRM_TABLE_MAX_COORDINATES = int(os.getenv("OSRM_TABLE_MAX_COORDINATES", "100"))
 
 GEOCODING_BASE_URL = os.getenv("GEOCODING_BASE_URL", "https://nominatim.openstreetmap.org")
 GEOCODING_USER_AGENT = os.getenv("GEOCODING_USER_AGENT", "spotter-ai-route-planner/1.0")
@@ -101,9 +114,41 @@ GEOCODING_RETRY_COUNT = int(os.getenv("GEOCODING_RETRY_COUNT", "2"))
 
 ROUTE_CACHE_TTL_SECONDS = int(os.getenv("ROUTE_CACHE_TTL_SECONDS", "600"))
 GEOCODE_CACHE_TTL_SECONDS = int(os.getenv("GEOCODE_CACHE_TTL_SECONDS", "86400"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", "600"))
+CANDIDATE_CACHE_TTL_SECONDS = int(os.getenv("CANDIDATE_CACHE_TTL_SECONDS", "600"))
 
 MAX_RANGE_MILES = float(os.getenv("MAX_RANGE_MILES", "500"))
 VEHICLE_MPG = float(os.getenv("VEHICLE_MPG", "10"))
 FUEL_TANK_GALLONS = float(os.getenv("FUEL_TANK_GALLONS", "50"))
 DEFAULT_CORRIDOR_MILES = float(os.getenv("DEFAULT_CORRIDOR_MILES", "8"))
 MAX_CANDIDATE_STATIONS = int(os.getenv("MAX_CANDIDATE_STATIONS", "600"))
+CORRIDOR_WIDEN_STEP_MILES = float(os.getenv("CORRIDOR_WIDEN_STEP_MILES", "4"))
+DETOUR_COST_PER_HOUR = float(os.getenv("DETOUR_COST_PER_HOUR", "60"))
+BATCH_PLAN_MAX_WORKERS = int(os.getenv("BATCH_PLAN_MAX_WORKERS", "4"))
+PLAN_MAX_CONCURRENCY = int(os.getenv("PLAN_MAX_CONCURRENCY", "3"))
+PLAN_QUEUE_TIMEOUT_SECONDS = float(os.getenv("PLAN_QUEUE_TIMEOUT_SECONDS", "0.5"))
+PLAN_RETRY_AFTER_SECONDS = int(os.getenv("PLAN_RETRY_AFTER_SECONDS", "2"))
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+TRIP_PLAN_TTL_SECONDS = int(os.getenv("TRIP_PLAN_TTL_SECONDS", "43200"))
+REPLAN_MAX_OFF_ROUTE_MILES = float(os.getenv("REPLAN_MAX_OFF_ROUTE_MILES", "5"))
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_QUEUE_SIZE = int(os.getenv("PLAN_JOB_QUEUE_SIZE", "32"))
+PLAN_JOB_TTL_SECONDS = int(os.getenv("PLAN_JOB_TTL_SECONDS", "3600"))
+PLAN_JOB_STALE_SECONDS = int(os.getenv("PLAN_JOB_STALE_SECONDS", "900"))
+PLAN_JOB_MAX_WAIT_SECONDS = float(os.getenv("PLAN_JOB_MAX_WAIT_SECONDS", "10"))
+# Web threads per process; gunicorn.py reads the same variable.
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "4"))
+# Never more than GUNICORN_THREADS - 1, so long-polls cannot hold every web thread.
+PLAN_JOB_MAX_WAITERS = int(os.getenv("PLAN_JOB_MAX_WAITERS", str(GUNICORN_THREADS // 2)))
+
+PLAN_PROFILING_ENABLED = os.getenv("PLAN_PROFILING_ENABLED", "0") == "1"
+PLAN_PROFILING_SAMPLE_RATE = float(os.getenv("PLAN_PROFILING_SAMPLE_RATE", "0"))
+PLAN_PROFILING_TOKEN_MAX_AGE_SECONDS = int(
+    os.getenv("PLAN_PROFILING_TOKEN_MAX_AGE_SECONDS", "3600")
+)
+PLAN_PROFILING_DIR = Path(os.getenv("PLAN_PROFILING_DIR", str(PROJECT_ROOT / "profiles")))
+
+STATION_INDEX_BACKEND = os.getenv("STATION_INDEX_BACKEND", "rtree")
+STATION_SNAPSHOT_CHECK_SECONDS = float(os.getenv("STATION_SNAPSHOT_CHECK_SECONDS", "1"))
+STATION_LAYER_MAX_FEATURES = int(os.getenv("STATION_LAYER_MAX_FEATURES", "500"))
+PRICE_SURFACE_CELL_DEGREES = float(os.getenv("PRICE_SURFACE_CELL_DEGREES", "1"))
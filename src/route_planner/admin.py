@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from route_planner.models import FuelStation
+from route_planner.models import FuelImportBatch, FuelPriceHistory, FuelStation
 
 
 @admin.register(FuelStation)
@@ -17,3 +17,19 @@ class FuelStationAdmin(admin.ModelAdmin):
     list_filter = ("state", "is_geocode_failed")
     search_fields = ("truckstop_name", "address", "city", "state")
     ordering = ("state", "city", "truckstop_name")
+
+
+@admin.register(FuelImportBatch)
+class FuelImportBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "source", "started_at", "rows_seen", "rows_changed")
+    ordering = ("-started_at",)
+
+
+@admin.register(FuelPriceHistory)
+class FuelPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ("station", "retail_price", "batch")
+    list_select_related = ("station", "batch")
+    raw_id_fields = ("station", "batch")
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
@@ -16,3 +16,27 @@ class NoRouteFoundError(RoutePlannerError):
 
 class NoFeasibleFuelPlanError(RoutePlannerError):
     """Raised when the route cannot be traversed with fuel constraints."""
+
+
+class PlannerOverloadedError(RoutePlannerError):
+    """Raised when route planning is at capacity and the request could not be admitted."""
+
+
+class StaleStationDataError(RoutePlannerError):
+    """Raised when a planned stop refers to a station that no longer exists."""
+
+
+class PlanNotFoundError(RoutePlannerError):
+    """Raised when a plan handle is unknown or has expired."""
+
+
+class PlanJobNotFoundError(RoutePlannerError):
+    """Raised when a plan job is unknown or its result has expired."""
+
+
+class PlanJobFailedError(RoutePlannerError):
+    """Raised for a plan job that failed with an unexpected error."""
+
+
+class PlanningFailedError(RoutePlannerError):
+    """Raised for a batch item or cell that failed with an unexpected error."""
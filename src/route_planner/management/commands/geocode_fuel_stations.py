@@ -8,6 +8,7 @@ from django.utils import timezone
 
 from route_planner.exceptions import ExternalServiceError, InvalidLocationError
 from route_planner.models import FuelStation
+from route_planner.services.data_version import bump_station_data_version
 from route_planner.services.geocoding import GeocodingClient
 
 
@@ -76,6 +77,9 @@ class Command(BaseCommand):
                 if sleep_seconds:
                     time.sleep(sleep_seconds)
 
+        if geocoded or failed:
+            bump_station_data_version()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"Geocode run complete: {geocoded} succeeded, {failed} failed (limit={limit})"
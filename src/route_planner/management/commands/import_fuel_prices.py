@@ -1,13 +1,44 @@
 from __future__ import annotations
 
+import hashlib
+from collections.abc import Iterator
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any
 
 import polars as pl
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
 
-from route_planner.models import FuelStation
+from route_planner.models import FuelImportBatch, FuelPriceHistory, FuelStation
+from route_planner.services.data_version import bump_station_data_version
+
+REQUIRED_COLUMNS = frozenset(
+    {
+        "OPIS Truckstop ID",
+        "Truckstop Name",
+        "Address",
+        "City",
+        "State",
+        "Rack ID",
+        "Retail Price",
+    }
+)
+
+IMPORTED_FIELDS = (
+    "opis_truckstop_id",
+    "truckstop_name",
+    "address",
+    "city",
+    "state",
+    "rack_id",
+    "retail_price",
+)
+UPSERT_FIELDS = (*IMPORTED_FIELDS, "row_hash")
+UPSERT_ROWS_PER_STATEMENT = 500
 
 
 class Command(BaseCommand):
@@ -25,18 +56,227 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete existing stations before importing",
         )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help=(
+                "Scan the CSV lazily and upsert it in record batches; memory grows with "
+                "distinct stations, not rows"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per upsert batch in streaming mode",
+        )
+        write_mode = parser.add_mutually_exclusive_group()
+        write_mode.add_argument(
+            "--upsert",
+            action="store_true",
+            help="Write with INSERT ... ON CONFLICT DO UPDATE, touching only changed rows",
+        )
+        write_mode.add_argument(
+            "--delta",
+            action="store_true",
+            help="Skip rows whose hash is unchanged and record price changes in history",
+        )
 
     def handle(self, *_: Any, **options: Any) -> None:
         csv_path = Path(options["csv_path"])
         if not csv_path.exists():
             raise CommandError(f"CSV file does not exist: {csv_path}")
+        if options["replace"] and options["delta"]:
+            raise CommandError("--replace cannot be combined with --delta: price history is kept")
+
+        # Both read the CSV header up front, so a malformed file fails before any delete.
+        if options["stream"]:
+            batches = self._stream_batches(csv_path, max(1, options["batch_size"]))
+        else:
+            batches = iter([self._load_and_transform(csv_path)])
+        batches = (_with_row_hashes(batch) for batch in batches)
+
+        # A replace and its load commit together: a load that fails keeps the old stations.
+        with transaction.atomic() if options["replace"] else nullcontext():
+            if options["replace"]:
+                try:
+                    FuelStation.objects.all().delete()
+                except ProtectedError as exc:
+                    raise CommandError(
+                        "Stations have recorded price history and cannot be replaced"
+                    ) from exc
+
+            if options["upsert"]:
+                self._handle_sql_upsert(batches, replaced=options["replace"])
+            elif options["delta"]:
+                self._handle_delta(batches, source=csv_path.name)
+            else:
+                self._handle_orm_upsert(batches, replaced=options["replace"])
+
+    def _handle_orm_upsert(self, batches: Iterator[pl.DataFrame], *, replaced: bool) -> None:
+        normalized = 0
+        created = 0
+        updated = 0
+        for batch in batches:
+            records = batch.to_dicts()
+            batch_created, batch_updated = self._upsert_records(records)
+            normalized += len(records)
+            created += batch_created
+            updated += batch_updated
+
+        if created or updated or replaced:
+            bump_station_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported fuel stations: "
+                + f"{normalized} rows normalized, {created} created, {updated} updated"
+            )
+        )
+
+    def _handle_sql_upsert(self, batches: Iterator[pl.DataFrame], *, replaced: bool) -> None:
+        stations_before = FuelStation.objects.count()
+        normalized = 0
+        applied = 0
+        # A streamed key can be rewritten by a later, cheaper batch; count stations once.
+        written_keys: set[str] = set()
+        for batch in batches:
+            normalized += batch.height
+            keys = self._upsert_rows_sql(batch.select(*UPSERT_FIELDS, "canonical_key"))
+            applied += len(keys)
+            written_keys.update(keys)
+
+        created = FuelStation.objects.count() - stations_before
+        if written_keys or replaced:
+            bump_station_data_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported fuel stations: "
+                + (
+                    f"{normalized} rows normalized, {created} created, "
+                    f"{len(written_keys) - created} updated, {normalized - applied} unchanged"
+                )
+            )
+        )
+
+    def _handle_delta(self, batches: Iterator[pl.DataFrame], *, source: str) -> None:
+        import_batch = FuelImportBatch.objects.create(source=source[:255])
+        # A streamed key can change again in a later batch; keep one history row per station.
+        recorded: dict[int, int] = {}
+        normalized = 0
+        created = 0
+        updated = 0
+        price_changes = 0
+        for batch in batches:
+            records = batch.to_dicts()
+            with transaction.atomic():
+                batch_created, batch_updated, batch_price_changes = self._apply_delta(
+                    records, import_batch, recorded
+                )
+            normalized += len(records)
+            created += batch_created
+            updated += batch_updated
+            price_changes += batch_price_changes
+
+        import_batch.rows_seen = normalized
+        import_batch.rows_changed = created + updated
+        if import_batch.rows_changed:
+            import_batch.station_data_version = bump_station_data_version()
+        import_batch.save(update_fields=["rows_seen", "rows_changed", "station_data_version"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Delta import #{import_batch.pk}: "
+                + (
+                    f"{normalized} rows normalized, {created} created, {updated} updated, "
+                    f"{normalized - created - updated} unchanged, "
+                    f"{price_changes} price changes recorded"
+                )
+            )
+        )
+
+    @staticmethod
+    def _apply_delta(
+        records: list[dict[str, Any]], import_batch: FuelImportBatch, recorded: dict[int, int]
+    ) -> tuple[int, int, int]:
+        """Write one batch of a delta import and record its price changes.
+
+        ``recorded`` maps station ids to the history row this import already wrote for
+        them; a station whose price changes again in a later batch has that row revised
+        instead of gaining a second one. Returns created, updated and new history rows.
+        """
+        existing = {
+            canonical_key: (station_id, row_hash, float(retail_price))
+            for canonical_key, station_id, row_hash, retail_price in FuelStation.objects.filter(
+                canonical_key__in=[row["canonical_key"] for row in records]
+            ).values_list("canonical_key", "id", "row_hash", "retail_price")
+        }
+
+        now = timezone.now()
+        to_create: list[FuelStation] = []
+        to_update: list[FuelStation] = []
+        history: list[FuelPriceHistory] = []
+        revised: list[FuelPriceHistory] = []
+
+        for row in records:
+            current = existing.get(row["canonical_key"])
+            if current is None:
+                to_create.append(
+                    FuelStation(
+                        canonical_key=row["canonical_key"],
+                        **{name: row[name] for name in UPSERT_FIELDS},
+                    )
+                )
+                continue
+
+            station_id, row_hash, stored_price = current
+            if row_hash == row["row_hash"]:
+                continue
+
+            to_update.append(
+                FuelStation(
+                    pk=station_id,
+                    updated_at=now,
+                    **{name: row[name] for name in UPSERT_FIELDS},
+                )
+            )
+            if round(row["retail_price"], 3) == round(stored_price, 3):
+                continue
+            if station_id in recorded:
+                revised.append(
+                    FuelPriceHistory(pk=recorded[station_id], retail_price=row["retail_price"])
+                )
+            else:
+                history.append(
+                    FuelPriceHistory(
+                        station_id=station_id,
+                        batch=import_batch,
+                        retail_price=row["retail_price"],
+                    )
+                )
 
-        frame = self._load_and_transform(csv_path)
-        records = frame.to_dicts()
+        if to_create:
+            FuelStation.objects.bulk_create(to_create, batch_size=1000)
+            history.extend(
+                FuelPriceHistory(
+                    station=station, batch=import_batch, retail_price=station.retail_price
+                )
+                for station in to_create
+            )
+        if to_update:
+            FuelStation.objects.bulk_update(
+                to_update, [*UPSERT_FIELDS, "updated_at"], batch_size=1000
+            )
+        if history:
+            FuelPriceHistory.objects.bulk_create(history, batch_size=1000)
+            recorded.update((entry.station_id, entry.pk) for entry in history)
+        if revised:
+            FuelPriceHistory.objects.bulk_update(revised, ["retail_price"], batch_size=1000)
 
-        if options["replace"]:
-            FuelStation.objects.all().delete()
+        return len(to_create), len(to_update), len(history)
 
+    @staticmethod
+    def _upsert_records(records: list[dict[str, Any]]) -> tuple[int, int]:
         existing = {
             station.canonical_key: station
             for station in FuelStation.objects.filter(
@@ -60,6 +300,7 @@ class Command(BaseCommand):
                         rack_id=row["rack_id"],
                         retail_price=row["retail_price"],
                         canonical_key=row["canonical_key"],
+                        row_hash=row["row_hash"],
                     )
                 )
                 continue
@@ -71,6 +312,7 @@ class Command(BaseCommand):
             station.state = row["state"]
             station.rack_id = row["rack_id"]
             station.retail_price = row["retail_price"]
+            station.row_hash = row["row_hash"]
             to_update.append(station)
 
         if to_create:
@@ -86,38 +328,112 @@ class Command(BaseCommand):
                     "state",
                     "rack_id",
                     "retail_price",
+                    "row_hash",
                 ],
                 batch_size=1000,
             )
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                "Imported fuel stations: "
-                + (
-                    f"{len(records)} rows normalized, "
-                    f"{len(to_create)} created, {len(to_update)} updated"
-                )
-            )
-        )
+        return len(to_create), len(to_update)
 
     @staticmethod
-    def _load_and_transform(csv_path: Path) -> pl.DataFrame:
-        frame = pl.read_csv(csv_path, infer_schema_length=5000)
-        required_columns = {
-            "OPIS Truckstop ID",
-            "Truckstop Name",
-            "Address",
-            "City",
-            "State",
-            "Rack ID",
-            "Retail Price",
+    def _upsert_rows_sql(batch: pl.DataFrame) -> list[str]:
+        """Upsert a batch with a native ``INSERT ... ON CONFLICT DO UPDATE``.
+
+        The conflict branch only fires when an imported column differs from the stored
+        row, so unchanged stations are neither rewritten nor returned. Returns the
+        canonical keys of the rows inserted or updated.
+        """
+        meta = FuelStation._meta
+        columns = [*UPSERT_FIELDS, "canonical_key"]
+        fields = [meta.get_field(name) for name in columns]
+        now = timezone.now()
+        insert_defaults = {
+            "geocode_attempts": meta.get_field("geocode_attempts").get_default(),
+            "is_geocode_failed": meta.get_field("is_geocode_failed").get_default(),
+            "created_at": now,
+            "updated_at": now,
         }
-        missing_columns = required_columns.difference(frame.columns)
+        default_params = [
+            meta.get_field(name).get_db_prep_save(value, connection)
+            for name, value in insert_defaults.items()
+        ]
+
+        quote = connection.ops.quote_name
+        table = quote(meta.db_table)
+        column_sql = ", ".join(quote(name) for name in [*columns, *insert_defaults])
+        row_sql = "(" + ", ".join(["%s"] * (len(columns) + len(insert_defaults))) + ")"
+        update_sql = ", ".join(
+            f"{quote(name)} = excluded.{quote(name)}" for name in [*UPSERT_FIELDS, "updated_at"]
+        )
+        distinct = "IS NOT" if connection.vendor == "sqlite" else "IS DISTINCT FROM"
+        changed_sql = " OR ".join(
+            f"{table}.{quote(name)} {distinct} excluded.{quote(name)}" for name in UPSERT_FIELDS
+        )
+
+        written: list[str] = []
+        with connection.cursor() as cursor:
+            for chunk in batch.iter_slices(UPSERT_ROWS_PER_STATEMENT):
+                params: list[Any] = []
+                for row in chunk.iter_rows():
+                    params.extend(
+                        field.get_db_prep_save(value, connection)
+                        for field, value in zip(fields, row, strict=True)
+                    )
+                    params.extend(default_params)
+                cursor.execute(
+                    f"INSERT INTO {table} ({column_sql}) "
+                    f"VALUES {', '.join([row_sql] * chunk.height)} "
+                    f"ON CONFLICT ({quote('canonical_key')}) DO UPDATE SET {update_sql} "
+                    f"WHERE {changed_sql} RETURNING {quote('canonical_key')}",
+                    params,
+                )
+                written.extend(key for (key,) in cursor.fetchall())
+        return written
+
+    @classmethod
+    def _load_and_transform(cls, csv_path: Path) -> pl.DataFrame:
+        return _deduplicate(cls._scan_and_transform(csv_path)).collect()
+
+    @classmethod
+    def _stream_batches(cls, csv_path: Path, batch_size: int) -> Iterator[pl.DataFrame]:
+        """Yield normalized, deduplicated batches without materializing the whole feed.
+
+        Duplicates are resolved per batch by Polars and across batches by remembering the
+        cheapest price already emitted for each canonical key. That map is the only state
+        held between batches: it is O(distinct stations), one key and one float each, and
+        does not grow with the number of rows in the feed.
+        """
+        # Scanned here rather than in the generator, so missing columns are reported now.
+        return cls._deduplicated_batches(cls._scan_and_transform(csv_path), batch_size)
+
+    @staticmethod
+    def _deduplicated_batches(lazy_frame: pl.LazyFrame, batch_size: int) -> Iterator[pl.DataFrame]:
+        cheapest_emitted: dict[str, float] = {}
+        for chunk in lazy_frame.collect_batches(chunk_size=batch_size):
+            deduplicated = _deduplicate(chunk)
+            keep: list[bool] = []
+            for key, price in zip(
+                deduplicated["canonical_key"], deduplicated["retail_price"], strict=True
+            ):
+                previous = cheapest_emitted.get(key)
+                is_cheaper = previous is None or price < previous
+                if is_cheaper:
+                    cheapest_emitted[key] = price
+                keep.append(is_cheaper)
+
+            batch = deduplicated.filter(pl.Series(keep, dtype=pl.Boolean))
+            if batch.height:
+                yield batch
+
+    @staticmethod
+    def _scan_and_transform(csv_path: Path) -> pl.LazyFrame:
+        lazy_frame = pl.scan_csv(csv_path, infer_schema_length=5000)
+        missing_columns = REQUIRED_COLUMNS.difference(lazy_frame.collect_schema().names())
         if missing_columns:
             raise CommandError(f"Missing expected columns: {sorted(missing_columns)}")
 
-        normalized = (
-            frame.select(
+        return (
+            lazy_frame.select(
                 pl.col("OPIS Truckstop ID").cast(pl.Int64, strict=False).alias("opis_truckstop_id"),
                 pl.col("Truckstop Name")
                 .cast(pl.Utf8, strict=False)
@@ -162,8 +478,28 @@ class Command(BaseCommand):
                     separator="|",
                 ).alias("canonical_key")
             )
-            .sort(["canonical_key", "retail_price"])
-            .unique(subset=["canonical_key"], keep="first", maintain_order=True)
         )
 
-        return normalized
+
+def _deduplicate[FrameT: (pl.DataFrame, pl.LazyFrame)](frame: FrameT) -> FrameT:
+    return frame.sort(["canonical_key", "retail_price"]).unique(
+        subset=["canonical_key"], keep="first", maintain_order=True
+    )
+
+
+def _with_row_hashes(batch: pl.DataFrame) -> pl.DataFrame:
+    """Attach a stable digest of each row's imported values.
+
+    Prices are hashed at storage precision so sub-cent feed noise is not a change.
+    """
+    hashes = [
+        hashlib.blake2b(
+            "\x1f".join(
+                f"{value:.3f}" if name == "retail_price" else str(value)
+                for name, value in zip(IMPORTED_FIELDS, values, strict=True)
+            ).encode(),
+            digest_size=16,
+        ).hexdigest()
+        for values in batch.select(IMPORTED_FIELDS).iter_rows()
+    ]
+    return batch.with_columns(pl.Series("row_hash", hashes, dtype=pl.Utf8))
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from route_planner.services.profiling import PROFILE_HEADER, make_profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed X-Plan-Profile header value that profiles one route-plan request."
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--label",
+            default="manual",
+            help="Included in the profile artifact's file name",
+        )
+
+    def handle(self, *_: Any, **options: Any) -> None:
+        if not settings.PLAN_PROFILING_ENABLED:
+            self.stderr.write(
+                self.style.WARNING(
+                    "PLAN_PROFILING_ENABLED is off; the server will ignore this header."
+                )
+            )
+        self.stdout.write(f"{PROFILE_HEADER}: {make_profile_token(options['label'])}")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from route_planner.services.jobs import PlanJobQueue
+from route_planner.services.trips import TripStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired trip plans and plan jobs, and fail jobs lost with their process. "
+        "Run periodically, e.g. hourly from cron."
+    )
+
+    def handle(self, *_: Any, **__: Any) -> None:
+        trips = TripStore.purge_expired()
+        jobs = PlanJobQueue.purge_expired()
+        lost = PlanJobQueue.fail_stale()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Expired trips deleted: {trips}, jobs: {jobs}; lost jobs failed: {lost}"
+            )
+        )
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import csv
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pydantic import ValidationError
+
+from route_planner.exceptions import RoutePlannerError
+from route_planner.schemas import RoutePlanRequest
+from route_planner.services.geocoding import normalize_location
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.workers import in_worker
+
+
+@dataclass(slots=True, frozen=True)
+class Lane:
+    start_location: str
+    finish_location: str
+    corridor_miles: float
+    waypoints: tuple[str, ...] = ()
+
+    @property
+    def key(self) -> tuple[str, str, float, tuple[str, ...]]:
+        return (
+            normalize_location(self.start_location),
+            normalize_location(self.finish_location),
+            self.corridor_miles,
+            tuple(normalize_location(waypoint) for waypoint in self.waypoints),
+        )
+
+
+class Command(BaseCommand):
+    help = "Geocode, route and select candidate stations for frequent lanes ahead of traffic."
+
+    def add_arguments(self, parser: Any) -> None:
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument(
+            "--lanes-file",
+            help=(
+                "CSV with start_location, finish_location and optional corridor_miles and "
+                "waypoints (separated by ';') columns"
+            ),
+        )
+        source.add_argument(
+            "--request-log",
+            help="NDJSON file with one recorded route-plan request body per line",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=200,
+            help="Warm at most this many lanes, most frequent first",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.BATCH_PLAN_MAX_WORKERS,
+            help="Lanes warmed in parallel",
+        )
+
+    def handle(self, *_: Any, **options: Any) -> None:
+        if options["lanes_file"]:
+            lanes = self._read_lanes_file(Path(options["lanes_file"]))
+        else:
+            lanes = self._read_request_log(Path(options["request_log"]))
+        lanes = self._rank_lanes(lanes)[: max(1, options["top"])]
+        if not lanes:
+            self.stdout.write(self.style.WARNING("No lanes to warm"))
+            return
+
+        if "locmem" in settings.CACHES["default"]["BACKEND"].lower():
+            self.stdout.write(
+                self.style.WARNING(
+                    "Cache backend is process-local; only this process will see the warmed "
+                    "entries. Set DJANGO_CACHE_BACKEND to a shared cache."
+                )
+            )
+
+        planner = RoutePlannerService()
+        warmed = 0
+        failed = 0
+        with ThreadPoolExecutor(
+            max_workers=max(1, options["concurrency"]), thread_name_prefix="warm-route-cache"
+        ) as pool:
+            for lane, error in zip(
+                lanes,
+                pool.map(lambda lane: in_worker(self._warm_lane, planner, lane), lanes),
+                strict=True,
+            ):
+                if error is None:
+                    warmed += 1
+                    continue
+                failed += 1
+                self.stdout.write(
+                    self.style.WARNING(f"{lane.start_location} -> {lane.finish_location}: {error}")
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Lanes warmed: {warmed}, failed: {failed}"))
+
+    @staticmethod
+    def _warm_lane(planner: RoutePlannerService, lane: Lane) -> RoutePlannerError | None:
+        # Mirrors RoutePlannerService.plan: a lane with waypoints is routed and selected
+        # leg by leg, so the per-leg cache entries a plan will read are the ones filled.
+        try:
+            start = planner.geocoding_client.geocode(lane.start_location, country_code="us")
+            via = [
+                planner.geocoding_client.geocode(location, country_code="us").point
+                for location in lane.waypoints
+            ]
+            finish = planner.geocoding_client.geocode(lane.finish_location, country_code="us")
+            if via:
+                route = planner.osrm_client.route_legs([start.point, *via, finish.point])
+            else:
+                route = planner.osrm_client.route(start.point, finish.point)
+            for leg in route.legs or (route,):
+                planner.station_selector.select_candidate_stations(
+                    route_coordinates=leg.coordinates,
+                    corridor_miles=lane.corridor_miles,
+                )
+        except RoutePlannerError as exc:
+            return exc
+        return None
+
+    @staticmethod
+    def _rank_lanes(lanes: list[Lane]) -> list[Lane]:
+        counts = Counter(lane.key for lane in lanes)
+        first_seen: dict[tuple[str, str, float, tuple[str, ...]], Lane] = {}
+        for lane in lanes:
+            first_seen.setdefault(lane.key, lane)
+        return [first_seen[key] for key, _ in counts.most_common()]
+
+    @staticmethod
+    def _read_lanes_file(path: Path) -> list[Lane]:
+        if not path.exists():
+            raise CommandError(f"Lanes file not found: {path}")
+
+        with path.open(newline="", encoding="utf-8") as handle:
+            reader = csv.DictReader(handle)
+            missing = {"start_location", "finish_location"} - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f"Missing required columns: {', '.join(sorted(missing))}")
+            return [
+                Lane(
+                    start_location=row["start_location"],
+                    finish_location=row["finish_location"],
+                    corridor_miles=float(
+                        row.get("corridor_miles") or settings.DEFAULT_CORRIDOR_MILES
+                    ),
+                    waypoints=tuple(
+                        waypoint.strip()
+                        for waypoint in (row.get("waypoints") or "").split(";")
+                        if waypoint.strip()
+                    ),
+                )
+                for row in reader
+            ]
+
+    def _read_request_log(self, path: Path) -> list[Lane]:
+        if not path.exists():
+            raise CommandError(f"Request log not found: {path}")
+
+        lanes: list[Lane] = []
+        skipped = 0
+        with path.open(encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    request = RoutePlanRequest.model_validate(json.loads(line))
+                except (json.JSONDecodeError, ValidationError):
+                    skipped += 1
+                    continue
+                lanes.append(
+                    Lane(
+                        start_location=request.start_location,
+                        finish_location=request.finish_location,
+                        corridor_miles=request.corridor_miles,
+                        waypoints=tuple(request.waypoints),
+                    )
+                )
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {skipped} unreadable log lines"))
+        return lanes
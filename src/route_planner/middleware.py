@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from route_planner.services.metrics import request_timings
+
+
+class ServerTimingMiddleware:
+    """Collect stage timings for each request and report them in a Server-Timing header."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings: list[tuple[str, float]] = []
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        total = time.perf_counter() - started
+
+        durations: dict[str, float] = {}
+        for name, seconds in timings:
+            durations[name] = durations.get(name, 0.0) + seconds
+        durations["total"] = total
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()
+        )
+        return response
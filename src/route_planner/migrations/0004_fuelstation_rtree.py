@@ -0,0 +1,70 @@
+from django.db import migrations
+
+RTREE_TABLE = "route_planner_fuelstation_rtree"
+STATION_TABLE = "route_planner_fuelstation"
+
+CREATE_STATEMENTS = (
+    f"""
+    CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree(
+        id, min_latitude, max_latitude, min_longitude, max_longitude
+    )
+    """,
+    f"""
+    INSERT INTO {RTREE_TABLE}
+    SELECT id, latitude, latitude, longitude, longitude FROM {STATION_TABLE}
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+    f"""
+    CREATE TRIGGER {RTREE_TABLE}_insert AFTER INSERT ON {STATION_TABLE}
+    WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+    BEGIN
+        INSERT INTO {RTREE_TABLE}
+        VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {RTREE_TABLE}_update AFTER UPDATE OF latitude, longitude ON {STATION_TABLE}
+    BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+        INSERT INTO {RTREE_TABLE}
+        SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+        WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {RTREE_TABLE}_delete AFTER DELETE ON {STATION_TABLE}
+    BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+    END
+    """,
+)
+
+DROP_STATEMENTS = (
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_delete",
+    f"DROP TABLE IF EXISTS {RTREE_TABLE}",
+)
+
+
+def _run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("route_planner", "0003_fuel_price_history"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_sqlite(CREATE_STATEMENTS),
+            _run_on_sqlite(DROP_STATEMENTS),
+        ),
+    ]
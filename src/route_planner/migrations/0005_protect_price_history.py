@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("route_planner", "0004_fuelstation_rtree"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fuelpricehistory",
+            name="batch",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="price_changes",
+                to="route_planner.fuelimportbatch",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="fuelpricehistory",
+            name="station",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="price_history",
+                to="route_planner.fuelstation",
+            ),
+        ),
+    ]
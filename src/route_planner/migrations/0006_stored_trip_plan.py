@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("route_planner", "0005_protect_price_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredTripPlan",
+            fields=[
+                ("plan_id", models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ("payload", models.BinaryField()),
+                ("expires_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["expires_at"], name="route_plann_expires_0ba303_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("route_planner", "0006_stored_trip_plan"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredPlanJob",
+            fields=[
+                ("job_id", models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ("kind", models.CharField(max_length=16)),
+                ("status", models.CharField(max_length=16)),
+                ("submitted_at", models.FloatField()),
+                ("finished_at", models.FloatField(blank=True, null=True)),
+                ("result", models.BinaryField(blank=True, null=True)),
+                ("error", models.BinaryField(blank=True, null=True)),
+                ("expires_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["expires_at"], name="route_plann_expires_6b8363_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("route_planner", "0007_stored_plan_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="storedplanjob",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="storedplanjob",
+            index=models.Index(
+                fields=["status", "updated_at"], name="route_plann_status_f1ee00_idx"
+            ),
+        ),
+    ]
@@ -15,6 +15,7 @@ class FuelStation(models.Model):
     rack_id = models.IntegerField(null=True, blank=True)
     retail_price = models.DecimalField(max_digits=6, decimal_places=3)
     canonical_key = models.CharField(max_length=400, unique=True)
+    row_hash = models.CharField(max_length=32, blank=True, default="")
 
     # Geocoding fields
     latitude = models.FloatField(null=True, blank=True)
@@ -42,3 +43,91 @@ class FuelStation(models.Model):
 
     def __str__(self) -> str:
         return f"{self.truckstop_name} ({self.city}, {self.state})"
+
+
+class StationDataVersion(models.Model):
+    """Single-row counter bumped whenever station or price data changes."""
+
+    objects = models.Manager["StationDataVersion"]()
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Station data v{self.version}"
+
+
+class FuelImportBatch(models.Model):
+    objects = models.Manager["FuelImportBatch"]()
+
+    source = models.CharField(max_length=255)
+    started_at = models.DateTimeField(auto_now_add=True)
+    rows_seen = models.PositiveIntegerField(default=0)
+    rows_changed = models.PositiveIntegerField(default=0)
+    station_data_version = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-started_at",)
+
+    def __str__(self) -> str:
+        return f"Import #{self.pk} ({self.source})"
+
+
+class FuelPriceHistory(models.Model):
+    """Append-only record of each observed price change; the batch carries the timestamp."""
+
+    objects = models.Manager["FuelPriceHistory"]()
+
+    station = models.ForeignKey(FuelStation, on_delete=models.PROTECT, related_name="price_history")
+    batch = models.ForeignKey(
+        FuelImportBatch, on_delete=models.PROTECT, related_name="price_changes"
+    )
+    retail_price = models.DecimalField(max_digits=6, decimal_places=3)
+
+    class Meta:
+        indexes = (models.Index(fields=["station", "batch"]),)
+
+    def __str__(self) -> str:
+        return f"{self.station_id} @ {self.retail_price} (batch {self.batch_id})"
+
+
+class StoredTripPlan(models.Model):
+    """A pickled ``TripPlan`` kept under its plan handle for mid-trip re-plans."""
+
+    objects = models.Manager["StoredTripPlan"]()
+
+    plan_id = models.CharField(max_length=32, primary_key=True)
+    payload = models.BinaryField()
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (models.Index(fields=["expires_at"]),)
+
+    def __str__(self) -> str:
+        return f"Trip {self.plan_id} (expires {self.expires_at:%Y-%m-%d %H:%M})"
+
+
+class StoredPlanJob(models.Model):
+    """A plan job's state and serialized result, shared by every web process."""
+
+    objects = models.Manager["StoredPlanJob"]()
+
+    job_id = models.CharField(max_length=32, primary_key=True)
+    kind = models.CharField(max_length=16)
+    status = models.CharField(max_length=16)
+    submitted_at = models.FloatField()
+    finished_at = models.FloatField(null=True, blank=True)
+    result = models.BinaryField(null=True, blank=True)
+    error = models.BinaryField(null=True, blank=True)
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=["expires_at"]),
+            models.Index(fields=["status", "updated_at"]),
+        )
+
+    def __str__(self) -> str:
+        return f"Job {self.job_id} ({self.kind}, {self.status})"
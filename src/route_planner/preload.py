@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import gc
+import importlib
+
+from django.db import DatabaseError, connections
+
+from route_planner.services.jobs import PlanJobQueue
+from route_planner.services.price_surface import get_price_surface
+from route_planner.services.station_clusters import get_station_cluster_index
+from route_planner.views import get_route_planner
+
+# Imported lazily by the code paths that use them; loading them here moves the cost to boot.
+OPTIONAL_MODULES = ("ortools.linear_solver.pywraplp",)
+
+
+def preload_planner_state() -> None:
+    """Build long-lived planner state in the gunicorn master before workers are forked.
+
+    Modules, the planner service and the station snapshot with its derived indexes are
+    loaded once, then moved out of GC tracking so collections in the workers do not touch
+    (and un-share) the copy-on-write pages that hold them. Database connections are closed
+    so no worker inherits the master's socket.
+    """
+    for module in OPTIONAL_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+    get_route_planner()
+    try:
+        get_station_cluster_index()
+        get_price_surface()
+        PlanJobQueue.fail_stale()
+    except DatabaseError:
+        # Not migrated yet; workers load station data on their first request instead.
+        pass
+    finally:
+        connections.close_all()
+
+    gc.collect()
+    gc.freeze()
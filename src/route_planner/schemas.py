@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import Literal
+from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class RoutePlanRequest(BaseModel):
@@ -16,6 +16,99 @@ class RoutePlanRequest(BaseModel):
     tank_capacity_gallons: float | None = Field(default=None, gt=0.0, le=300.0)
     max_range_miles: float | None = Field(default=None, gt=0.0, le=2000.0)
     optimizer: Literal["baseline", "ortools"] = "baseline"
+    waypoints: list[Annotated[str, Field(min_length=3, max_length=300)]] = Field(
+        default_factory=list, max_length=10
+    )
+    max_corridor_miles: float | None = Field(default=None, ge=1.0, le=50.0)
+    detour_aware: bool = False
+
+    @model_validator(mode="after")
+    def _check_max_corridor(self) -> RoutePlanRequest:
+        if self.max_corridor_miles is not None and self.max_corridor_miles < self.corridor_miles:
+            raise ValueError("max_corridor_miles must be at least corridor_miles")
+        return self
+
+
+class RouteReplanRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    plan_id: str = Field(min_length=1, max_length=64)
+    latitude: float = Field(ge=-90.0, le=90.0)
+    longitude: float = Field(ge=-180.0, le=180.0)
+    current_fuel_percent: float = Field(ge=0.0, le=100.0)
+    last_milepost: float | None = Field(default=None, ge=0.0)
+
+
+class RoutePlanBatchRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[RoutePlanRequest] = Field(min_length=1, max_length=500)
+
+
+class MatrixPair(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    origin: int = Field(ge=0)
+    destination: int = Field(ge=0)
+
+
+class RouteMatrixRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    origins: list[Annotated[str, Field(min_length=3, max_length=300)]] = Field(
+        min_length=1, max_length=100
+    )
+    destinations: list[Annotated[str, Field(min_length=3, max_length=300)]] = Field(
+        min_length=1, max_length=100
+    )
+    detail: list[MatrixPair] = Field(default_factory=list, max_length=25)
+    start_fuel_percent: float = Field(default=100.0, ge=0.0, le=100.0)
+    corridor_miles: float = Field(default=8.0, ge=1.0, le=50.0)
+    vehicle_mpg: float | None = Field(default=None, gt=0.0, le=100.0)
+    tank_capacity_gallons: float | None = Field(default=None, gt=0.0, le=300.0)
+    max_range_miles: float | None = Field(default=None, gt=0.0, le=2000.0)
+    optimizer: Literal["baseline", "ortools"] = "baseline"
+
+    @model_validator(mode="after")
+    def _check_detail_pairs(self) -> RouteMatrixRequest:
+        for pair in self.detail:
+            if pair.origin >= len(self.origins) or pair.destination >= len(self.destinations):
+                raise ValueError("detail pairs must index into origins and destinations")
+        return self
+
+    def plan_request(self, pair: MatrixPair) -> RoutePlanRequest:
+        return RoutePlanRequest(
+            start_location=self.origins[pair.origin],
+            finish_location=self.destinations[pair.destination],
+            **self.model_dump(exclude={"origins", "destinations", "detail"}),
+        )
+
+
+class PlanJobQuery(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    wait: float = Field(default=0.0, ge=0.0)
+
+
+class StationLayerQuery(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    bbox: tuple[float, float, float, float]
+    zoom: int = Field(ge=0, le=22)
+
+    @field_validator("bbox", mode="before")
+    @classmethod
+    def _split_bbox(cls, value: object) -> object:
+        if isinstance(value, str):
+            return value.split(",")
+        return value
+
+    @model_validator(mode="after")
+    def _check_bbox(self) -> StationLayerQuery:
+        min_longitude, min_latitude, max_longitude, max_latitude = self.bbox
+        if min_longitude > max_longitude or min_latitude > max_latitude:
+            raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+        return self
 
 
 class Coordinate(BaseModel):
@@ -48,12 +141,72 @@ class RouteSummaryResponse(BaseModel):
     estimated_fuel_needed_gallons: float
 
 
+class WaypointResponse(BaseModel):
+    latitude: float
+    longitude: float
+    milepost: float
+
+
 class RoutePlanResponse(BaseModel):
     start: Coordinate
     finish: Coordinate
+    waypoints: list[WaypointResponse] = Field(default_factory=list)
     optimizer_used: Literal["baseline", "ortools"]
     route_geojson: dict
     route_with_stops_geojson: dict | None = None
     stops: list[FuelStopResponse]
     summary: RouteSummaryResponse
     assumptions: dict[str, float]
+    plan_id: str | None = None
+
+
+class RouteReplanResponse(RoutePlanResponse):
+    current_milepost: float
+    off_route_miles: float
+
+
+class ErrorDetail(BaseModel):
+    code: str
+    message: str
+    status: int
+
+
+class PlanJobResponse(BaseModel):
+    job_id: str
+    kind: Literal["plan", "batch"]
+    status: Literal["queued", "running", "succeeded", "failed"]
+    submitted_at: float
+    finished_at: float | None = None
+    error: ErrorDetail | None = None
+    result: dict[str, Any] | None = None
+
+
+class RoutePlanBatchItemResponse(BaseModel):
+    index: int
+    plan: RoutePlanResponse | None = None
+    error: ErrorDetail | None = None
+
+
+class RoutePlanBatchResponse(BaseModel):
+    results: list[RoutePlanBatchItemResponse]
+    succeeded: int
+    failed: int
+
+
+class RouteMatrixCellResponse(BaseModel):
+    origin: int
+    destination: int
+    distance_miles: float | None = None
+    duration_minutes: float | None = None
+    estimated_price_per_gallon: float | None = None
+    estimated_fuel_gallons: float | None = None
+    estimated_fuel_cost: float | None = None
+    plan: RoutePlanResponse | None = None
+    error: ErrorDetail | None = None
+
+
+class RouteMatrixResponse(BaseModel):
+    origins: list[Coordinate | None]
+    destinations: list[Coordinate | None]
+    cells: list[RouteMatrixCellResponse]
+    assumptions: dict[str, float]
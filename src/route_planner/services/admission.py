@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterator
+from types import TracebackType
+
+from django.conf import settings
+
+from route_planner.exceptions import PlannerOverloadedError
+
+
+class AdmissionSlot:
+    """One admitted planning request holding ``permits`` planning threads.
+
+    Releasing it more than once is a no-op.
+    """
+
+    def __init__(self, controller: AdmissionController, permits: int = 1) -> None:
+        self._controller = controller
+        self.permits = permits
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release(self.permits)
+
+    def __enter__(self) -> AdmissionSlot:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Bound concurrent planning threads per process and shed load beyond a short wait.
+
+    Requests wait at most ``queue_timeout_seconds`` for a slot and are then rejected
+    with ``PlannerOverloadedError``, so a burst cannot tie up every worker thread in
+    upstream retries. Work that fans out over a thread pool is charged one slot per
+    planning thread, and sizes its pool from the slots it got.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        queue_timeout_seconds: float | None = None,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency or settings.PLAN_MAX_CONCURRENCY)
+        self.queue_timeout_seconds = (
+            settings.PLAN_QUEUE_TIMEOUT_SECONDS
+            if queue_timeout_seconds is None
+            else queue_timeout_seconds
+        )
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def admit(self, max_permits: int = 1, *, block: bool = False) -> AdmissionSlot:
+        """Take one slot, plus up to ``max_permits - 1`` more that are free right now.
+
+        With ``block``, wait for the first slot as long as it takes instead of
+        ``queue_timeout_seconds``; background workers use it to queue rather than fail.
+        """
+        if not self._semaphore.acquire(timeout=None if block else self.queue_timeout_seconds):
+            raise PlannerOverloadedError("Route planner is at capacity, retry shortly")
+        permits = 1
+        while permits < max_permits and self._semaphore.acquire(blocking=False):
+            permits += 1
+        with self._lock:
+            self._in_flight += permits
+        return AdmissionSlot(self, permits)
+
+    def _release(self, permits: int) -> None:
+        with self._lock:
+            self._in_flight -= permits
+        for _ in range(permits):
+            self._semaphore.release()
+
+
+class SlotReleasingIterator:
+    """Wrap a streaming body so its admission slot is held until the stream ends or closes."""
+
+    def __init__(self, iterator: Iterator[bytes], slot: AdmissionSlot) -> None:
+        self._iterator = iterator
+        self._slot = slot
+
+    def __iter__(self) -> SlotReleasingIterator:
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self._slot.release()
+            raise
+
+    def close(self) -> None:
+        close = getattr(self._iterator, "close", None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            self._slot.release()
+
+
+_admission_controller: AdmissionController | None = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
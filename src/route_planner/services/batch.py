@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+
+from django.conf import settings
+
+from route_planner.exceptions import RoutePlannerError
+from route_planner.schemas import RoutePlanRequest, RoutePlanResponse
+from route_planner.services.geocoding import normalize_location
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.types import GeocodeResult, GeoPoint, RouteData
+from route_planner.services.workers import in_worker, outcome
+
+type RouteKey = tuple[float, ...]
+
+
+@dataclass(slots=True, frozen=True)
+class BatchItemResult:
+    index: int
+    response: RoutePlanResponse | None = None
+    error: RoutePlannerError | None = None
+
+
+class BatchRoutePlanner:
+    """Plan many requests while geocoding and routing each distinct input only once.
+
+    Unique locations are geocoded first; then each unique origin/destination pair is
+    routed once and every item on it runs station selection and optimization. Both
+    stages share one bounded thread pool.
+    """
+
+    def __init__(self, planner: RoutePlannerService, max_workers: int | None = None) -> None:
+        self.planner = planner
+        self.max_workers = max(1, max_workers or settings.BATCH_PLAN_MAX_WORKERS)
+
+    def plan(self, requests: list[RoutePlanRequest]) -> list[BatchItemResult]:
+        return sorted(self.iter_results(requests), key=lambda result: result.index)
+
+    def iter_results(self, requests: list[RoutePlanRequest]) -> Iterator[BatchItemResult]:
+        """Yield item results in completion order.
+
+        Items sharing an origin, stops and destination are routed once; each item is then
+        planned as its own task, so results stream as soon as they finish even when every
+        item shares one lane. At most ``max_workers`` tasks are in flight, and items of
+        routed lanes are planned before the next lane is fetched, so memory is bounded by
+        concurrency rather than by batch size.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="route-plan-batch"
+        ) as pool:
+            locations = self._geocode_locations(pool, requests)
+
+            route_groups: dict[RouteKey, tuple[tuple[GeoPoint, ...], list[int]]] = {}
+            for index, request in enumerate(requests):
+                waypoints = self._waypoints(request, locations)
+                if isinstance(waypoints, RoutePlannerError):
+                    yield BatchItemResult(index=index, error=waypoints)
+                    continue
+                route_groups.setdefault(_route_key(waypoints), (waypoints, []))[1].append(index)
+
+            pending_groups = iter(route_groups.values())
+            routed: deque[tuple[tuple[GeoPoint, ...], RouteData, deque[int]]] = deque()
+            route_futures: dict[
+                Future[RouteData | RoutePlannerError], tuple[tuple[GeoPoint, ...], list[int]]
+            ] = {}
+            item_futures: set[Future[BatchItemResult]] = set()
+
+            while True:
+                while len(route_futures) + len(item_futures) < self.max_workers:
+                    if routed:
+                        waypoints, route, indices = routed[0]
+                        index = indices.popleft()
+                        if not indices:
+                            routed.popleft()
+                        item_futures.add(
+                            pool.submit(
+                                in_worker, self._plan_item, requests, index, waypoints, route
+                            )
+                        )
+                        continue
+                    group = next(pending_groups, None)
+                    if group is None:
+                        break
+                    route_futures[pool.submit(in_worker, self._route, group[0])] = group
+
+                if not route_futures and not item_futures:
+                    return
+                done, _ = wait([*route_futures, *item_futures], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in item_futures:
+                        item_futures.discard(future)
+                        yield future.result()
+                        continue
+                    waypoints, indices = route_futures.pop(future)
+                    route = future.result()
+                    if isinstance(route, RoutePlannerError):
+                        for index in indices:
+                            yield BatchItemResult(index=index, error=route)
+                    else:
+                        routed.append((waypoints, route, deque(indices)))
+
+    def _route(self, waypoints: tuple[GeoPoint, ...]) -> RouteData | RoutePlannerError:
+        start, *via, finish = waypoints
+        if via:
+            return outcome(partial(self.planner.osrm_client.route_legs, list(waypoints)))
+        return outcome(partial(self.planner.osrm_client.route, start, finish))
+
+    def _plan_item(
+        self,
+        requests: list[RoutePlanRequest],
+        index: int,
+        waypoints: tuple[GeoPoint, ...],
+        route: RouteData,
+    ) -> BatchItemResult:
+        start, *via, finish = waypoints
+        response = outcome(
+            partial(self.planner.plan_route, requests[index], start, finish, route, via=via)
+        )
+        if isinstance(response, RoutePlannerError):
+            return BatchItemResult(index=index, error=response)
+        return BatchItemResult(index=index, response=response)
+
+    def _geocode_locations(
+        self, pool: ThreadPoolExecutor, requests: list[RoutePlanRequest]
+    ) -> dict[str, GeocodeResult | RoutePlannerError]:
+        queries: dict[str, str] = {}
+        for request in requests:
+            for location in (request.start_location, *request.waypoints, request.finish_location):
+                queries.setdefault(normalize_location(location), location)
+
+        futures = {
+            key: pool.submit(
+                in_worker, self.planner.geocoding_client.geocode, query, country_code="us"
+            )
+            for key, query in queries.items()
+        }
+        return {key: outcome(future.result) for key, future in futures.items()}
+
+    @staticmethod
+    def _waypoints(
+        request: RoutePlanRequest,
+        locations: dict[str, GeocodeResult | RoutePlannerError],
+    ) -> tuple[GeoPoint, ...] | RoutePlannerError:
+        points: list[GeoPoint] = []
+        for location in (request.start_location, *request.waypoints, request.finish_location):
+            geocoded = locations[normalize_location(location)]
+            if isinstance(geocoded, RoutePlannerError):
+                return geocoded
+            points.append(geocoded.point)
+        return tuple(points)
+
+
+def _route_key(waypoints: tuple[GeoPoint, ...]) -> RouteKey:
+    return tuple(
+        value
+        for point in waypoints
+        for value in (round(point.latitude, 5), round(point.longitude, 5))
+    )
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import F
+
+from route_planner.models import StationDataVersion
+
+STATION_DATA_VERSION_PK = 1
+
+
+def get_station_data_version() -> int:
+    version = (
+        StationDataVersion.objects.filter(pk=STATION_DATA_VERSION_PK)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_station_data_version() -> int:
+    with transaction.atomic():
+        StationDataVersion.objects.get_or_create(pk=STATION_DATA_VERSION_PK)
+        StationDataVersion.objects.filter(pk=STATION_DATA_VERSION_PK).update(
+            version=F("version") + 1
+        )
+        return get_station_data_version()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from django.conf import settings
+
+from route_planner.services.osrm import OsrmClient
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.station_selection import candidate_points
+from route_planner.services.types import CandidateSet
+
+
+def detour_price_adjustments(
+    candidates: CandidateSet,
+    route: PreparedRoute,
+    osrm_client: OsrmClient,
+    mpg: float,
+    tank_capacity_gallons: float,
+) -> list[float]:
+    """Per-gallon surcharge for leaving the route to buy fuel at each candidate.
+
+    The detour is the drive from the candidate's closest point on the route to the station
+    and back. Its fuel, at the station's price, and its time, at ``DETOUR_COST_PER_HOUR``,
+    are spread over a full tank.
+
+    Only the candidates that look cheapest on straight-line offsets are priced through OSRM,
+    as many as fit in one table request (``OSRM_TABLE_MAX_COORDINATES // 2``). The others
+    are estimated from twice their straight-line offset, scaled by the road factor and
+    speed those OSRM detours showed. Candidates OSRM cannot reach, or whose station has
+    since been deleted, are estimated the same way.
+    """
+    if not len(candidates):
+        return []
+
+    mileposts = candidates.mileposts.tolist()
+    prices = candidates.prices.tolist()
+    offsets = candidates.offsets_miles.tolist()
+    pair_limit = max(1, osrm_client.table_max_coordinates // 2)
+    gallons_per_offset_mile = 2.0 / mpg / tank_capacity_gallons
+    ranked = sorted(
+        range(len(prices)),
+        key=lambda index: prices[index] * (1.0 + offsets[index] * gallons_per_offset_mile),
+    )
+    points = candidate_points(candidates)
+    priced = [(index, point) for index in ranked if (point := points[index]) is not None]
+    priced = priced[:pair_limit]
+
+    trips: list[tuple[float, float] | None] = [None] * len(prices)
+    if priced:
+        found = osrm_client.round_trips(
+            [route.point_at(mileposts[index]) for index, _ in priced],
+            [point for _, point in priced],
+        )
+        for (index, _), trip in zip(priced, found, strict=True):
+            trips[index] = trip
+
+    road_factor, seconds_per_mile = 1.0, 0.0
+    measured = [(trip, offsets[index]) for index, trip in enumerate(trips) if trip is not None]
+    straight_miles = sum(2.0 * offset for _, offset in measured)
+    road_miles = sum(trip[0] for trip, _ in measured)
+    if straight_miles > 0 and road_miles > 0:
+        road_factor = road_miles / straight_miles
+        seconds_per_mile = sum(trip[1] for trip, _ in measured) / road_miles
+
+    cost_per_second = settings.DETOUR_COST_PER_HOUR / 3600.0
+    adjustments: list[float] = []
+    for price, offset, trip in zip(prices, offsets, trips, strict=True):
+        if trip is None:
+            miles = 2.0 * offset * road_factor
+            trip = (miles, miles * seconds_per_mile)
+        miles, seconds = trip
+        detour_cost = miles / mpg * price + seconds * cost_per_second
+        adjustments.append(detour_cost / tank_capacity_gallons)
+    return adjustments
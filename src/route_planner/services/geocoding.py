@@ -9,6 +9,7 @@ from django.conf import settings
 from django.core.cache import cache
 
 from route_planner.exceptions import ExternalServiceError, InvalidLocationError
+from route_planner.services.metrics import record_cache
 from route_planner.services.types import GeocodeResult, GeoPoint
 
 
@@ -22,6 +23,7 @@ class GeocodingClient:
     def geocode(self, query: str, *, country_code: str = "us") -> GeocodeResult:
         cache_key = self._cache_key(query, country_code)
         cached = cache.get(cache_key)
+        record_cache("geocode", bool(cached))
         if cached:
             return GeocodeResult(
                 point=GeoPoint(latitude=cached["latitude"], longitude=cached["longitude"]),
@@ -72,7 +74,8 @@ class GeocodingClient:
 
     @staticmethod
     def _cache_key(query: str, country_code: str) -> str:
-        digest = hashlib.sha256(f"{query.lower()}|{country_code}".encode()).hexdigest()
+        normalized = normalize_location(query)
+        digest = hashlib.sha256(f"{normalized}|{country_code}".encode()).hexdigest()
         return f"geocode:{digest}"
 
     @staticmethod
@@ -95,3 +98,7 @@ class GeocodingClient:
             point=GeoPoint(latitude=latitude, longitude=longitude),
             country_code=country_code,
         )
+
+
+def normalize_location(query: str) -> str:
+    return " ".join(query.split()).lower()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import logging
+import pickle
+import queue
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from typing import Literal
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from route_planner.exceptions import (
+    PlanJobFailedError,
+    PlanJobNotFoundError,
+    PlannerOverloadedError,
+    RoutePlannerError,
+)
+from route_planner.models import StoredPlanJob
+
+logger = logging.getLogger(__name__)
+
+type JobKind = Literal["plan", "batch"]
+type JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+POLL_INTERVAL_SECONDS = 0.5
+
+
+@dataclass(slots=True, frozen=True)
+class PlanJob:
+    job_id: str
+    kind: JobKind
+    status: JobStatus
+    submitted_at: float
+    finished_at: float | None = None
+    result: bytes | None = None
+    error: RoutePlannerError | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+
+class PlanJobQueue:
+    """Run long plans on a local worker pool so web threads only submit and poll.
+
+    Jobs wait in a bounded in-process queue; when it is full, submission fails with
+    ``PlannerOverloadedError`` instead of queueing unbounded work. Job state and results
+    are kept in the database for ``PLAN_JOB_TTL_SECONDS``, so any web process can answer a
+    poll. At most ``PLAN_JOB_MAX_WAITERS`` polls per process long-poll at once, and always
+    fewer than ``GUNICORN_THREADS``; the rest get the job as it stands. Workers start with
+    the first submission, after any fork, and first fail jobs a previous process left
+    unfinished (``fail_stale``).
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_queued: int | None = None,
+        ttl_seconds: int | None = None,
+        max_waiters: int | None = None,
+    ) -> None:
+        self.workers = max(1, workers or settings.PLAN_JOB_WORKERS)
+        self.ttl_seconds = settings.PLAN_JOB_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._queue: queue.Queue[tuple[PlanJob, Callable[[], bytes]]] = queue.Queue(
+            maxsize=max(1, max_queued or settings.PLAN_JOB_QUEUE_SIZE)
+        )
+        self.max_waiters = max(
+            0,
+            min(
+                settings.PLAN_JOB_MAX_WAITERS if max_waiters is None else max_waiters,
+                settings.GUNICORN_THREADS - 1,
+            ),
+        )
+        self._waiters = threading.BoundedSemaphore(self.max_waiters)
+        self._finished: dict[str, threading.Event] = {}
+        self._threads: list[threading.Thread] = []
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def submit(self, kind: JobKind, run: Callable[[], bytes]) -> PlanJob:
+        """Queue ``run``, which returns the serialized result or raises a planner error."""
+        self._start_workers()
+        job = PlanJob(job_id=uuid.uuid4().hex, kind=kind, status="queued", submitted_at=time.time())
+        self._store(job)
+        with self._lock:
+            self._finished[job.job_id] = threading.Event()
+        try:
+            self._queue.put_nowait((job, run))
+        except queue.Full as exc:
+            with self._lock:
+                self._finished.pop(job.job_id, None)
+            StoredPlanJob.objects.filter(job_id=job.job_id).delete()
+            raise PlannerOverloadedError("Plan job queue is full, retry shortly") from exc
+        return job
+
+    def get(self, job_id: str) -> PlanJob:
+        stored = StoredPlanJob.objects.filter(job_id=job_id, expires_at__gt=timezone.now()).first()
+        if stored is None:
+            raise PlanJobNotFoundError("Job is unknown or its result has expired")
+        return PlanJob(
+            job_id=stored.job_id,
+            kind=stored.kind,
+            status=stored.status,
+            submitted_at=stored.submitted_at,
+            finished_at=stored.finished_at,
+            result=bytes(stored.result) if stored.result is not None else None,
+            error=pickle.loads(stored.error) if stored.error is not None else None,
+        )
+
+    def wait(self, job_id: str, timeout_seconds: float) -> PlanJob:
+        """Return the job once it is done, or as it stands after ``timeout_seconds``."""
+        job = self.get(job_id)
+        if job.done or timeout_seconds <= 0:
+            return job
+        if not self._waiters.acquire(blocking=False):
+            return job
+
+        try:
+            finished = self._finished.get(job_id)
+            if finished is not None:
+                finished.wait(timeout_seconds)
+                return self.get(job_id)
+
+            # Queued by another process: all that is shared is the database.
+            deadline = time.monotonic() + timeout_seconds
+            while not job.done and time.monotonic() < deadline:
+                time.sleep(min(POLL_INTERVAL_SECONDS, max(0.0, deadline - time.monotonic())))
+                job = self.get(job_id)
+            return job
+        finally:
+            self._waiters.release()
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self.fail_stale()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"plan-job-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            job, run = self._queue.get()
+            with self._lock:
+                self._running += 1
+            self._store(replace(job, status="running"))
+            try:
+                job = replace(job, status="succeeded", result=run())
+            except RoutePlannerError as exc:
+                job = replace(job, status="failed", error=exc)
+            except Exception:
+                logger.exception("Plan job %s failed", job.job_id)
+                job = replace(job, status="failed", error=PlanJobFailedError("Plan job failed"))
+            finally:
+                connections.close_all()
+                with self._lock:
+                    self._running -= 1
+
+            self._store(replace(job, finished_at=time.time()))
+            with self._lock:
+                finished = self._finished.pop(job.job_id, None)
+            if finished is not None:
+                finished.set()
+            self._queue.task_done()
+
+    def _store(self, job: PlanJob) -> None:
+        StoredPlanJob.objects.bulk_create(
+            [
+                StoredPlanJob(
+                    job_id=job.job_id,
+                    kind=job.kind,
+                    status=job.status,
+                    submitted_at=job.submitted_at,
+                    finished_at=job.finished_at,
+                    result=job.result,
+                    error=(
+                        pickle.dumps(job.error, protocol=pickle.HIGHEST_PROTOCOL)
+                        if job.error is not None
+                        else None
+                    ),
+                    expires_at=timezone.now() + timedelta(seconds=self.ttl_seconds),
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["job_id"],
+            update_fields=["status", "finished_at", "result", "error", "expires_at", "updated_at"],
+        )
+
+    @staticmethod
+    def fail_stale() -> int:
+        """Fail jobs left queued or running by a process that exited.
+
+        A job whose row has not changed for ``PLAN_JOB_STALE_SECONDS`` is taken to be lost
+        with its process, so polls report it failed instead of waiting for it forever.
+        """
+        cutoff = timezone.now() - timedelta(seconds=settings.PLAN_JOB_STALE_SECONDS)
+        return StoredPlanJob.objects.filter(
+            status__in=("queued", "running"), updated_at__lt=cutoff
+        ).update(
+            status="failed",
+            finished_at=time.time(),
+            error=pickle.dumps(
+                PlanJobFailedError("Plan job was lost when its process stopped"),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            ),
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def purge_expired() -> int:
+        deleted, _ = StoredPlanJob.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+_plan_job_queue: PlanJobQueue | None = None
+_plan_job_queue_lock = threading.Lock()
+
+
+def get_plan_job_queue() -> PlanJobQueue:
+    global _plan_job_queue
+    if _plan_job_queue is None:
+        with _plan_job_queue_lock:
+            if _plan_job_queue is None:
+                _plan_job_queue = PlanJobQueue()
+    return _plan_job_queue
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+from django.conf import settings
+
+from route_planner.exceptions import NoRouteFoundError, RoutePlannerError
+from route_planner.schemas import MatrixPair, RouteMatrixRequest, RoutePlanResponse
+from route_planner.services.geocoding import normalize_location
+from route_planner.services.metrics import stage
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.price_surface import PriceSurface, get_price_surface
+from route_planner.services.types import GeocodeResult, GeoPoint
+from route_planner.services.workers import in_worker, outcome
+
+
+@dataclass(slots=True, frozen=True)
+class MatrixCell:
+    origin: int
+    destination: int
+    distance_miles: float | None = None
+    duration_seconds: float | None = None
+    price_per_gallon: float | None = None
+    fuel_gallons: float | None = None
+    fuel_cost: float | None = None
+    plan: RoutePlanResponse | None = None
+    error: RoutePlannerError | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class MatrixResult:
+    origins: list[GeoPoint | None]
+    destinations: list[GeoPoint | None]
+    cells: list[MatrixCell]
+    vehicle_mpg: float
+
+
+class RouteMatrixService:
+    """Estimate fuel cost for every origin/destination pair without planning each one.
+
+    Distances come from batched OSRM ``table`` calls and prices from the regional
+    price surface. Only pairs listed in ``detail`` get a full fuel-stop plan.
+    """
+
+    def __init__(
+        self,
+        planner: RoutePlannerService,
+        price_surface: PriceSurface | None = None,
+        max_workers: int | None = None,
+    ) -> None:
+        self.planner = planner
+        self.price_surface = price_surface
+        self.max_workers = max(1, max_workers or settings.BATCH_PLAN_MAX_WORKERS)
+
+    def estimate(self, request: RouteMatrixRequest) -> MatrixResult:
+        vehicle_mpg = request.vehicle_mpg or float(settings.VEHICLE_MPG)
+        price_surface = self.price_surface or get_price_surface()
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="route-matrix"
+        ) as pool:
+            locations = self._geocode_locations(pool, [*request.origins, *request.destinations])
+            origins = [locations[normalize_location(query)] for query in request.origins]
+            destinations = [locations[normalize_location(query)] for query in request.destinations]
+            cells = self._estimate_cells(origins, destinations, price_surface, vehicle_mpg)
+
+            detail_futures = {
+                (pair.origin, pair.destination): pool.submit(
+                    in_worker, self._plan_pair, request, pair, origins, destinations
+                )
+                for pair in request.detail
+                if cells[pair.origin * len(destinations) + pair.destination].error is None
+            }
+            for (origin, destination), future in detail_futures.items():
+                index = origin * len(destinations) + destination
+                plan = outcome(future.result)
+                if isinstance(plan, RoutePlannerError):
+                    cells[index] = replace(cells[index], error=plan)
+                else:
+                    cells[index] = replace(cells[index], plan=plan)
+
+        return MatrixResult(
+            origins=[_point(origin) for origin in origins],
+            destinations=[_point(destination) for destination in destinations],
+            cells=cells,
+            vehicle_mpg=vehicle_mpg,
+        )
+
+    def _estimate_cells(
+        self,
+        origins: list[GeocodeResult | RoutePlannerError],
+        destinations: list[GeocodeResult | RoutePlannerError],
+        price_surface: PriceSurface,
+        vehicle_mpg: float,
+    ) -> list[MatrixCell]:
+        origin_points = {
+            index: origin.point
+            for index, origin in enumerate(origins)
+            if isinstance(origin, GeocodeResult)
+        }
+        destination_points = {
+            index: destination.point
+            for index, destination in enumerate(destinations)
+            if isinstance(destination, GeocodeResult)
+        }
+
+        table_error: RoutePlannerError | None = None
+        distances: dict[tuple[int, int], tuple[float | None, float | None]] = {}
+        if origin_points and destination_points:
+            try:
+                with stage("table"):
+                    table = self.planner.osrm_client.table(
+                        list(origin_points.values()), list(destination_points.values())
+                    )
+            except RoutePlannerError as exc:
+                table_error = exc
+            else:
+                for row, origin_index in enumerate(origin_points):
+                    for column, destination_index in enumerate(destination_points):
+                        distances[origin_index, destination_index] = (
+                            table.distances_miles[row][column],
+                            table.durations_seconds[row][column],
+                        )
+
+        cells: list[MatrixCell] = []
+        for origin_index, origin in enumerate(origins):
+            for destination_index, destination in enumerate(destinations):
+                error = _first_error(origin, destination) or table_error
+                distance_miles, duration_seconds = distances.get(
+                    (origin_index, destination_index), (None, None)
+                )
+                if error is None and distance_miles is None:
+                    error = NoRouteFoundError("Could not compute route")
+                if error is not None or distance_miles is None:
+                    cells.append(
+                        MatrixCell(origin=origin_index, destination=destination_index, error=error)
+                    )
+                    continue
+
+                price = price_surface.price_between(
+                    origin_points[origin_index], destination_points[destination_index]
+                )
+                gallons = distance_miles / vehicle_mpg
+                cells.append(
+                    MatrixCell(
+                        origin=origin_index,
+                        destination=destination_index,
+                        distance_miles=distance_miles,
+                        duration_seconds=duration_seconds,
+                        price_per_gallon=price,
+                        fuel_gallons=gallons,
+                        fuel_cost=gallons * price if price is not None else None,
+                    )
+                )
+        return cells
+
+    def _plan_pair(
+        self,
+        request: RouteMatrixRequest,
+        pair: MatrixPair,
+        origins: list[GeocodeResult | RoutePlannerError],
+        destinations: list[GeocodeResult | RoutePlannerError],
+    ) -> RoutePlanResponse:
+        origin = origins[pair.origin]
+        destination = destinations[pair.destination]
+        if isinstance(origin, RoutePlannerError):
+            raise origin
+        if isinstance(destination, RoutePlannerError):
+            raise destination
+        start, finish = origin.point, destination.point
+        route = self.planner.osrm_client.route(start, finish)
+        return self.planner.plan_route(request.plan_request(pair), start, finish, route)
+
+    def _geocode_locations(
+        self, pool: ThreadPoolExecutor, queries: list[str]
+    ) -> dict[str, GeocodeResult | RoutePlannerError]:
+        unique_queries: dict[str, str] = {}
+        for query in queries:
+            unique_queries.setdefault(normalize_location(query), query)
+
+        futures = {
+            key: pool.submit(
+                in_worker, self.planner.geocoding_client.geocode, query, country_code="us"
+            )
+            for key, query in unique_queries.items()
+        }
+        return {key: outcome(future.result) for key, future in futures.items()}
+
+
+def _point(location: GeocodeResult | RoutePlannerError) -> GeoPoint | None:
+    return location.point if isinstance(location, GeocodeResult) else None
+
+
+def _first_error(
+    origin: GeocodeResult | RoutePlannerError, destination: GeocodeResult | RoutePlannerError
+) -> RoutePlannerError | None:
+    if isinstance(origin, RoutePlannerError):
+        return origin
+    if isinstance(destination, RoutePlannerError):
+        return destination
+    return None
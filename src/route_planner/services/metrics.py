@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+STAGE_BUCKETS_SECONDS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Stage timings of the current request, read by ServerTimingMiddleware.
+request_timings: ContextVar[list[tuple[str, float]] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = STAGE_BUCKETS_SECONDS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process stage histograms and cache counters, rendered as Prometheus text."""
+
+    def __init__(self) -> None:
+        self._stages: dict[str, Histogram] = {}
+        self._cache_requests: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = Histogram()
+            histogram.observe(seconds)
+
+    def record_cache(self, cache_name: str, hit: bool) -> None:
+        key = (cache_name, "hit" if hit else "miss")
+        with self._lock:
+            self._cache_requests[key] = self._cache_requests.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            stages = {
+                name: (list(histogram.counts), histogram.total, histogram.count)
+                for name, histogram in self._stages.items()
+            }
+            cache_requests = dict(self._cache_requests)
+
+        lines = [
+            "# HELP route_planner_stage_seconds Time spent in each route planning stage.",
+            "# TYPE route_planner_stage_seconds histogram",
+        ]
+        for name, (counts, total, count) in sorted(stages.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*STAGE_BUCKETS_SECONDS, "+Inf"), counts, strict=True):
+                cumulative += bucket_count
+                lines.append(
+                    f'route_planner_stage_seconds_bucket{{stage="{name}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(f'route_planner_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'route_planner_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines.extend(
+            [
+                "# HELP route_planner_cache_requests_total Cache lookups by cache and result.",
+                "# TYPE route_planner_cache_requests_total counter",
+            ]
+        )
+        for (cache_name, result), value in sorted(cache_requests.items()):
+            lines.append(
+                f'route_planner_cache_requests_total{{cache="{cache_name}",result="{result}"}} '
+                f"{value}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a planning stage into its histogram and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe_stage(name, elapsed)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_cache(cache_name: str, hit: bool) -> None:
+    metrics.record_cache(cache_name, hit)
@@ -1,77 +1,149 @@
 from __future__ import annotations
 
+from array import array
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, replace
+from typing import Literal
+
 from route_planner.exceptions import NoFeasibleFuelPlanError
-from route_planner.services.types import CandidateStation, FuelStopPlan, OptimizationResult
+from route_planner.services.types import (
+    CandidateSet,
+    CandidateStation,
+    FuelStopPlan,
+    OptimizationResult,
+)
 
 EPSILON = 1e-6
 
+# candidate index, gallons purchased, fuel before, fuel after
+type _Purchase = tuple[int, float, float, float]
 
-def optimize_fuel_plan(
-    candidates: list[CandidateStation],
+
+@dataclass(slots=True, frozen=True)
+class FuelPurchasePlan:
+    """Purchases chosen over a ``CandidateSet``, by candidate index, before hydration."""
+
+    optimizer_used: Literal["baseline", "ortools"]
+    purchases: list[_Purchase]
+
+    @property
+    def indexes(self) -> list[int]:
+        return [purchase[0] for purchase in self.purchases]
+
+
+def choose_fuel_purchases(
+    candidates: CandidateSet,
     route_distance_miles: float,
     start_fuel_gallons: float,
     mpg: float,
     tank_capacity_gallons: float,
     max_range_miles: float,
     optimizer: str,
-) -> OptimizationResult:
-    ordered = sorted(candidates, key=lambda candidate: candidate.milepost)
+    price_adjustments: Sequence[float] | None = None,
+) -> FuelPurchasePlan:
+    """Choose fuel purchases over ``candidates``, which must be ordered by milepost.
+
+    ``price_adjustments``, aligned with ``candidates``, are added to each price when
+    choosing stops; purchases are still costed at the station's own price by
+    ``fuel_plan_result``.
+    """
+    effective_set = candidates
+    if price_adjustments is not None:
+        adjusted = [
+            price + adjustment
+            for price, adjustment in zip(candidates.prices.tolist(), price_adjustments, strict=True)
+        ]
+        effective_set = replace(candidates, prices=array("d", adjusted))
+
+    arguments = (
+        effective_set,
+        route_distance_miles,
+        start_fuel_gallons,
+        mpg,
+        tank_capacity_gallons,
+        max_range_miles,
+    )
     if optimizer == "ortools":
         try:
-            return _optimize_with_ortools(
-                ordered,
-                route_distance_miles,
-                start_fuel_gallons,
-                mpg,
-                tank_capacity_gallons,
-                max_range_miles,
-            )
+            return FuelPurchasePlan("ortools", _optimize_with_ortools(*arguments))
         except Exception:
-            return _optimize_baseline(
-                ordered,
-                route_distance_miles,
-                start_fuel_gallons,
-                mpg,
-                tank_capacity_gallons,
-                max_range_miles,
-            )
-
-    return _optimize_baseline(
-        ordered,
+            pass
+    return FuelPurchasePlan("baseline", _optimize_baseline(*arguments))
+
+
+def fuel_plan_result(
+    candidates: CandidateSet,
+    plan: FuelPurchasePlan,
+    stations: Mapping[int, CandidateStation],
+) -> OptimizationResult:
+    """Turn ``plan`` into stops, given the hydrated ``stations`` at its candidate indexes."""
+    stops = [
+        FuelStopPlan(
+            station=stations[index],
+            gallons_purchased=gallons,
+            cost=gallons * candidates.prices[index],
+            fuel_before_gallons=fuel_before,
+            fuel_after_gallons=fuel_after,
+        )
+        for index, gallons, fuel_before, fuel_after in plan.purchases
+    ]
+    return OptimizationResult(
+        optimizer_used=plan.optimizer_used,
+        stops=stops,
+        total_gallons_purchased=sum(stop.gallons_purchased for stop in stops),
+        total_fuel_cost=sum(stop.cost for stop in stops),
+    )
+
+
+def optimize_fuel_plan(
+    candidates: Sequence[CandidateStation],
+    route_distance_miles: float,
+    start_fuel_gallons: float,
+    mpg: float,
+    tank_capacity_gallons: float,
+    max_range_miles: float,
+    optimizer: str,
+) -> OptimizationResult:
+    """Choose fuel stops over already hydrated ``candidates``, in any order."""
+    stations = sorted(candidates, key=lambda candidate: candidate.milepost)
+    candidate_set = CandidateSet.from_stations(stations)
+    plan = choose_fuel_purchases(
+        candidate_set,
         route_distance_miles,
         start_fuel_gallons,
         mpg,
         tank_capacity_gallons,
         max_range_miles,
+        optimizer,
     )
+    return fuel_plan_result(candidate_set, plan, dict(enumerate(stations)))
 
 
 def _optimize_baseline(
-    candidates: list[CandidateStation],
+    candidates: CandidateSet,
     route_distance_miles: float,
     start_fuel_gallons: float,
     mpg: float,
     tank_capacity_gallons: float,
     max_range_miles: float,
-) -> OptimizationResult:
+) -> list[_Purchase]:
     if route_distance_miles <= start_fuel_gallons * mpg + EPSILON:
-        return OptimizationResult(
-            optimizer_used="baseline",
-            stops=[],
-            total_gallons_purchased=0.0,
-            total_fuel_cost=0.0,
-        )
+        return []
 
-    if not candidates:
+    if not len(candidates):
         raise NoFeasibleFuelPlanError("No candidate stations available along route")
 
+    # Unboxed once; indexing the arrays directly would allocate a float per access.
+    mileposts = candidates.mileposts.tolist()
+    prices = candidates.prices.tolist()
     effective_max_range_miles = min(max_range_miles, tank_capacity_gallons * mpg)
     current_fuel = start_fuel_gallons
     previous_milepost = 0.0
-    stops: list[FuelStopPlan] = []
+    purchases: list[_Purchase] = []
+    reachable_end = 0
 
-    for index, station in enumerate(candidates):
-        travel_miles = station.milepost - previous_milepost
+    for index, milepost in enumerate(mileposts):
+        travel_miles = milepost - previous_milepost
         if travel_miles < -EPSILON:
             continue
 
@@ -80,37 +152,41 @@ def _optimize_baseline(
             raise NoFeasibleFuelPlanError("Cannot reach next station with available fuel")
         current_fuel = max(current_fuel, 0.0)
 
-        remaining_distance = route_distance_miles - station.milepost
+        remaining_distance = route_distance_miles - milepost
         if remaining_distance <= current_fuel * mpg + EPSILON:
-            previous_milepost = station.milepost
+            previous_milepost = milepost
             continue
 
-        reachable_stations = [
-            candidate
-            for candidate in candidates[index + 1 :]
-            if candidate.milepost - station.milepost <= effective_max_range_miles + EPSILON
-        ]
+        # Candidates are ordered by milepost, so the reachable ones are a contiguous run
+        # whose end only moves forward.
+        reachable_end = max(reachable_end, index + 1)
+        while (
+            reachable_end < len(mileposts)
+            and mileposts[reachable_end] - milepost <= effective_max_range_miles + EPSILON
+        ):
+            reachable_end += 1
+        has_reachable = reachable_end > index + 1
         can_reach_end_with_full_tank = remaining_distance <= effective_max_range_miles + EPSILON
-        if not reachable_stations and not can_reach_end_with_full_tank:
+        if not has_reachable and not can_reach_end_with_full_tank:
             raise NoFeasibleFuelPlanError("Route contains a gap longer than the vehicle range")
 
-        cheaper_station = next(
+        cheaper_index = next(
             (
                 candidate
-                for candidate in reachable_stations
-                if candidate.price_per_gallon + EPSILON < station.price_per_gallon
+                for candidate in range(index + 1, reachable_end)
+                if prices[candidate] + EPSILON < prices[index]
             ),
             None,
         )
 
-        if cheaper_station is not None:
-            target_milepost = cheaper_station.milepost
+        if cheaper_index is not None:
+            target_milepost = mileposts[cheaper_index]
         elif can_reach_end_with_full_tank:
             target_milepost = route_distance_miles
         else:
-            target_milepost = reachable_stations[-1].milepost
+            target_milepost = mileposts[reachable_end - 1]
 
-        required_fuel = max(0.0, (target_milepost - station.milepost) / mpg)
+        required_fuel = max(0.0, (target_milepost - milepost) / mpg)
         gallons_to_buy = min(
             tank_capacity_gallons - current_fuel, max(0.0, required_fuel - current_fuel)
         )
@@ -118,18 +194,10 @@ def _optimize_baseline(
         if gallons_to_buy > EPSILON:
             fuel_before = current_fuel
             fuel_after = fuel_before + gallons_to_buy
-            stops.append(
-                FuelStopPlan(
-                    station=station,
-                    gallons_purchased=gallons_to_buy,
-                    cost=gallons_to_buy * station.price_per_gallon,
-                    fuel_before_gallons=fuel_before,
-                    fuel_after_gallons=fuel_after,
-                )
-            )
+            purchases.append((index, gallons_to_buy, fuel_before, fuel_after))
             current_fuel = fuel_after
 
-        previous_milepost = station.milepost
+        previous_milepost = milepost
 
     remaining_to_finish = route_distance_miles - previous_milepost
     current_fuel -= remaining_to_finish / mpg
@@ -138,33 +206,21 @@ def _optimize_baseline(
             "Cannot reach destination with available stations and constraints"
         )
 
-    total_gallons = sum(stop.gallons_purchased for stop in stops)
-    total_cost = sum(stop.cost for stop in stops)
-    return OptimizationResult(
-        optimizer_used="baseline",
-        stops=stops,
-        total_gallons_purchased=total_gallons,
-        total_fuel_cost=total_cost,
-    )
+    return purchases
 
 
 def _optimize_with_ortools(
-    candidates: list[CandidateStation],
+    candidates: CandidateSet,
     route_distance_miles: float,
     start_fuel_gallons: float,
     mpg: float,
     tank_capacity_gallons: float,
     max_range_miles: float,
-) -> OptimizationResult:
+) -> list[_Purchase]:
     if route_distance_miles <= start_fuel_gallons * mpg + EPSILON:
-        return OptimizationResult(
-            optimizer_used="ortools",
-            stops=[],
-            total_gallons_purchased=0.0,
-            total_fuel_cost=0.0,
-        )
+        return []
 
-    if not candidates:
+    if not len(candidates):
         raise NoFeasibleFuelPlanError("No candidate stations available along route")
 
     try:
@@ -173,8 +229,7 @@ def _optimize_with_ortools(
         raise NoFeasibleFuelPlanError("OR-Tools is not available") from exc
 
     effective_max_range_miles = min(max_range_miles, tank_capacity_gallons * mpg)
-    point_miles = [0.0, *[station.milepost for station in candidates], route_distance_miles]
-
+    point_miles = [0.0, *candidates.mileposts.tolist(), route_distance_miles]
     for index in range(len(point_miles) - 1):
         if point_miles[index + 1] + EPSILON < point_miles[index]:
             raise NoFeasibleFuelPlanError("Stations are not ordered correctly")
@@ -210,42 +265,23 @@ def _optimize_with_ortools(
             solver.Add(fuel_before[next_index] == fuel_before[index] + buy_here - fuel_used)
 
     objective = solver.Objective()
-    for station_index, station in enumerate(candidates, start=1):
-        objective.SetCoefficient(station_buy[station_index], station.price_per_gallon)
+    for station_index, price in enumerate(candidates.prices.tolist(), start=1):
+        objective.SetCoefficient(station_buy[station_index], price)
     objective.SetMinimization()
 
     result_status = solver.Solve()
     if result_status != pywraplp.Solver.OPTIMAL:
         raise NoFeasibleFuelPlanError("No feasible solution for fuel optimization")
 
-    stops: list[FuelStopPlan] = []
-    total_gallons = 0.0
-    total_cost = 0.0
-
-    for station_index, station in enumerate(candidates, start=1):
+    purchases: list[_Purchase] = []
+    for station_index in range(1, len(point_miles) - 1):
         gallons = station_buy[station_index].solution_value()
         if gallons <= 1e-4:
             continue
 
         fuel_before_value = fuel_before[station_index].solution_value()
-        fuel_after_value = fuel_before_value + gallons
-        cost = gallons * station.price_per_gallon
-
-        stops.append(
-            FuelStopPlan(
-                station=station,
-                gallons_purchased=gallons,
-                cost=cost,
-                fuel_before_gallons=fuel_before_value,
-                fuel_after_gallons=fuel_after_value,
-            )
+        purchases.append(
+            (station_index - 1, gallons, fuel_before_value, fuel_before_value + gallons)
         )
-        total_gallons += gallons
-        total_cost += cost
 
-    return OptimizationResult(
-        optimizer_used="ortools",
-        stops=stops,
-        total_gallons_purchased=total_gallons,
-        total_fuel_cost=total_cost,
-    )
+    return purchases
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import hashlib
 import time
+from itertools import pairwise
 from typing import Any
 
 import httpx
@@ -9,7 +10,8 @@ from django.conf import settings
 from django.core.cache import cache
 
 from route_planner.exceptions import ExternalServiceError, NoRouteFoundError
-from route_planner.services.types import GeoPoint, RouteData
+from route_planner.services.metrics import record_cache
+from route_planner.services.types import GeoPoint, RouteData, TableData
 
 METERS_TO_MILES = 0.000621371
 
@@ -19,6 +21,7 @@ class OsrmClient:
         self.base_url = settings.OSRM_BASE_URL.rstrip("/")
         self.timeout = settings.OSRM_TIMEOUT_SECONDS
         self.retry_count = settings.OSRM_RETRY_COUNT
+        self.table_max_coordinates = settings.OSRM_TABLE_MAX_COORDINATES
 
     def route(self, start: GeoPoint, finish: GeoPoint) -> RouteData:
         return self.route_through([start, finish])
@@ -29,6 +32,7 @@ class OsrmClient:
 
         cache_key = self._cache_key(waypoints)
         cached = cache.get(cache_key)
+        record_cache("route", bool(cached))
         if cached:
             return RouteData(
                 coordinates=[tuple(coord) for coord in cached["coordinates"]],
@@ -45,23 +49,144 @@ class OsrmClient:
             "annotations": "false",
         }
 
+        payload = self._get_json(endpoint, params)
+        route_data = self._parse_response(payload)
+        cache.set(
+            cache_key,
+            {
+                "coordinates": route_data.coordinates,
+                "distance_miles": route_data.distance_miles,
+                "duration_seconds": route_data.duration_seconds,
+            },
+            timeout=settings.ROUTE_CACHE_TTL_SECONDS,
+        )
+        return route_data
+
+    def route_legs(self, waypoints: list[GeoPoint]) -> RouteData:
+        """Route through ``waypoints`` one leg at a time and join the legs.
+
+        Each leg is cached on its own, so moving one stop only re-routes its two legs.
+        """
+        if len(waypoints) < 2:
+            raise NoRouteFoundError("At least two route waypoints are required")
+
+        legs = [self.route_through([start, finish]) for start, finish in pairwise(waypoints)]
+        if len(legs) == 1:
+            return legs[0]
+        coordinates = list(legs[0].coordinates)
+        for leg in legs[1:]:
+            coordinates.extend(leg.coordinates[1:])
+        return RouteData(
+            coordinates=coordinates,
+            distance_miles=sum(leg.distance_miles for leg in legs),
+            duration_seconds=sum(leg.duration_seconds for leg in legs),
+            legs=tuple(legs),
+        )
+
+    def table(self, sources: list[GeoPoint], destinations: list[GeoPoint]) -> TableData:
+        """Return driving distances and durations for every source/destination pair.
+
+        Large matrices are split into blocks of at most ``OSRM_TABLE_MAX_COORDINATES``
+        coordinates per request; unreachable pairs are ``None``.
+        """
+        distances: list[list[float | None]] = [[None] * len(destinations) for _ in sources]
+        durations: list[list[float | None]] = [[None] * len(destinations) for _ in sources]
+        source_block_size = max(1, min(len(sources), self.table_max_coordinates // 2))
+        destination_block_size = max(1, self.table_max_coordinates - source_block_size)
+        for source_offset in range(0, len(sources), source_block_size):
+            source_block = sources[source_offset : source_offset + source_block_size]
+            for destination_offset in range(0, len(destinations), destination_block_size):
+                destination_block = destinations[
+                    destination_offset : destination_offset + destination_block_size
+                ]
+                block_distances, block_durations = self._table_block(
+                    [*source_block, *destination_block],
+                    sources=range(len(source_block)),
+                    destinations=range(
+                        len(source_block), len(source_block) + len(destination_block)
+                    ),
+                )
+                for row, (distance_row, duration_row) in enumerate(
+                    zip(block_distances, block_durations, strict=True)
+                ):
+                    target = source_offset + row
+                    end = destination_offset + len(destination_block)
+                    distances[target][destination_offset:end] = distance_row
+                    durations[target][destination_offset:end] = duration_row
+        return TableData(distances_miles=distances, durations_seconds=durations)
+
+    def round_trips(
+        self, origins: list[GeoPoint], destinations: list[GeoPoint]
+    ) -> list[tuple[float, float] | None]:
+        """Return ``(miles, seconds)`` to drive from each origin to its destination and back.
+
+        Each table request carries a block of up to ``OSRM_TABLE_MAX_COORDINATES // 2``
+        pairs as both its sources and destinations. OSRM computes the full table over that
+        block, of which only the paired legs are read, so callers should keep the pair count
+        to one block where latency matters. Pairs with either leg unreachable are ``None``.
+        """
+        if len(origins) != len(destinations):
+            raise ValueError("origins and destinations must pair up")
+
+        trips: list[tuple[float, float] | None] = []
+        block_size = max(1, self.table_max_coordinates // 2)
+        for offset in range(0, len(origins), block_size):
+            block_origins = origins[offset : offset + block_size]
+            points = [*block_origins, *destinations[offset : offset + block_size]]
+            distances, durations = self._table_block(
+                points, sources=range(len(points)), destinations=range(len(points))
+            )
+            pairs = len(block_origins)
+            for index in range(pairs):
+                legs = [(index, pairs + index), (pairs + index, index)]
+                miles = [distances[row][column] for row, column in legs]
+                seconds = [durations[row][column] for row, column in legs]
+                if None in miles or None in seconds:
+                    trips.append(None)
+                else:
+                    trips.append((sum(miles), sum(seconds)))
+        return trips
+
+    def _table_block(
+        self, points: list[GeoPoint], sources: range, destinations: range
+    ) -> tuple[list[list[float | None]], list[list[float | None]]]:
+        """Fetch one table request over ``points``, indexed by ``sources``/``destinations``."""
+        cache_key = self._table_cache_key(points, sources, destinations)
+        cached = cache.get(cache_key)
+        record_cache("table", bool(cached))
+        if cached:
+            return cached
+
+        coordinates = ";".join(f"{point.longitude:.6f},{point.latitude:.6f}" for point in points)
+        params = {
+            "sources": ";".join(str(index) for index in sources),
+            "destinations": ";".join(str(index) for index in destinations),
+            "annotations": "distance,duration",
+        }
+        payload = self._get_json(f"{self.base_url}/table/v1/driving/{coordinates}", params)
+        if payload.get("code") != "Ok":
+            raise NoRouteFoundError("Could not compute distance table")
+
+        distances = [
+            [None if value is None else float(value) * METERS_TO_MILES for value in row]
+            for row in payload.get("distances") or []
+        ]
+        durations = [
+            [None if value is None else float(value) for value in row]
+            for row in payload.get("durations") or []
+        ]
+        if len(distances) != len(sources) or len(durations) != len(sources):
+            raise ExternalServiceError("OSRM table response is incomplete")
+
+        cache.set(cache_key, (distances, durations), timeout=settings.ROUTE_CACHE_TTL_SECONDS)
+        return distances, durations
+
+    def _get_json(self, endpoint: str, params: dict[str, str]) -> Any:
         for attempt in range(self.retry_count + 1):
             try:
                 response = httpx.get(endpoint, params=params, timeout=self.timeout)
                 response.raise_for_status()
-                route_data = self._parse_response(response.json())
-                cache.set(
-                    cache_key,
-                    {
-                        "coordinates": route_data.coordinates,
-                        "distance_miles": route_data.distance_miles,
-                        "duration_seconds": route_data.duration_seconds,
-                    },
-                    timeout=settings.ROUTE_CACHE_TTL_SECONDS,
-                )
-                return route_data
-            except NoRouteFoundError:
-                raise
+                return response.json()
             except httpx.HTTPError as exc:
                 if attempt >= self.retry_count:
                     raise ExternalServiceError("OSRM request failed") from exc
@@ -77,6 +202,18 @@ class OsrmClient:
         digest = hashlib.sha256(encoded).hexdigest()
         return f"route:{digest}"
 
+    @staticmethod
+    def _table_cache_key(points: list[GeoPoint], sources: range, destinations: range) -> str:
+        encoded = ";".join(
+            [
+                "|".join(f"{point.latitude:.5f}:{point.longitude:.5f}" for point in points),
+                f"{sources.start}-{sources.stop}",
+                f"{destinations.start}-{destinations.stop}",
+            ]
+        ).encode()
+        digest = hashlib.sha256(encoded).hexdigest()
+        return f"table:{digest}"
+
     @staticmethod
     def _parse_response(payload: Any) -> RouteData:
         if payload.get("code") != "Ok":
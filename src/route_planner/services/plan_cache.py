@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from route_planner.schemas import RoutePlanRequest
+from route_planner.services.geocoding import normalize_location
+from route_planner.services.metrics import record_cache
+
+
+@dataclass(slots=True, frozen=True)
+class CachedPlan:
+    etag: str
+    body: bytes
+
+
+class PlanCache:
+    """Cache serialized plan responses keyed on the normalized request and data version."""
+
+    def __init__(self, ttl_seconds: int | None = None) -> None:
+        self.ttl_seconds = settings.PLAN_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: str) -> CachedPlan | None:
+        if not self.enabled:
+            return None
+        cached = cache.get(key)
+        record_cache("plan", cached is not None)
+        if cached is None:
+            return None
+        etag, body = cached
+        return CachedPlan(etag=etag, body=body)
+
+    def store(self, key: str, body: bytes) -> CachedPlan:
+        plan = CachedPlan(etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body)
+        if self.enabled:
+            cache.set(key, (plan.etag, plan.body), timeout=self.ttl_seconds)
+        return plan
+
+    @staticmethod
+    def key_for(request: RoutePlanRequest, station_data_version: int) -> str:
+        normalized = request.model_dump()
+        normalized["start_location"] = normalize_location(request.start_location)
+        normalized["finish_location"] = normalize_location(request.finish_location)
+        normalized["waypoints"] = [normalize_location(location) for location in request.waypoints]
+        normalized["vehicle_mpg"] = request.vehicle_mpg or float(settings.VEHICLE_MPG)
+        normalized["tank_capacity_gallons"] = request.tank_capacity_gallons or float(
+            settings.FUEL_TANK_GALLONS
+        )
+        normalized["max_range_miles"] = request.max_range_miles or float(settings.MAX_RANGE_MILES)
+        encoded = json.dumps(
+            [normalized, station_data_version], sort_keys=True, separators=(",", ":")
+        ).encode()
+        return f"plan:{hashlib.sha256(encoded).hexdigest()}"
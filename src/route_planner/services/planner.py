@@ -1,20 +1,44 @@
 from __future__ import annotations
 
+import logging
+from collections.abc import Sequence
+from itertools import accumulate
+
 from django.conf import settings
+from django.db import DatabaseError
 
-from route_planner.exceptions import ExternalServiceError, NoRouteFoundError
+from route_planner.exceptions import (
+    ExternalServiceError,
+    InvalidLocationError,
+    NoFeasibleFuelPlanError,
+    NoRouteFoundError,
+)
 from route_planner.schemas import (
     Coordinate,
     FuelStopResponse,
     RoutePlanRequest,
     RoutePlanResponse,
+    RouteReplanRequest,
+    RouteReplanResponse,
     RouteSummaryResponse,
+    WaypointResponse,
 )
+from route_planner.services.detours import detour_price_adjustments
 from route_planner.services.geocoding import GeocodingClient
-from route_planner.services.optimization import optimize_fuel_plan
+from route_planner.services.metrics import stage
+from route_planner.services.optimization import choose_fuel_purchases, fuel_plan_result
 from route_planner.services.osrm import OsrmClient
-from route_planner.services.station_selection import StationSelector
-from route_planner.services.types import GeoPoint
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.station_selection import (
+    CorridorProjection,
+    CorridorWidening,
+    StationSelector,
+    load_candidate_stations,
+)
+from route_planner.services.trips import TripPlan, TripStore
+from route_planner.services.types import CandidateSet, GeoPoint, OptimizationResult, RouteData
+
+logger = logging.getLogger(__name__)
 
 
 class RoutePlannerService:
@@ -23,67 +47,164 @@ class RoutePlannerService:
         geocoding_client: GeocodingClient | None = None,
         osrm_client: OsrmClient | None = None,
         station_selector: StationSelector | None = None,
+        trip_store: TripStore | None = None,
     ) -> None:
         self.geocoding_client = geocoding_client or GeocodingClient()
         self.osrm_client = osrm_client or OsrmClient()
         self.station_selector = station_selector or StationSelector()
+        self.trip_store = trip_store or TripStore()
+
+    def plan(self, request: RoutePlanRequest, plan_id: str | None = None) -> RoutePlanResponse:
+        with stage("geocode"):
+            start_geocode = self.geocoding_client.geocode(request.start_location, country_code="us")
+            via = [
+                self.geocoding_client.geocode(location, country_code="us").point
+                for location in request.waypoints
+            ]
+            finish_geocode = self.geocoding_client.geocode(
+                request.finish_location, country_code="us"
+            )
+
+        with stage("route"):
+            if via:
+                direct_route = self.osrm_client.route_legs(
+                    [start_geocode.point, *via, finish_geocode.point]
+                )
+            else:
+                direct_route = self.osrm_client.route(start_geocode.point, finish_geocode.point)
+        return self.plan_route(
+            request,
+            start_geocode.point,
+            finish_geocode.point,
+            direct_route,
+            plan_id=plan_id,
+            via=via,
+        )
+
+    def plan_route(
+        self,
+        request: RoutePlanRequest,
+        start: GeoPoint,
+        finish: GeoPoint,
+        direct_route: RouteData,
+        plan_id: str | None = None,
+        via: Sequence[GeoPoint] = (),
+    ) -> RoutePlanResponse:
+        """Plan fuel stops for an already geocoded and routed request.
+
+        A multi-stop route passes its intermediate stops as ``via`` and its legs on
+        ``direct_route``. Candidates are selected leg by leg, each leg cached on its own,
+        and joined with mileposts that run continuously over the whole trip, so one
+        optimization covers every leg.
 
-    def plan(self, request: RoutePlanRequest) -> RoutePlanResponse:
+        With a ``plan_id``, the route and candidates are kept as a trip for ``replan``.
+        """
         vehicle_mpg = request.vehicle_mpg or float(settings.VEHICLE_MPG)
         tank_capacity_gallons = request.tank_capacity_gallons or float(settings.FUEL_TANK_GALLONS)
         max_range_miles = request.max_range_miles or float(settings.MAX_RANGE_MILES)
+        legs = direct_route.legs or (direct_route,)
+        leg_offsets = list(accumulate((leg.distance_miles for leg in legs[:-1]), initial=0.0))
 
-        start_geocode = self.geocoding_client.geocode(request.start_location, country_code="us")
-        finish_geocode = self.geocoding_client.geocode(request.finish_location, country_code="us")
-
-        direct_route = self.osrm_client.route(start_geocode.point, finish_geocode.point)
+        start_fuel_gallons = tank_capacity_gallons * (request.start_fuel_percent / 100.0)
+        corridor_miles = float(request.corridor_miles)
+        assumptions = {
+            "vehicle_mpg": vehicle_mpg,
+            "max_range_miles": max_range_miles,
+            "tank_capacity_gallons": tank_capacity_gallons,
+            "corridor_miles": corridor_miles,
+        }
+        optimization: OptimizationResult | None = None
+        if request.max_corridor_miles is not None and request.max_corridor_miles > corridor_miles:
+            with stage("select_candidates"):
+                parts = [
+                    (
+                        offset,
+                        self.station_selector.project_corridor(
+                            route_coordinates=leg.coordinates,
+                            max_corridor_miles=request.max_corridor_miles,
+                        ),
+                    )
+                    for offset, leg in zip(leg_offsets, legs, strict=True)
+                ]
+                projection = parts[0][1] if len(parts) == 1 else CorridorProjection.joined(parts)
+            with stage("optimize"):
+                candidates, optimization, widest_corridor_miles = _optimize_widening(
+                    projection,
+                    corridor_miles=corridor_miles,
+                    route_distance_miles=direct_route.distance_miles,
+                    start_fuel_gallons=start_fuel_gallons,
+                    mpg=vehicle_mpg,
+                    tank_capacity_gallons=tank_capacity_gallons,
+                    max_range_miles=max_range_miles,
+                    optimizer=request.optimizer,
+                )
+            assumptions["widest_corridor_miles"] = widest_corridor_miles
+        else:
+            with stage("select_candidates"):
+                candidate_parts = [
+                    (
+                        offset,
+                        self.station_selector.select_candidate_stations(
+                            route_coordinates=leg.coordinates,
+                            corridor_miles=corridor_miles,
+                        ),
+                    )
+                    for offset, leg in zip(leg_offsets, legs, strict=True)
+                ]
+                candidates = (
+                    candidate_parts[0][1]
+                    if len(candidate_parts) == 1
+                    else CandidateSet.joined(candidate_parts)
+                )
 
-        candidates = self.station_selector.select_candidate_stations(
-            route_coordinates=direct_route.coordinates,
-            corridor_miles=request.corridor_miles,
-        )
+        route: PreparedRoute | None = None
+        price_adjustments: list[float] | None = None
+        if request.detour_aware:
+            route = self.station_selector.prepare_route(direct_route.coordinates)
+            try:
+                with stage("detours"):
+                    price_adjustments = detour_price_adjustments(
+                        candidates, route, self.osrm_client, vehicle_mpg, tank_capacity_gallons
+                    )
+                assumptions["detour_cost_per_hour"] = float(settings.DETOUR_COST_PER_HOUR)
+            except (NoRouteFoundError, ExternalServiceError):
+                # Plan on straight-line offsets rather than fail the request.
+                price_adjustments = None
 
-        start_fuel_gallons = tank_capacity_gallons * (request.start_fuel_percent / 100.0)
-        optimization = optimize_fuel_plan(
-            candidates=candidates,
-            route_distance_miles=direct_route.distance_miles,
-            start_fuel_gallons=start_fuel_gallons,
-            mpg=vehicle_mpg,
-            tank_capacity_gallons=tank_capacity_gallons,
-            max_range_miles=max_range_miles,
-            optimizer=request.optimizer,
-        )
+        if optimization is None or price_adjustments is not None:
+            with stage("optimize"):
+                optimization = _optimize(
+                    candidates=candidates,
+                    route_distance_miles=direct_route.distance_miles,
+                    start_fuel_gallons=start_fuel_gallons,
+                    mpg=vehicle_mpg,
+                    tank_capacity_gallons=tank_capacity_gallons,
+                    max_range_miles=max_range_miles,
+                    optimizer=request.optimizer,
+                    price_adjustments=price_adjustments,
+                )
 
-        stops = [
-            FuelStopResponse(
-                station_id=stop.station.station_id,
-                station_name=stop.station.station_name,
-                address=stop.station.address,
-                city=stop.station.city,
-                state=stop.station.state,
-                latitude=stop.station.latitude,
-                longitude=stop.station.longitude,
-                milepost=round(stop.station.milepost, 3),
-                distance_from_route_miles=round(stop.station.distance_from_route_miles, 3),
-                price_per_gallon=round(stop.station.price_per_gallon, 3),
-                gallons_purchased=round(stop.gallons_purchased, 3),
-                cost=round(stop.cost, 2),
-                fuel_before_gallons=round(stop.fuel_before_gallons, 3),
-                fuel_after_gallons=round(stop.fuel_after_gallons, 3),
-            )
-            for stop in optimization.stops
-        ]
+        stops = _stop_responses(optimization)
 
         route_with_stops_geojson: dict | None = None
+        via_mileposts = list(zip(leg_offsets[1:], via, strict=True))
         if stops:
-            route_waypoints = [start_geocode.point]
-            route_waypoints.extend(
-                GeoPoint(latitude=stop.latitude, longitude=stop.longitude) for stop in stops
+            # Fuel stops and the trip's own stops, in the order they are driven past.
+            ordered = sorted(
+                [
+                    *via_mileposts,
+                    *(
+                        (stop.milepost, GeoPoint(latitude=stop.latitude, longitude=stop.longitude))
+                        for stop in stops
+                    ),
+                ],
+                key=lambda item: item[0],
             )
-            route_waypoints.append(finish_geocode.point)
+            route_waypoints = [start, *(point for _, point in ordered), finish]
 
             try:
-                route_with_stops = self.osrm_client.route_through(route_waypoints)
+                with stage("route_through_stops"):
+                    route_with_stops = self.osrm_client.route_through(route_waypoints)
                 route_with_stops_geojson = {
                     "type": "LineString",
                     "coordinates": route_with_stops.coordinates,
@@ -91,23 +212,31 @@ class RoutePlannerService:
             except (NoRouteFoundError, ExternalServiceError):
                 route_with_stops_geojson = None
 
-        summary = RouteSummaryResponse(
-            distance_miles=round(direct_route.distance_miles, 3),
-            duration_minutes=round(direct_route.duration_seconds / 60.0, 2),
-            total_gallons_purchased=round(optimization.total_gallons_purchased, 3),
-            total_fuel_cost=round(optimization.total_fuel_cost, 2),
-            estimated_fuel_needed_gallons=round(direct_route.distance_miles / vehicle_mpg, 3),
-        )
+        if plan_id is not None:
+            trip_route = route or self.station_selector.prepare_route(direct_route.coordinates)
+            trip = TripPlan(
+                route=trip_route,
+                candidates=candidates,
+                finish=finish,
+                route_distance_miles=direct_route.distance_miles,
+                route_duration_seconds=direct_route.duration_seconds,
+                vehicle_mpg=vehicle_mpg,
+                tank_capacity_gallons=tank_capacity_gallons,
+                max_range_miles=max_range_miles,
+                corridor_miles=corridor_miles,
+                optimizer=request.optimizer,
+            )
+            try:
+                with stage("save_trip"):
+                    self.trip_store.save(plan_id, trip)
+            except DatabaseError:
+                # The plan itself is sound; it just cannot be re-planned.
+                logger.exception("Could not save trip %s", plan_id)
+                plan_id = None
 
-        return RoutePlanResponse(
-            start=Coordinate(
-                latitude=round(start_geocode.point.latitude, 6),
-                longitude=round(start_geocode.point.longitude, 6),
-            ),
-            finish=Coordinate(
-                latitude=round(finish_geocode.point.latitude, 6),
-                longitude=round(finish_geocode.point.longitude, 6),
-            ),
+        return RoutePlanResponse.model_construct(
+            start=_coordinate(start),
+            finish=_coordinate(finish),
             optimizer_used=optimization.optimizer_used,
             route_geojson={
                 "type": "LineString",
@@ -115,11 +244,230 @@ class RoutePlannerService:
             },
             route_with_stops_geojson=route_with_stops_geojson,
             stops=stops,
-            summary=summary,
+            summary=_summary(
+                direct_route.distance_miles,
+                direct_route.duration_seconds,
+                optimization,
+                vehicle_mpg,
+            ),
+            assumptions=assumptions,
+            plan_id=plan_id,
+            waypoints=[
+                WaypointResponse.model_construct(
+                    latitude=round(point.latitude, 6),
+                    longitude=round(point.longitude, 6),
+                    milepost=round(milepost, 3),
+                )
+                for milepost, point in via_mileposts
+            ],
+        )
+
+    def replan(self, request: RouteReplanRequest) -> RouteReplanResponse:
+        """Re-plan the rest of a trip from the truck's current position and fuel.
+
+        The position is snapped onto the stored route and only the optimizer runs again,
+        over the stored candidates past that point. Mileposts in the response count from
+        the current position, and the stop-inclusive route is not re-requested.
+        """
+        trip = self.trip_store.get(request.plan_id)
+        position = GeoPoint(latitude=request.latitude, longitude=request.longitude)
+        located = trip.route.locate(
+            position, settings.REPLAN_MAX_OFF_ROUTE_MILES, after_milepost=request.last_milepost
+        )
+        if located is None:
+            raise InvalidLocationError(
+                f"Position is more than {settings.REPLAN_MAX_OFF_ROUTE_MILES:g} miles from the "
+                "planned route; request a new plan"
+            )
+        off_route_miles, milepost = located
+
+        remaining_miles = max(0.0, trip.route_distance_miles - milepost)
+        with stage("optimize"):
+            optimization = _optimize(
+                candidates=trip.candidates.beyond(milepost),
+                route_distance_miles=remaining_miles,
+                start_fuel_gallons=trip.tank_capacity_gallons * request.current_fuel_percent / 100,
+                mpg=trip.vehicle_mpg,
+                tank_capacity_gallons=trip.tank_capacity_gallons,
+                max_range_miles=trip.max_range_miles,
+                optimizer=trip.optimizer,
+            )
+
+        remaining_fraction = (
+            remaining_miles / trip.route_distance_miles if trip.route_distance_miles else 0.0
+        )
+        return RouteReplanResponse.model_construct(
+            start=_coordinate(position),
+            finish=_coordinate(trip.finish),
+            optimizer_used=optimization.optimizer_used,
+            route_geojson={
+                "type": "LineString",
+                "coordinates": [
+                    (position.longitude, position.latitude),
+                    *trip.route.coordinates_after(milepost),
+                ],
+            },
+            route_with_stops_geojson=None,
+            stops=_stop_responses(optimization),
+            summary=_summary(
+                remaining_miles,
+                trip.route_duration_seconds * remaining_fraction,
+                optimization,
+                trip.vehicle_mpg,
+            ),
             assumptions={
-                "vehicle_mpg": vehicle_mpg,
-                "max_range_miles": max_range_miles,
-                "tank_capacity_gallons": tank_capacity_gallons,
-                "corridor_miles": float(request.corridor_miles),
+                "vehicle_mpg": trip.vehicle_mpg,
+                "max_range_miles": trip.max_range_miles,
+                "tank_capacity_gallons": trip.tank_capacity_gallons,
+                "corridor_miles": trip.corridor_miles,
             },
+            plan_id=request.plan_id,
+            current_milepost=round(milepost, 3),
+            off_route_miles=round(off_route_miles, 3),
         )
+
+
+def _optimize_widening(
+    projection: CorridorProjection,
+    corridor_miles: float,
+    route_distance_miles: float,
+    start_fuel_gallons: float,
+    mpg: float,
+    tank_capacity_gallons: float,
+    max_range_miles: float,
+    optimizer: str,
+) -> tuple[CandidateSet, OptimizationResult, float]:
+    """Optimize, widening the corridor only over the gaps that make the plan infeasible.
+
+    Each round finds the stretches between consecutive candidates that the truck cannot
+    cover and widens the corridor over just those stretches by ``CORRIDOR_WIDEN_STEP_MILES``,
+    up to the projection's width. Returns the candidates used, the plan and the widest
+    corridor any stretch needed.
+    """
+    step_miles = settings.CORRIDOR_WIDEN_STEP_MILES
+    start_range_miles = start_fuel_gallons * mpg
+    leg_range_miles = min(max_range_miles, tank_capacity_gallons * mpg)
+    widenings: list[CorridorWidening] = []
+    while True:
+        candidates = projection.candidates(corridor_miles, widenings)
+        try:
+            optimization = _optimize(
+                candidates=candidates,
+                route_distance_miles=route_distance_miles,
+                start_fuel_gallons=start_fuel_gallons,
+                mpg=mpg,
+                tank_capacity_gallons=tank_capacity_gallons,
+                max_range_miles=max_range_miles,
+                optimizer=optimizer,
+            )
+        except NoFeasibleFuelPlanError:
+            widened = False
+            for start, end in _range_gaps(
+                candidates.mileposts.tolist(),
+                route_distance_miles,
+                start_range_miles,
+                leg_range_miles,
+            ):
+                midpoint = (start + end) / 2.0
+                current = max(
+                    (width for low, high, width in widenings if low < midpoint < high),
+                    default=corridor_miles,
+                )
+                width = min(current + step_miles, projection.max_corridor_miles)
+                if width > current:
+                    widenings.append((start, end, width))
+                    widened = True
+            if not widened:
+                raise
+            continue
+
+        widest = max((width for _, _, width in widenings), default=corridor_miles)
+        return candidates, optimization, widest
+
+
+def _optimize(
+    candidates: CandidateSet,
+    route_distance_miles: float,
+    start_fuel_gallons: float,
+    mpg: float,
+    tank_capacity_gallons: float,
+    max_range_miles: float,
+    optimizer: str,
+    price_adjustments: list[float] | None = None,
+) -> OptimizationResult:
+    """Choose fuel stops, then hydrate only the chosen stations, in one query."""
+    plan = choose_fuel_purchases(
+        candidates,
+        route_distance_miles,
+        start_fuel_gallons,
+        mpg,
+        tank_capacity_gallons,
+        max_range_miles,
+        optimizer,
+        price_adjustments,
+    )
+    return fuel_plan_result(candidates, plan, load_candidate_stations(candidates, plan.indexes))
+
+
+def _range_gaps(
+    mileposts: list[float],
+    route_distance_miles: float,
+    start_range_miles: float,
+    leg_range_miles: float,
+) -> list[tuple[float, float]]:
+    """Stretches between consecutive stops (or the route ends) longer than the truck can drive."""
+    if route_distance_miles <= start_range_miles:
+        return []
+    gaps: list[tuple[float, float]] = []
+    previous = 0.0
+    reach = start_range_miles
+    for milepost in [*mileposts, route_distance_miles]:
+        if milepost - previous > reach:
+            gaps.append((previous, milepost))
+        previous = milepost
+        reach = leg_range_miles
+    return gaps
+
+
+def _stop_responses(optimization: OptimizationResult) -> list[FuelStopResponse]:
+    return [
+        FuelStopResponse.model_construct(
+            station_id=stop.station.station_id,
+            station_name=stop.station.station_name,
+            address=stop.station.address,
+            city=stop.station.city,
+            state=stop.station.state,
+            latitude=stop.station.latitude,
+            longitude=stop.station.longitude,
+            milepost=round(stop.station.milepost, 3),
+            distance_from_route_miles=round(stop.station.distance_from_route_miles, 3),
+            price_per_gallon=round(stop.station.price_per_gallon, 3),
+            gallons_purchased=round(stop.gallons_purchased, 3),
+            cost=round(stop.cost, 2),
+            fuel_before_gallons=round(stop.fuel_before_gallons, 3),
+            fuel_after_gallons=round(stop.fuel_after_gallons, 3),
+        )
+        for stop in optimization.stops
+    ]
+
+
+def _summary(
+    distance_miles: float,
+    duration_seconds: float,
+    optimization: OptimizationResult,
+    vehicle_mpg: float,
+) -> RouteSummaryResponse:
+    return RouteSummaryResponse.model_construct(
+        distance_miles=round(distance_miles, 3),
+        duration_minutes=round(duration_seconds / 60.0, 2),
+        total_gallons_purchased=round(optimization.total_gallons_purchased, 3),
+        total_fuel_cost=round(optimization.total_fuel_cost, 2),
+        estimated_fuel_needed_gallons=round(distance_miles / vehicle_mpg, 3),
+    )
+
+
+def _coordinate(point: GeoPoint) -> Coordinate:
+    return Coordinate.model_construct(
+        latitude=round(point.latitude, 6),
+        longitude=round(point.longitude, 6),
+    )
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from route_planner.services.geo import MILES_PER_DEGREE_LAT, haversine_miles
+from route_planner.services.types import BoundingBox, GeoPoint, StationPoint
+
+GRID_CELL_DEGREES = 0.25
+
+
+@dataclass(slots=True, frozen=True)
+class PreparedRoute:
+    """Planar segment geometry of a route, computed once and reused for every station.
+
+    Each segment is projected to miles around its own mid latitude, as the per-station
+    projection always did. ``cells`` lists the segments touching each grid cell, so a
+    station is only measured against segments that could lie within the corridor.
+    """
+
+    bounds: BoundingBox
+    longitudes: array
+    latitudes: array
+    cumulative_miles: array
+    start_x: array
+    start_y: array
+    vector_x: array
+    vector_y: array
+    length_sq: array
+    lon_scale: array
+    min_lon_scale: float
+    cells: dict[tuple[int, int], array]
+
+    @classmethod
+    def build(cls, coordinates: list[tuple[float, float]]) -> PreparedRoute:
+        cumulative = [0.0]
+        start_x: list[float] = []
+        start_y: list[float] = []
+        vector_x: list[float] = []
+        vector_y: list[float] = []
+        length_sq: list[float] = []
+        lon_scale: list[float] = []
+        cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+
+        for index in range(len(coordinates) - 1):
+            start_lon, start_lat = coordinates[index]
+            end_lon, end_lat = coordinates[index + 1]
+            cumulative.append(
+                cumulative[-1] + haversine_miles(start_lat, start_lon, end_lat, end_lon)
+            )
+
+            scale = MILES_PER_DEGREE_LAT * math.cos(math.radians((start_lat + end_lat) / 2.0))
+            x = start_lon * scale
+            y = start_lat * MILES_PER_DEGREE_LAT
+            dx = end_lon * scale - x
+            dy = end_lat * MILES_PER_DEGREE_LAT - y
+            start_x.append(x)
+            start_y.append(y)
+            vector_x.append(dx)
+            vector_y.append(dy)
+            length_sq.append(dx * dx + dy * dy)
+            lon_scale.append(scale)
+            if dx * dx + dy * dy == 0:
+                continue
+
+            for row in _cell_range(min(start_lat, end_lat), max(start_lat, end_lat)):
+                for column in _cell_range(min(start_lon, end_lon), max(start_lon, end_lon)):
+                    cells[row, column].append(index)
+
+        longitudes = [coordinate[0] for coordinate in coordinates]
+        latitudes = [coordinate[1] for coordinate in coordinates]
+        return cls(
+            bounds=BoundingBox(
+                min_latitude=min(latitudes),
+                max_latitude=max(latitudes),
+                min_longitude=min(longitudes),
+                max_longitude=max(longitudes),
+            ),
+            longitudes=array("d", longitudes),
+            latitudes=array("d", latitudes),
+            cumulative_miles=array("d", cumulative),
+            start_x=array("d", start_x),
+            start_y=array("d", start_y),
+            vector_x=array("d", vector_x),
+            vector_y=array("d", vector_y),
+            length_sq=array("d", length_sq),
+            lon_scale=array("d", lon_scale),
+            min_lon_scale=min(lon_scale, default=MILES_PER_DEGREE_LAT),
+            cells={key: array("l", indexes) for key, indexes in cells.items()},
+        )
+
+    def project(
+        self, stations: Iterable[StationPoint], max_distance_miles: float
+    ) -> Iterable[tuple[StationPoint, float, float]]:
+        """Yield ``(station, distance_from_route, milepost)`` for stations in the corridor."""
+        cumulative = self.cumulative_miles.tolist()
+        start_x = self.start_x.tolist()
+        start_y = self.start_y.tolist()
+        vector_x = self.vector_x.tolist()
+        vector_y = self.vector_y.tolist()
+        length_sq = self.length_sq.tolist()
+        lon_scale = self.lon_scale.tolist()
+        cells = {key: indexes.tolist() for key, indexes in self.cells.items()}
+        lat_margin = max_distance_miles / MILES_PER_DEGREE_LAT
+        lon_margin = max_distance_miles / self.min_lon_scale
+
+        for station in stations:
+            _, latitude, longitude, _ = station
+            point_y = latitude * MILES_PER_DEGREE_LAT
+            best_distance = math.inf
+            best_index = -1
+            best_t = 0.0
+            for row in _cell_range(latitude - lat_margin, latitude + lat_margin):
+                for column in _cell_range(longitude - lon_margin, longitude + lon_margin):
+                    for index in cells.get((row, column), ()):
+                        point_x = longitude * lon_scale[index]
+                        x = start_x[index]
+                        y = start_y[index]
+                        vx = vector_x[index]
+                        vy = vector_y[index]
+                        t = ((point_x - x) * vx + (point_y - y) * vy) / length_sq[index]
+                        t = max(0.0, min(1.0, t))
+                        distance = (
+                            (point_x - (x + t * vx)) ** 2 + (point_y - (y + t * vy)) ** 2
+                        ) ** 0.5
+                        # Ties go to the earliest segment, matching a scan in route order.
+                        if distance < best_distance or (
+                            distance == best_distance and index < best_index
+                        ):
+                            best_distance = distance
+                            best_index = index
+                            best_t = t
+
+            if best_index < 0 or best_distance > max_distance_miles:
+                continue
+            segment_start = cumulative[best_index]
+            milepost = segment_start + best_t * (cumulative[best_index + 1] - segment_start)
+            yield station, best_distance, milepost
+
+    def locate(
+        self, point: GeoPoint, max_distance_miles: float, after_milepost: float | None = None
+    ) -> tuple[float, float] | None:
+        """Snap ``point`` onto the route as ``(distance_from_route, milepost)``.
+
+        Where the route passes ``point`` more than once, as an out-and-back trip does, the
+        nearest pass is ambiguous. Given the last known ``after_milepost``, passes ending
+        before it (less ``max_distance_miles`` of slack) are skipped unless no other pass
+        is in range; without it, the nearest pass wins, ties going to the earliest.
+        """
+        cumulative = self.cumulative_miles
+        point_y = point.latitude * MILES_PER_DEGREE_LAT
+        lat_margin = max_distance_miles / MILES_PER_DEGREE_LAT
+        lon_margin = max_distance_miles / self.min_lon_scale
+        floor = -math.inf if after_milepost is None else after_milepost - max_distance_miles
+        best: tuple[float, float] | None = None
+        best_behind: tuple[float, float] | None = None
+        seen: set[int] = set()
+        for row in _cell_range(point.latitude - lat_margin, point.latitude + lat_margin):
+            for column in _cell_range(point.longitude - lon_margin, point.longitude + lon_margin):
+                for index in self.cells.get((row, column), ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    point_x = point.longitude * self.lon_scale[index]
+                    vx = self.vector_x[index]
+                    vy = self.vector_y[index]
+                    dx = point_x - self.start_x[index]
+                    dy = point_y - self.start_y[index]
+                    t = max(0.0, min(1.0, (dx * vx + dy * vy) / self.length_sq[index]))
+                    distance = ((dx - t * vx) ** 2 + (dy - t * vy) ** 2) ** 0.5
+                    if distance > max_distance_miles:
+                        continue
+                    segment_start = cumulative[index]
+                    milepost = segment_start + t * (cumulative[index + 1] - segment_start)
+                    located = (distance, milepost)
+                    if cumulative[index + 1] < floor:
+                        if best_behind is None or located < best_behind:
+                            best_behind = located
+                    elif best is None or located < best:
+                        best = located
+        return best if best is not None else best_behind
+
+    def point_at(self, milepost: float) -> GeoPoint:
+        """The point on the route ``milepost`` miles from its start."""
+        cumulative = self.cumulative_miles
+        index = min(max(bisect_right(cumulative, milepost) - 1, 0), len(cumulative) - 2)
+        length = cumulative[index + 1] - cumulative[index]
+        fraction = (milepost - cumulative[index]) / length if length else 0.0
+        fraction = max(0.0, min(1.0, fraction))
+        return GeoPoint(
+            latitude=self.latitudes[index]
+            + fraction * (self.latitudes[index + 1] - self.latitudes[index]),
+            longitude=self.longitudes[index]
+            + fraction * (self.longitudes[index + 1] - self.longitudes[index]),
+        )
+
+    def coordinates_after(self, milepost: float) -> list[tuple[float, float]]:
+        """Route vertices beyond ``milepost`` as ``(longitude, latitude)`` pairs."""
+        start = bisect_right(self.cumulative_miles, milepost)
+        return list(zip(self.longitudes[start:], self.latitudes[start:], strict=True))
+
+
+def _cell_range(low: float, high: float) -> range:
+    return range(math.floor(low / GRID_CELL_DEGREES), math.floor(high / GRID_CELL_DEGREES) + 1)
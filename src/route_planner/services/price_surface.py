@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import math
+
+from django.conf import settings
+
+from route_planner.services.station_index import StationSnapshot, get_station_snapshot_provider
+from route_planner.services.types import GeoPoint
+
+PRICE_SURFACE_SAMPLES = 16
+PRICE_SURFACE_MAX_RING = 3
+
+
+class PriceSurface:
+    """Average retail price per grid cell, for estimating fuel cost without a route.
+
+    Empty cells borrow from the nearest ring of populated cells (up to
+    ``PRICE_SURFACE_MAX_RING`` cells away) and then from the national average;
+    with no geocoded stations at all there is no estimate.
+    """
+
+    def __init__(self, snapshot: StationSnapshot, cell_degrees: float | None = None) -> None:
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.cell_degrees = cell_degrees or settings.PRICE_SURFACE_CELL_DEGREES
+
+        totals: dict[tuple[int, int], list[float]] = {}
+        for latitude, longitude, price in zip(
+            snapshot.latitudes, snapshot.longitudes, snapshot.prices, strict=True
+        ):
+            cell_totals = totals.setdefault(self._cell(latitude, longitude), [0.0, 0.0])
+            cell_totals[0] += price
+            cell_totals[1] += 1
+        self.cells = {cell: price_sum / count for cell, (price_sum, count) in totals.items()}
+        self.national_average = sum(snapshot.prices) / len(snapshot) if len(snapshot) else None
+
+    def price_at(self, point: GeoPoint) -> float | None:
+        row, column = self._cell(point.latitude, point.longitude)
+        price = self.cells.get((row, column))
+        if price is not None:
+            return price
+
+        for ring in range(1, PRICE_SURFACE_MAX_RING + 1):
+            neighbours = [
+                self.cells[cell] for cell in self._ring(row, column, ring) if cell in self.cells
+            ]
+            if neighbours:
+                return sum(neighbours) / len(neighbours)
+        return self.national_average
+
+    def price_between(self, start: GeoPoint, finish: GeoPoint) -> float | None:
+        """Average surface price over evenly spaced samples on the straight start-finish line."""
+        samples = [
+            GeoPoint(
+                latitude=start.latitude + (finish.latitude - start.latitude) * fraction,
+                longitude=start.longitude + (finish.longitude - start.longitude) * fraction,
+            )
+            for fraction in (
+                index / (PRICE_SURFACE_SAMPLES - 1) for index in range(PRICE_SURFACE_SAMPLES)
+            )
+        ]
+        prices = [price for sample in samples if (price := self.price_at(sample)) is not None]
+        return sum(prices) / len(prices) if prices else None
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    @staticmethod
+    def _ring(row: int, column: int, ring: int) -> list[tuple[int, int]]:
+        return [
+            (row + row_offset, column + column_offset)
+            for row_offset in range(-ring, ring + 1)
+            for column_offset in range(-ring, ring + 1)
+            if max(abs(row_offset), abs(column_offset)) == ring
+        ]
+
+
+def get_price_surface() -> PriceSurface:
+    return get_station_snapshot_provider().derive("price_surface", PriceSurface)
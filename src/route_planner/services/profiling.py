@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import cProfile
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import TracebackType
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest
+
+PROFILE_HEADER = "X-Plan-Profile"
+PROFILE_ARTIFACT_HEADER = "X-Plan-Profile-Artifact"
+_SIGNING_SALT = "route_planner.profiling"
+
+# cProfile hooks are process-wide and also record other threads, so one profile runs at a time.
+_profile_lock = threading.Lock()
+
+
+def make_profile_token(label: str) -> str:
+    """Sign ``label`` for use as the ``X-Plan-Profile`` request header."""
+    return signing.TimestampSigner(salt=_SIGNING_SALT).sign(_safe_label(label))
+
+
+def requested_profile_label(request: HttpRequest) -> str | None:
+    """Return the artifact label when this request should be profiled, otherwise ``None``."""
+    if not settings.PLAN_PROFILING_ENABLED:
+        return None
+
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        try:
+            return signing.TimestampSigner(salt=_SIGNING_SALT).unsign(
+                token, max_age=settings.PLAN_PROFILING_TOKEN_MAX_AGE_SECONDS
+            )
+        except signing.BadSignature:
+            return None
+    if random.random() < settings.PLAN_PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class PlanProfiler:
+    """Profile a block with cProfile and dump pstats to ``PLAN_PROFILING_DIR``.
+
+    A ``None`` label, or another profile already running, makes the block run unprofiled.
+    ``path`` is set to the written artifact on exit.
+    """
+
+    def __init__(self, label: str | None) -> None:
+        self.label = label
+        self.path: Path | None = None
+        self._profiler: cProfile.Profile | None = None
+
+    def __enter__(self) -> PlanProfiler:
+        if self.label is not None and _profile_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        profiler = self._profiler
+        if profiler is None:
+            return
+        self._profiler = None
+        try:
+            profiler.disable()
+            directory = Path(settings.PLAN_PROFILING_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime("%Y%m%dT%H%M%S")
+            label = _safe_label(self.label or "")
+            self.path = directory / f"{stamp}-{label}-{uuid.uuid4().hex[:8]}.pstats"
+            profiler.dump_stats(self.path)
+        finally:
+            _profile_lock.release()
+
+
+def _safe_label(label: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:64] or "plan"
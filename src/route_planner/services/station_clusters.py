@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+
+from route_planner.services.station_index import StationSnapshot, get_station_snapshot_provider
+from route_planner.services.types import BoundingBox
+
+MIN_CLUSTER_ZOOM = 2
+MAX_CLUSTER_ZOOM = 12
+CELLS_PER_TILE = 4
+
+
+@dataclass(slots=True, frozen=True)
+class StationCluster:
+    latitude: float
+    longitude: float
+    count: int
+    min_price: float
+    avg_price: float
+    station_id: int | None = None
+    name: str | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class _ClusterLevel:
+    clusters: list[StationCluster]
+    latitudes: list[float]
+
+    def within(self, bbox: BoundingBox) -> list[StationCluster]:
+        start = bisect_left(self.latitudes, bbox.min_latitude)
+        stop = bisect_right(self.latitudes, bbox.max_latitude)
+        return [
+            cluster
+            for cluster in self.clusters[start:stop]
+            if bbox.min_longitude <= cluster.longitude <= bbox.max_longitude
+        ]
+
+
+class StationClusterIndex:
+    """Grid clusters of a station snapshot, precomputed for every supported zoom level.
+
+    Cells are ``360 / 2**zoom / CELLS_PER_TILE`` degrees wide, so each map tile shows
+    roughly a 4x4 grid of clusters. Above ``MAX_CLUSTER_ZOOM`` individual stations are
+    returned straight from the snapshot.
+    """
+
+    def __init__(self, snapshot: StationSnapshot) -> None:
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.levels = {
+            zoom: self._build_level(snapshot, zoom)
+            for zoom in range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1)
+        }
+
+    def query(
+        self, bbox: BoundingBox, zoom: int, max_features: int
+    ) -> tuple[int, list[StationCluster]]:
+        """Return the finest clustering at or below ``zoom`` that fits in ``max_features``."""
+        if zoom > MAX_CLUSTER_ZOOM:
+            stations = self._stations_within(bbox, max_features + 1)
+            if len(stations) <= max_features:
+                return zoom, stations
+            zoom = MAX_CLUSTER_ZOOM
+
+        zoom = max(MIN_CLUSTER_ZOOM, zoom)
+        clusters = self.levels[zoom].within(bbox)
+        while len(clusters) > max_features and zoom > MIN_CLUSTER_ZOOM:
+            zoom -= 1
+            clusters = self.levels[zoom].within(bbox)
+
+        if len(clusters) > max_features:
+            clusters = sorted(clusters, key=lambda cluster: cluster.count, reverse=True)
+            clusters = clusters[:max_features]
+        return zoom, clusters
+
+    def _stations_within(self, bbox: BoundingBox, limit: int) -> list[StationCluster]:
+        stations: list[StationCluster] = []
+        for station_id, name, _, _, _, latitude, longitude, price in self.snapshot.within(bbox):
+            stations.append(
+                StationCluster(
+                    latitude=latitude,
+                    longitude=longitude,
+                    count=1,
+                    min_price=price,
+                    avg_price=price,
+                    station_id=station_id,
+                    name=name,
+                )
+            )
+            if len(stations) >= limit:
+                break
+        return stations
+
+    @staticmethod
+    def _build_level(snapshot: StationSnapshot, zoom: int) -> _ClusterLevel:
+        cell_degrees = 360.0 / (2**zoom) / CELLS_PER_TILE
+        cells: dict[tuple[int, int], list[float]] = {}
+        station_ids: dict[tuple[int, int], int] = {}
+        for index in range(len(snapshot)):
+            latitude = snapshot.latitudes[index]
+            longitude = snapshot.longitudes[index]
+            price = snapshot.prices[index]
+            cell = (
+                math.floor(latitude / cell_degrees),
+                math.floor(longitude / cell_degrees),
+            )
+            totals = cells.get(cell)
+            if totals is None:
+                cells[cell] = [1.0, latitude, longitude, price, price]
+                station_ids[cell] = snapshot.station_ids[index]
+                continue
+            totals[0] += 1
+            totals[1] += latitude
+            totals[2] += longitude
+            totals[3] += price
+            totals[4] = min(totals[4], price)
+
+        clusters = sorted(
+            (
+                StationCluster(
+                    latitude=latitude_sum / count,
+                    longitude=longitude_sum / count,
+                    count=int(count),
+                    min_price=min_price,
+                    avg_price=price_sum / count,
+                    station_id=station_ids[cell] if count == 1 else None,
+                )
+                for cell, (count, latitude_sum, longitude_sum, price_sum, min_price) in (
+                    cells.items()
+                )
+            ),
+            key=lambda cluster: cluster.latitude,
+        )
+        return _ClusterLevel(
+            clusters=clusters, latitudes=[cluster.latitude for cluster in clusters]
+        )
+
+
+def get_station_cluster_index() -> StationClusterIndex:
+    return get_station_snapshot_provider().derive("station_clusters", StationClusterIndex)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import cast
+
+from django.conf import settings
+from django.db import connection
+
+from route_planner.models import FuelStation
+from route_planner.services.data_version import get_station_data_version
+from route_planner.services.types import BoundingBox, StationPoint, StationRow
+
+
+@dataclass(slots=True, frozen=True)
+class StationSnapshot:
+    """Immutable columnar copy of geocoded stations, sorted by latitude.
+
+    ``derived`` holds structures built from this snapshot (see
+    ``StationSnapshotProvider.derive``), so they are swapped together with it.
+    """
+
+    version: int
+    station_ids: array
+    latitudes: array
+    longitudes: array
+    prices: array
+    names: tuple[str, ...]
+    addresses: tuple[str, ...]
+    cities: tuple[str, ...]
+    states: tuple[str, ...]
+    derived: dict[str, object] = field(default_factory=dict, compare=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    @classmethod
+    def load(cls, version: int) -> StationSnapshot:
+        rows = sorted(
+            FuelStation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list(
+                "id",
+                "truckstop_name",
+                "address",
+                "city",
+                "state",
+                "latitude",
+                "longitude",
+                "retail_price",
+            )
+            .iterator(chunk_size=2000),
+            key=lambda row: row[5],
+        )
+        return cls(
+            version=version,
+            station_ids=array("q", (row[0] for row in rows)),
+            latitudes=array("d", (row[5] for row in rows)),
+            longitudes=array("d", (row[6] for row in rows)),
+            prices=array("d", (float(row[7]) for row in rows)),
+            names=tuple(row[1] for row in rows),
+            addresses=tuple(row[2] for row in rows),
+            cities=tuple(row[3] for row in rows),
+            states=tuple(row[4] for row in rows),
+        )
+
+    def within(self, bbox: BoundingBox) -> Iterator[StationRow]:
+        start = bisect_left(self.latitudes, bbox.min_latitude)
+        stop = bisect_right(self.latitudes, bbox.max_latitude)
+        longitudes = self.longitudes
+        for index in range(start, stop):
+            longitude = longitudes[index]
+            if bbox.min_longitude <= longitude <= bbox.max_longitude:
+                yield (
+                    self.station_ids[index],
+                    self.names[index],
+                    self.addresses[index],
+                    self.cities[index],
+                    self.states[index],
+                    self.latitudes[index],
+                    longitude,
+                    self.prices[index],
+                )
+
+    def points_within(self, bbox: BoundingBox) -> Iterator[StationPoint]:
+        start = bisect_left(self.latitudes, bbox.min_latitude)
+        stop = bisect_right(self.latitudes, bbox.max_latitude)
+        longitudes = self.longitudes
+        for index in range(start, stop):
+            longitude = longitudes[index]
+            if bbox.min_longitude <= longitude <= bbox.max_longitude:
+                yield self.station_ids[index], self.latitudes[index], longitude, self.prices[index]
+
+
+class StationSnapshotProvider:
+    """Serve the current station snapshot and hot-swap it when station data changes.
+
+    The station-data version is re-read at most once per check interval. A changed
+    version starts a background rebuild while requests keep using the previous
+    snapshot; the finished snapshot replaces it with a single reference assignment, so
+    no caller ever sees a partially built index. Structures registered through
+    ``derive`` are rebuilt on the same background thread before the swap.
+    """
+
+    def __init__(self, check_interval_seconds: float | None = None) -> None:
+        self.check_interval_seconds = (
+            settings.STATION_SNAPSHOT_CHECK_SECONDS
+            if check_interval_seconds is None
+            else check_interval_seconds
+        )
+        self._snapshot: StationSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._building_version: int | None = None
+        self._rebuild_thread: threading.Thread | None = None
+        self._builders: dict[str, Callable[[StationSnapshot], object]] = {}
+        self._derive_lock = threading.Lock()
+
+    def current(self) -> StationSnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval_seconds:
+            return snapshot
+
+        self._checked_at = now
+        version = get_station_data_version()
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = StationSnapshot.load(version)
+                return self._snapshot
+
+        if version != snapshot.version:
+            self._schedule_rebuild(version)
+        return snapshot
+
+    def derive[T](self, name: str, build: Callable[[StationSnapshot], T]) -> T:
+        """Return ``build(snapshot)`` for the current snapshot, built once per snapshot.
+
+        Only the first call, before any rebuild has run, builds on the request path;
+        later snapshots arrive with ``name`` already built.
+        """
+        snapshot = self.current()
+        value = snapshot.derived.get(name)
+        if value is None:
+            with self._derive_lock:
+                self._builders[name] = build
+                value = snapshot.derived.get(name)
+                if value is None:
+                    value = snapshot.derived[name] = build(snapshot)
+        return cast(T, value)
+
+    def _schedule_rebuild(self, version: int) -> None:
+        with self._lock:
+            if self._building_version is not None:
+                return
+            self._building_version = version
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild,
+                args=(version,),
+                name=f"station-snapshot-v{version}",
+                daemon=True,
+            )
+            self._rebuild_thread.start()
+
+    def _rebuild(self, version: int) -> None:
+        try:
+            snapshot = StationSnapshot.load(version)
+            for name, build in list(self._builders.items()):
+                snapshot.derived[name] = build(snapshot)
+            self._snapshot = snapshot
+        finally:
+            connection.close()
+            with self._lock:
+                self._building_version = None
+            self._checked_at = 0.0
+
+
+_snapshot_provider: StationSnapshotProvider | None = None
+
+
+def get_station_snapshot_provider() -> StationSnapshotProvider:
+    global _snapshot_provider
+    if _snapshot_provider is None:
+        _snapshot_provider = StationSnapshotProvider()
+    return _snapshot_provider
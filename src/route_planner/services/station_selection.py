@@ -1,77 +1,224 @@
 from __future__ import annotations
 
+import hashlib
+import math
+from array import array
 from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
 
+from route_planner.exceptions import StaleStationDataError
 from route_planner.models import FuelStation
-from route_planner.services.geo import haversine_miles, lon_lat_to_miles_xy
-from route_planner.services.types import CandidateStation
+from route_planner.services.data_version import get_station_data_version
+from route_planner.services.metrics import record_cache, stage
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.station_index import get_station_snapshot_provider
+from route_planner.services.types import (
+    BoundingBox,
+    CandidateSet,
+    CandidateStation,
+    GeoPoint,
+    StationPoint,
+)
+
+FUEL_STATION_RTREE_TABLE = "route_planner_fuelstation_rtree"
+
+# milepost, price_per_gallon, station_id, distance_from_route_miles
+type _CandidateRow = tuple[float, float, int, float]
+
+# milepost_from, milepost_to, corridor_miles
+type CorridorWidening = tuple[float, float, float]
+
+
+@dataclass(slots=True, frozen=True)
+class CorridorProjection:
+    """Every station within ``max_corridor_miles`` of a route, projected once.
+
+    Narrower corridors, including ones widened only over part of the route, are filtered
+    from these rows without projecting any station again.
+    """
+
+    rows: list[_CandidateRow]
+    max_corridor_miles: float
+
+    @classmethod
+    def joined(cls, parts: Sequence[tuple[float, CorridorProjection]]) -> CorridorProjection:
+        """Concatenate per-leg projections, shifting each leg's mileposts by its offset.
+
+        As in ``CandidateSet.joined``, each leg's mileposts are clamped to end at the next
+        leg's offset so the joined rows stay sorted.
+        """
+        ends = [offset for offset, _ in parts[1:]] + [math.inf]
+        return cls(
+            rows=[
+                (min(milepost + offset, end), price, station_id, distance)
+                for (offset, part), end in zip(parts, ends, strict=True)
+                for milepost, price, station_id, distance in part.rows
+            ],
+            max_corridor_miles=min(part.max_corridor_miles for _, part in parts),
+        )
+
+    def candidates(
+        self, corridor_miles: float, widenings: Sequence[CorridorWidening] = ()
+    ) -> CandidateSet:
+        """Candidates within ``corridor_miles``, or a wider corridor over widened stretches."""
+        rows = [
+            row
+            for row in self.rows
+            if row[3] <= corridor_miles
+            or any(start < row[0] < end and row[3] <= width for start, end, width in widenings)
+        ]
+        return _candidate_set(
+            StationSelector._reduce_candidates(rows, settings.MAX_CANDIDATE_STATIONS)
+        )
 
 
 class StationSelector:
+    def __init__(self, backend: str | None = None) -> None:
+        self.backend = backend or settings.STATION_INDEX_BACKEND
+
     def select_candidate_stations(
         self,
         route_coordinates: list[tuple[float, float]],
         corridor_miles: float,
-    ) -> list[CandidateStation]:
+    ) -> CandidateSet:
         if len(route_coordinates) < 2:
-            return []
+            return _candidate_set([])
 
         simplified_coordinates = self._simplify_route(route_coordinates, max_points=1500)
-        cumulative_miles = self._build_cumulative_miles(simplified_coordinates)
+        route_digest = self._route_digest(simplified_coordinates)
+        cache_key = None
+        if settings.CANDIDATE_CACHE_TTL_SECONDS > 0:
+            cache_key = self._cache_key(route_digest, corridor_miles)
+            cached = cache.get(cache_key)
+            record_cache("candidates", cached is not None)
+            if cached is not None:
+                return cached
 
-        lon_values = [coord[0] for coord in simplified_coordinates]
-        lat_values = [coord[1] for coord in simplified_coordinates]
-        margin = corridor_miles / 69.0
+        prepared = self._prepared_route(route_digest, simplified_coordinates)
+        candidates = self._select_candidates(prepared, corridor_miles)
+        if cache_key is not None:
+            cache.set(cache_key, candidates, timeout=settings.CANDIDATE_CACHE_TTL_SECONDS)
+        return candidates
+
+    def project_corridor(
+        self,
+        route_coordinates: list[tuple[float, float]],
+        max_corridor_miles: float,
+    ) -> CorridorProjection:
+        if len(route_coordinates) < 2:
+            return CorridorProjection(rows=[], max_corridor_miles=max_corridor_miles)
+
+        simplified_coordinates = self._simplify_route(route_coordinates, max_points=1500)
+        route_digest = self._route_digest(simplified_coordinates)
+        cache_key = None
+        if settings.CANDIDATE_CACHE_TTL_SECONDS > 0:
+            cache_key = f"projection:{self._cache_key(route_digest, max_corridor_miles)}"
+            cached = cache.get(cache_key)
+            record_cache("corridor_projection", cached is not None)
+            if cached is not None:
+                return cached
+
+        prepared = self._prepared_route(route_digest, simplified_coordinates)
+        projection = CorridorProjection(
+            rows=sorted(self._project_rows(prepared, max_corridor_miles)),
+            max_corridor_miles=max_corridor_miles,
+        )
+        if cache_key is not None:
+            cache.set(cache_key, projection, timeout=settings.CANDIDATE_CACHE_TTL_SECONDS)
+        return projection
+
+    def prepare_route(self, route_coordinates: list[tuple[float, float]]) -> PreparedRoute:
+        simplified_coordinates = self._simplify_route(route_coordinates, max_points=1500)
+        return self._prepared_route(
+            self._route_digest(simplified_coordinates), simplified_coordinates
+        )
+
+    @staticmethod
+    def _prepared_route(
+        route_digest: str, simplified_coordinates: list[tuple[float, float]]
+    ) -> PreparedRoute:
+        """Build the route's projection geometry once and cache it for the route's lifetime."""
+        if settings.ROUTE_CACHE_TTL_SECONDS <= 0:
+            return PreparedRoute.build(simplified_coordinates)
+
+        cache_key = f"prepared-route:{route_digest}"
+        prepared = cache.get(cache_key)
+        record_cache("prepared_route", prepared is not None)
+        if prepared is None:
+            with stage("prepare_route"):
+                prepared = PreparedRoute.build(simplified_coordinates)
+            cache.set(cache_key, prepared, timeout=settings.ROUTE_CACHE_TTL_SECONDS)
+        return prepared
+
+    def _select_candidates(self, prepared: PreparedRoute, corridor_miles: float) -> CandidateSet:
+        candidates = self._project_rows(prepared, corridor_miles)
+        return _candidate_set(self._reduce_candidates(candidates, settings.MAX_CANDIDATE_STATIONS))
 
-        stations = FuelStation.objects.filter(
-            latitude__isnull=False,
-            longitude__isnull=False,
-            longitude__gte=min(lon_values) - margin,
-            longitude__lte=max(lon_values) + margin,
-            latitude__gte=min(lat_values) - margin,
-            latitude__lte=max(lat_values) + margin,
-        ).only(
-            "id",
-            "truckstop_name",
-            "address",
-            "city",
-            "state",
-            "latitude",
-            "longitude",
-            "retail_price",
+    def _project_rows(self, prepared: PreparedRoute, corridor_miles: float) -> list[_CandidateRow]:
+        margin = corridor_miles / 69.0
+        bbox = BoundingBox(
+            min_latitude=prepared.bounds.min_latitude - margin,
+            max_latitude=prepared.bounds.max_latitude + margin,
+            min_longitude=prepared.bounds.min_longitude - margin,
+            max_longitude=prepared.bounds.max_longitude + margin,
         )
 
-        candidates: list[CandidateStation] = []
-        for station in stations.iterator(chunk_size=1000):
-            if station.latitude is None or station.longitude is None:
-                continue
-            distance_from_route, milepost = self._project_station(
-                station.longitude,
-                station.latitude,
-                simplified_coordinates,
-                cumulative_miles,
+        return [
+            (milepost, float(station[3]), station[0], distance_from_route)
+            for station, distance_from_route, milepost in prepared.project(
+                self._stations_in_bbox(bbox), corridor_miles
             )
-            if distance_from_route > corridor_miles:
-                continue
-
-            candidates.append(
-                CandidateStation(
-                    station_id=station.id,
-                    station_name=station.truckstop_name,
-                    address=station.address,
-                    city=station.city,
-                    state=station.state,
-                    latitude=station.latitude,
-                    longitude=station.longitude,
-                    price_per_gallon=float(station.retail_price),
-                    milepost=milepost,
-                    distance_from_route_miles=distance_from_route,
+        ]
+
+    def _stations_in_bbox(self, bbox: BoundingBox) -> Iterable[StationPoint]:
+        if self.backend == "memory":
+            return get_station_snapshot_provider().current().points_within(bbox)
+
+        if self.backend == "rtree" and connection.vendor == "sqlite":
+            stations = FuelStation.objects.filter(
+                id__in=RawSQL(
+                    f"SELECT id FROM {FUEL_STATION_RTREE_TABLE} "
+                    "WHERE max_latitude >= %s AND min_latitude <= %s "
+                    "AND max_longitude >= %s AND min_longitude <= %s",
+                    (
+                        bbox.min_latitude,
+                        bbox.max_latitude,
+                        bbox.min_longitude,
+                        bbox.max_longitude,
+                    ),
                 )
             )
+        else:
+            stations = FuelStation.objects.filter(
+                latitude__isnull=False,
+                longitude__isnull=False,
+                longitude__gte=bbox.min_longitude,
+                longitude__lte=bbox.max_longitude,
+                latitude__gte=bbox.min_latitude,
+                latitude__lte=bbox.max_latitude,
+            )
 
-        return self._reduce_candidates(candidates, settings.MAX_CANDIDATE_STATIONS)
+        return stations.values_list("id", "latitude", "longitude", "retail_price").iterator(
+            chunk_size=1000
+        )
+
+    @staticmethod
+    def _route_digest(route_coordinates: list[tuple[float, float]]) -> str:
+        digest = hashlib.sha256()
+        for longitude, latitude in route_coordinates:
+            digest.update(f"{longitude:.5f},{latitude:.5f};".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _cache_key(route_digest: str, corridor_miles: float) -> str:
+        encoded = f"{route_digest}|{corridor_miles:.3f}|{get_station_data_version()}".encode()
+        return f"candidates:{hashlib.sha256(encoded).hexdigest()}"
 
     @staticmethod
     def _simplify_route(
@@ -86,77 +233,75 @@ class StationSelector:
             simplified.append(route_coordinates[-1])
         return simplified
 
-    @staticmethod
-    def _build_cumulative_miles(route_coordinates: list[tuple[float, float]]) -> list[float]:
-        cumulative = [0.0]
-        for index in range(1, len(route_coordinates)):
-            prev_lon, prev_lat = route_coordinates[index - 1]
-            lon, lat = route_coordinates[index]
-            cumulative.append(cumulative[-1] + haversine_miles(prev_lat, prev_lon, lat, lon))
-        return cumulative
-
-    @staticmethod
-    def _project_station(
-        station_lon: float,
-        station_lat: float,
-        route_coordinates: list[tuple[float, float]],
-        cumulative_miles: list[float],
-    ) -> tuple[float, float]:
-        best_distance = float("inf")
-        best_milepost = 0.0
-
-        for index in range(len(route_coordinates) - 1):
-            start_lon, start_lat = route_coordinates[index]
-            end_lon, end_lat = route_coordinates[index + 1]
-            ref_lat = (start_lat + end_lat) / 2.0
-
-            start_x, start_y = lon_lat_to_miles_xy(start_lon, start_lat, ref_lat)
-            end_x, end_y = lon_lat_to_miles_xy(end_lon, end_lat, ref_lat)
-            point_x, point_y = lon_lat_to_miles_xy(station_lon, station_lat, ref_lat)
-
-            vector_x = end_x - start_x
-            vector_y = end_y - start_y
-            vector_norm_sq = vector_x * vector_x + vector_y * vector_y
-            if vector_norm_sq == 0:
-                continue
-
-            t = ((point_x - start_x) * vector_x + (point_y - start_y) * vector_y) / vector_norm_sq
-            t = max(0.0, min(1.0, t))
-
-            projected_x = start_x + t * vector_x
-            projected_y = start_y + t * vector_y
-            distance = ((point_x - projected_x) ** 2 + (point_y - projected_y) ** 2) ** 0.5
-
-            if distance < best_distance:
-                segment_length = cumulative_miles[index + 1] - cumulative_miles[index]
-                best_distance = distance
-                best_milepost = cumulative_miles[index] + (t * segment_length)
-
-        return best_distance, best_milepost
-
     @staticmethod
     def _reduce_candidates(
-        candidates: list[CandidateStation], max_candidates: int
-    ) -> list[CandidateStation]:
-        ordered = sorted(
-            candidates, key=lambda candidate: (candidate.milepost, candidate.price_per_gallon)
-        )
+        candidates: list[_CandidateRow], max_candidates: int
+    ) -> list[_CandidateRow]:
+        ordered = sorted(candidates)
         if len(ordered) <= max_candidates:
             return ordered
 
-        buckets: dict[int, list[CandidateStation]] = defaultdict(list)
+        buckets: dict[int, list[_CandidateRow]] = defaultdict(list)
         for candidate in ordered:
-            bucket = int(candidate.milepost // 25)
+            bucket = int(candidate[0] // 25)
             if len(buckets[bucket]) < 3:
                 buckets[bucket].append(candidate)
 
-        reduced: list[CandidateStation] = []
+        reduced: list[_CandidateRow] = []
         for bucket in sorted(buckets):
-            reduced.extend(sorted(buckets[bucket], key=lambda value: value.price_per_gallon))
+            reduced.extend(sorted(buckets[bucket], key=lambda value: value[1]))
 
         if len(reduced) > max_candidates:
-            reduced = sorted(reduced, key=lambda value: value.price_per_gallon)[:max_candidates]
+            reduced = sorted(reduced, key=lambda value: value[1])[:max_candidates]
+
+        return sorted(reduced)
+
+
+def _candidate_set(rows: list[_CandidateRow]) -> CandidateSet:
+    return CandidateSet(
+        station_ids=array("q", (row[2] for row in rows)),
+        mileposts=array("d", (row[0] for row in rows)),
+        prices=array("d", (row[1] for row in rows)),
+        offsets_miles=array("d", (row[3] for row in rows)),
+    )
+
+
+def candidate_points(candidates: CandidateSet) -> list[GeoPoint | None]:
+    """Coordinates of every candidate, in candidate order, from one query.
+
+    A candidate whose station has been deleted since it was selected gets ``None``.
+    """
+    station_ids = candidates.station_ids.tolist()
+    rows = FuelStation.objects.filter(id__in=station_ids).values_list("id", "latitude", "longitude")
+    coordinates = {
+        station_id: GeoPoint(latitude=latitude, longitude=longitude)
+        for station_id, latitude, longitude in rows
+    }
+    return [coordinates.get(station_id) for station_id in station_ids]
+
 
-        return sorted(
-            reduced, key=lambda candidate: (candidate.milepost, candidate.price_per_gallon)
+def load_candidate_stations(
+    candidates: CandidateSet, indexes: list[int]
+) -> dict[int, CandidateStation]:
+    """Hydrate the candidates at ``indexes`` with station details in one query."""
+    stations = FuelStation.objects.only(
+        "truckstop_name", "address", "city", "state", "latitude", "longitude"
+    ).in_bulk([candidates.station_ids[index] for index in indexes])
+    hydrated: dict[int, CandidateStation] = {}
+    for index in indexes:
+        station = stations.get(candidates.station_ids[index])
+        if station is None:
+            raise StaleStationDataError("A planned station no longer exists, retry shortly")
+        hydrated[index] = CandidateStation(
+            station_id=station.id,
+            station_name=station.truckstop_name,
+            address=station.address,
+            city=station.city,
+            state=station.state,
+            latitude=station.latitude,
+            longitude=station.longitude,
+            price_per_gallon=candidates.prices[index],
+            milepost=candidates.mileposts[index],
+            distance_from_route_miles=candidates.offsets_miles[index],
         )
+    return hydrated
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import hashlib
+import pickle
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Literal
+
+from django.conf import settings
+from django.utils import timezone
+
+from route_planner.exceptions import PlanNotFoundError
+from route_planner.models import StoredTripPlan
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.types import CandidateSet, GeoPoint
+
+
+@dataclass(slots=True, frozen=True)
+class TripPlan:
+    """What a re-plan needs from the original plan: its route, candidates and vehicle."""
+
+    route: PreparedRoute
+    candidates: CandidateSet
+    finish: GeoPoint
+    route_distance_miles: float
+    route_duration_seconds: float
+    vehicle_mpg: float
+    tank_capacity_gallons: float
+    max_range_miles: float
+    corridor_miles: float
+    optimizer: Literal["baseline", "ortools"]
+
+
+class TripStore:
+    """Keep trip plans under their plan handle so a truck can re-plan mid-trip.
+
+    Trips live in the database, so every web process can re-plan a trip planned by another
+    and trips are never evicted to make room in the cache. Handles are derived from the
+    plan cache key, so a cached plan response and its trip share one handle; trips outlive
+    cached plans (``TRIP_PLAN_TTL_SECONDS`` is at least ``PLAN_CACHE_TTL_SECONDS``).
+    Saving is one upsert; expired rows are deleted by ``purge_expired_plans``, not by
+    the plans that save trips.
+    """
+
+    def __init__(self, ttl_seconds: int | None = None) -> None:
+        self.ttl_seconds = max(
+            settings.TRIP_PLAN_TTL_SECONDS if ttl_seconds is None else ttl_seconds,
+            settings.PLAN_CACHE_TTL_SECONDS,
+        )
+
+    def save(self, plan_id: str, trip: TripPlan) -> None:
+        StoredTripPlan.objects.bulk_create(
+            [
+                StoredTripPlan(
+                    plan_id=plan_id,
+                    payload=pickle.dumps(trip, protocol=pickle.HIGHEST_PROTOCOL),
+                    expires_at=timezone.now() + timedelta(seconds=self.ttl_seconds),
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["plan_id"],
+            update_fields=["payload", "expires_at", "updated_at"],
+        )
+
+    def get(self, plan_id: str) -> TripPlan:
+        payload = (
+            StoredTripPlan.objects.filter(plan_id=plan_id, expires_at__gt=timezone.now())
+            .values_list("payload", flat=True)
+            .first()
+        )
+        if payload is None:
+            raise PlanNotFoundError("Plan handle is unknown or has expired; request a new plan")
+        return pickle.loads(payload)
+
+    @staticmethod
+    def purge_expired() -> int:
+        deleted, _ = StoredTripPlan.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+    @staticmethod
+    def plan_id_for(plan_cache_key: str) -> str:
+        return hashlib.sha256(plan_cache_key.encode()).hexdigest()[:32]
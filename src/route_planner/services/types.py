@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import math
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
 from dataclasses import dataclass
 from typing import Literal
 
@@ -21,6 +25,14 @@ class RouteData:
     coordinates: list[tuple[float, float]]
     distance_miles: float
     duration_seconds: float
+    # Per-leg routes of a multi-stop route; empty when the route is a single leg.
+    legs: tuple[RouteData, ...] = ()
+
+
+@dataclass(slots=True, frozen=True)
+class TableData:
+    distances_miles: list[list[float | None]]
+    durations_seconds: list[list[float | None]]
 
 
 @dataclass(slots=True, frozen=True)
@@ -37,6 +49,65 @@ class CandidateStation:
     distance_from_route_miles: float
 
 
+@dataclass(slots=True, frozen=True)
+class CandidateSet:
+    """Candidate stations as parallel columns, ordered by milepost.
+
+    The optimizers only read these four columns. Names and addresses are loaded
+    afterwards for the stations that become stops.
+    """
+
+    station_ids: array
+    mileposts: array
+    prices: array
+    offsets_miles: array
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    @classmethod
+    def from_stations(cls, stations: Sequence[CandidateStation]) -> CandidateSet:
+        return cls(
+            station_ids=array("q", (station.station_id for station in stations)),
+            mileposts=array("d", (station.milepost for station in stations)),
+            prices=array("d", (station.price_per_gallon for station in stations)),
+            offsets_miles=array("d", (station.distance_from_route_miles for station in stations)),
+        )
+
+    @classmethod
+    def joined(cls, parts: Sequence[tuple[float, CandidateSet]]) -> CandidateSet:
+        """Concatenate per-leg sets, shifting each leg's mileposts by its ``(offset, set)``.
+
+        Leg mileposts are measured along simplified geometry while offsets are OSRM leg
+        distances, so a station near a leg's end can land past the next leg's offset. Each
+        leg's mileposts are clamped to end at the next offset, which keeps the joined set
+        sorted by milepost.
+        """
+        joined = cls(
+            station_ids=array("q"),
+            mileposts=array("d"),
+            prices=array("d"),
+            offsets_miles=array("d"),
+        )
+        ends = [offset for offset, _ in parts[1:]] + [math.inf]
+        for (offset, part), end in zip(parts, ends, strict=True):
+            joined.station_ids.extend(part.station_ids)
+            joined.mileposts.extend(min(milepost + offset, end) for milepost in part.mileposts)
+            joined.prices.extend(part.prices)
+            joined.offsets_miles.extend(part.offsets_miles)
+        return joined
+
+    def beyond(self, milepost: float) -> CandidateSet:
+        """Candidates at or past ``milepost``, with mileposts measured from it."""
+        start = bisect_left(self.mileposts, milepost)
+        return CandidateSet(
+            station_ids=self.station_ids[start:],
+            mileposts=array("d", (value - milepost for value in self.mileposts[start:])),
+            prices=self.prices[start:],
+            offsets_miles=self.offsets_miles[start:],
+        )
+
+
 @dataclass(slots=True, frozen=True)
 class FuelStopPlan:
     station: CandidateStation
@@ -52,3 +123,18 @@ class OptimizationResult:
     stops: list[FuelStopPlan]
     total_gallons_purchased: float
     total_fuel_cost: float
+
+
+@dataclass(slots=True, frozen=True)
+class BoundingBox:
+    min_latitude: float
+    max_latitude: float
+    min_longitude: float
+    max_longitude: float
+
+
+# id, name, address, city, state, latitude, longitude, price_per_gallon
+type StationRow = tuple[int, str, str, str, str, float, float, float]
+
+# id, latitude, longitude, price_per_gallon
+type StationPoint = tuple[int, float, float, float]
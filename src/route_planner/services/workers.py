@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+from django.db import connections
+
+from route_planner.exceptions import PlanningFailedError, RoutePlannerError
+
+logger = logging.getLogger(__name__)
+
+
+def outcome[T](result: Callable[[], T]) -> T | RoutePlannerError:
+    """Return the value, or the error that one item's failure should report."""
+    try:
+        return result()
+    except RoutePlannerError as exc:
+        return exc
+    except Exception:
+        logger.exception("Planning item failed unexpectedly")
+        return PlanningFailedError("Planning failed unexpectedly")
+
+
+def in_worker[**P, T](function: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """Run ``function`` on a pool thread and close the thread's database connections."""
+    try:
+        return function(*args, **kwargs)
+    finally:
+        connections.close_all()
@@ -5,5 +5,21 @@ from route_planner import views
 urlpatterns = [
     path("", views.route_map_view, name="route-map"),
     path("api/v1/health", views.health_view, name="health"),
+    path("api/v1/metrics", views.metrics_view, name="metrics"),
+    path("api/v1/stations", views.stations_view, name="stations"),
     path("api/v1/route-plan", views.route_plan_view, name="route-plan"),
+    path("api/v1/route-plan/replan", views.route_replan_view, name="route-plan-replan"),
+    path("api/v1/route-plan/batch", views.route_plan_batch_view, name="route-plan-batch"),
+    path("api/v1/route-plan/jobs", views.route_plan_job_view, name="route-plan-jobs"),
+    path(
+        "api/v1/route-plan/batch/jobs",
+        views.route_plan_batch_job_view,
+        name="route-plan-batch-jobs",
+    ),
+    path(
+        "api/v1/route-plan/jobs/<str:job_id>",
+        views.route_plan_job_status_view,
+        name="route-plan-job",
+    ),
+    path("api/v1/route-plan/matrix", views.route_matrix_view, name="route-plan-matrix"),
 ]
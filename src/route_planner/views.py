@@ -1,11 +1,24 @@
 from __future__ import annotations
 
 import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
 from typing import Any
 
 from django.conf import settings
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.db.models import Count, Q
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 from pydantic import ValidationError
@@ -15,12 +28,66 @@ from route_planner.exceptions import (
     InvalidLocationError,
     NoFeasibleFuelPlanError,
     NoRouteFoundError,
+    PlanJobFailedError,
+    PlanJobNotFoundError,
+    PlannerOverloadedError,
+    PlanningFailedError,
+    PlanNotFoundError,
+    RoutePlannerError,
+    StaleStationDataError,
 )
 from route_planner.models import FuelStation
-from route_planner.schemas import RoutePlanRequest
+from route_planner.schemas import (
+    Coordinate,
+    ErrorDetail,
+    PlanJobQuery,
+    PlanJobResponse,
+    RouteMatrixCellResponse,
+    RouteMatrixRequest,
+    RouteMatrixResponse,
+    RoutePlanBatchItemResponse,
+    RoutePlanBatchRequest,
+    RoutePlanBatchResponse,
+    RoutePlanRequest,
+    RouteReplanRequest,
+    StationLayerQuery,
+)
+from route_planner.services.admission import SlotReleasingIterator, get_admission_controller
+from route_planner.services.batch import BatchItemResult, BatchRoutePlanner
+from route_planner.services.data_version import get_station_data_version
+from route_planner.services.jobs import JobKind, PlanJob, get_plan_job_queue
+from route_planner.services.matrix import MatrixCell, RouteMatrixService
+from route_planner.services.metrics import metrics, stage
+from route_planner.services.plan_cache import CachedPlan, PlanCache
 from route_planner.services.planner import RoutePlannerService
+from route_planner.services.profiling import (
+    PROFILE_ARTIFACT_HEADER,
+    PlanProfiler,
+    requested_profile_label,
+)
+from route_planner.services.station_clusters import StationCluster, get_station_cluster_index
+from route_planner.services.trips import TripStore
+from route_planner.services.types import BoundingBox, GeoPoint
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PLANNER_ERRORS: tuple[tuple[type[RoutePlannerError], str, int], ...] = (
+    (InvalidLocationError, "invalid_location", 400),
+    (NoFeasibleFuelPlanError, "no_feasible_plan", 422),
+    (NoRouteFoundError, "no_route", 502),
+    (ExternalServiceError, "upstream_error", 502),
+    (PlannerOverloadedError, "overloaded", 503),
+    (StaleStationDataError, "stale_station_data", 409),
+    (PlanNotFoundError, "plan_not_found", 404),
+    (PlanJobNotFoundError, "job_not_found", 404),
+    (PlanJobFailedError, "job_failed", 500),
+    (PlanningFailedError, "internal_error", 500),
+)
 
 _planner_service: RoutePlannerService | None = None
+_station_counts: tuple[float, dict[str, int]] | None = None
+_station_counts_lock = threading.Lock()
 
 
 def get_route_planner() -> RoutePlannerService:
@@ -50,21 +117,90 @@ def route_map_view(request: HttpRequest) -> HttpResponse:
 
 @require_GET
 def health_view(_: HttpRequest) -> HttpResponse:
-    total_stations = FuelStation.objects.count()
-    geocoded_stations = (
-        FuelStation.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True).count()
-    )
+    admission = get_admission_controller()
+    jobs = get_plan_job_queue()
     return JsonResponse(
         {
             "status": "ok",
-            "stations": {
-                "total": total_stations,
-                "geocoded": geocoded_stations,
+            "stations": _cached_station_counts(),
+            "planner": {
+                "in_flight": admission.in_flight,
+                "max_concurrency": admission.max_concurrency,
             },
+            "jobs": {"queued": jobs.queued, "running": jobs.running, "workers": jobs.workers},
+        }
+    )
+
+
+def _cached_station_counts() -> dict[str, int]:
+    """Station counts for the health check, refreshed at most every HEALTH_CACHE_SECONDS."""
+    global _station_counts
+    cached = _station_counts
+    if cached is not None and time.monotonic() - cached[0] < settings.HEALTH_CACHE_SECONDS:
+        return cached[1]
+
+    with _station_counts_lock:
+        cached = _station_counts
+        if cached is not None and time.monotonic() - cached[0] < settings.HEALTH_CACHE_SECONDS:
+            return cached[1]
+        counts = FuelStation.objects.aggregate(
+            total=Count("id"),
+            geocoded=Count("id", filter=Q(latitude__isnull=False, longitude__isnull=False)),
+        )
+        _station_counts = (time.monotonic(), counts)
+        return counts
+
+
+@require_GET
+def metrics_view(_: HttpRequest) -> HttpResponse:
+    return HttpResponse(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@require_GET
+def stations_view(request: HttpRequest) -> HttpResponse:
+    try:
+        query = StationLayerQuery.model_validate(
+            {"bbox": request.GET.get("bbox"), "zoom": request.GET.get("zoom")}
+        )
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    min_longitude, min_latitude, max_longitude, max_latitude = query.bbox
+    bbox = BoundingBox(
+        min_latitude=min_latitude,
+        max_latitude=max_latitude,
+        min_longitude=min_longitude,
+        max_longitude=max_longitude,
+    )
+    cluster_index = get_station_cluster_index()
+    zoom, clusters = cluster_index.query(bbox, query.zoom, settings.STATION_LAYER_MAX_FEATURES)
+    return JsonResponse(
+        {
+            "type": "FeatureCollection",
+            "zoom": zoom,
+            "data_version": cluster_index.version,
+            "features": [_cluster_feature(cluster) for cluster in clusters],
         }
     )
 
 
+def _cluster_feature(cluster: StationCluster) -> dict[str, Any]:
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [round(cluster.longitude, 6), round(cluster.latitude, 6)],
+        },
+        "properties": {
+            "station_id": cluster.station_id,
+            "name": cluster.name,
+            "count": cluster.count,
+            "min_price": round(cluster.min_price, 3),
+            "avg_price": round(cluster.avg_price, 3),
+        },
+    }
+
+
 @csrf_exempt
 @require_POST
 def route_plan_view(request: HttpRequest) -> HttpResponse:
@@ -75,30 +211,271 @@ def route_plan_view(request: HttpRequest) -> HttpResponse:
     try:
         route_request = RoutePlanRequest.model_validate(payload)
     except ValidationError as exc:
-        return JsonResponse(
-            {
-                "error": {
-                    "code": "validation_error",
-                    "message": "Invalid request payload",
-                    "details": exc.errors(),
-                }
-            },
-            status=400,
-        )
+        return _validation_error_response(exc)
+
+    cache_key = PlanCache.key_for(route_request, get_station_data_version())
+    profiler = PlanProfiler(requested_profile_label(request))
+    try:
+        cached_plan = _cached_plan(route_request, cache_key, profiler=profiler)
+    except RoutePlannerError as exc:
+        return _planner_error_response(exc)
+
+    headers = {"ETag": cached_plan.etag}
+    if profiler.path is not None:
+        headers[PROFILE_ARTIFACT_HEADER] = profiler.path.name
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if "*" in if_none_match or cached_plan.etag in if_none_match:
+        return HttpResponseNotModified(headers=headers)
+    return HttpResponse(cached_plan.body, content_type="application/json", headers=headers)
+
+
+def _cached_plan(
+    route_request: RoutePlanRequest,
+    cache_key: str,
+    profiler: PlanProfiler | None = None,
+    block: bool = False,
+) -> CachedPlan:
+    plan_cache = PlanCache()
+    # A profiled request always plans, since a cached plan would leave nothing to profile.
+    profiled = profiler is not None and profiler.label is not None
+    cached_plan = None if profiled else plan_cache.get(cache_key)
+    if cached_plan is not None:
+        return cached_plan
 
     planner = get_route_planner()
+    plan_id = TripStore.plan_id_for(cache_key)
+
+    with ExitStack() as guards:
+        guards.enter_context(get_admission_controller().admit(block=block))
+        if profiler is not None:
+            guards.enter_context(profiler)
+        response = planner.plan(route_request, plan_id=plan_id)
+    with stage("serialize"):
+        body = response.model_dump_json().encode()
+    return plan_cache.store(cache_key, body)
+
+
+@csrf_exempt
+@require_POST
+def route_replan_view(request: HttpRequest) -> HttpResponse:
+    payload = _parse_json_payload(request)
+    if isinstance(payload, JsonResponse):
+        return payload
+
     try:
-        response = planner.plan(route_request)
-    except InvalidLocationError as exc:
-        return _error_response("invalid_location", str(exc), status=400)
-    except NoFeasibleFuelPlanError as exc:
-        return _error_response("no_feasible_plan", str(exc), status=422)
-    except NoRouteFoundError as exc:
-        return _error_response("no_route", str(exc), status=502)
-    except ExternalServiceError as exc:
-        return _error_response("upstream_error", str(exc), status=502)
+        replan_request = RouteReplanRequest.model_validate(payload)
+    except ValidationError as exc:
+        return _validation_error_response(exc)
 
-    return JsonResponse(response.model_dump(mode="json"), status=200)
+    try:
+        with get_admission_controller().admit():
+            response = get_route_planner().replan(replan_request)
+    except RoutePlannerError as exc:
+        return _planner_error_response(exc)
+    with stage("serialize"):
+        body = response.model_dump_json()
+    return HttpResponse(body, content_type="application/json")
+
+
+@csrf_exempt
+@require_POST
+def route_plan_batch_view(request: HttpRequest) -> HttpResponse:
+    payload = _parse_json_payload(request)
+    if isinstance(payload, JsonResponse):
+        return payload
+
+    try:
+        batch_request = RoutePlanBatchRequest.model_validate(payload)
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    try:
+        slot = get_admission_controller().admit(settings.BATCH_PLAN_MAX_WORKERS)
+    except PlannerOverloadedError as exc:
+        return _planner_error_response(exc)
+
+    batch_planner = BatchRoutePlanner(get_route_planner(), max_workers=slot.permits)
+    if _wants_ndjson(request):
+        streaming_response = StreamingHttpResponse(
+            SlotReleasingIterator(_ndjson_batch_lines(batch_planner, batch_request.items), slot),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+        streaming_response["X-Accel-Buffering"] = "no"
+        return streaming_response
+
+    with slot:
+        batch_response = _batch_response(batch_planner, batch_request.items)
+    return HttpResponse(batch_response.model_dump_json(), content_type="application/json")
+
+
+@csrf_exempt
+@require_POST
+def route_plan_job_view(request: HttpRequest) -> HttpResponse:
+    payload = _parse_json_payload(request)
+    if isinstance(payload, JsonResponse):
+        return payload
+
+    try:
+        route_request = RoutePlanRequest.model_validate(payload)
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    # Keyed on the data version at submission, like a synchronous plan would have been.
+    cache_key = PlanCache.key_for(route_request, get_station_data_version())
+    return _submit_job("plan", lambda: _cached_plan(route_request, cache_key, block=True).body)
+
+
+@csrf_exempt
+@require_POST
+def route_plan_batch_job_view(request: HttpRequest) -> HttpResponse:
+    payload = _parse_json_payload(request)
+    if isinstance(payload, JsonResponse):
+        return payload
+
+    try:
+        batch_request = RoutePlanBatchRequest.model_validate(payload)
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    def run() -> bytes:
+        admission = get_admission_controller()
+        with admission.admit(settings.BATCH_PLAN_MAX_WORKERS, block=True) as slot:
+            batch_planner = BatchRoutePlanner(get_route_planner(), max_workers=slot.permits)
+            batch_response = _batch_response(batch_planner, batch_request.items)
+        return batch_response.model_dump_json().encode()
+
+    return _submit_job("batch", run)
+
+
+@require_GET
+def route_plan_job_status_view(request: HttpRequest, job_id: str) -> HttpResponse:
+    try:
+        query = PlanJobQuery.model_validate({"wait": request.GET.get("wait") or 0})
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    try:
+        job = get_plan_job_queue().wait(job_id, min(query.wait, settings.PLAN_JOB_MAX_WAIT_SECONDS))
+    except RoutePlannerError as exc:
+        return _planner_error_response(exc)
+    return HttpResponse(_job_body(job), content_type="application/json")
+
+
+def _submit_job(kind: JobKind, run: Callable[[], bytes]) -> HttpResponse:
+    try:
+        job = get_plan_job_queue().submit(kind, run)
+    except PlannerOverloadedError as exc:
+        return _planner_error_response(exc)
+    return HttpResponse(
+        _job_body(job),
+        content_type="application/json",
+        status=202,
+        headers={"Location": reverse("route-plan-job", args=[job.job_id])},
+    )
+
+
+def _job_body(job: PlanJob) -> bytes:
+    """Serialize ``job``, splicing its stored result bytes in as they are."""
+    envelope = PlanJobResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        submitted_at=job.submitted_at,
+        finished_at=job.finished_at,
+        error=_planner_error(job.error) if job.error is not None else None,
+    ).model_dump_json(exclude={"result"})
+    result = job.result if job.result is not None else b"null"
+    return envelope[:-1].encode() + b',"result":' + result + b"}"
+
+
+def _batch_response(
+    batch_planner: BatchRoutePlanner, items: list[RoutePlanRequest]
+) -> RoutePlanBatchResponse:
+    results = [_batch_item(result) for result in batch_planner.plan(items)]
+    failed = sum(1 for item in results if item.error is not None)
+    return RoutePlanBatchResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+
+@csrf_exempt
+@require_POST
+def route_matrix_view(request: HttpRequest) -> HttpResponse:
+    payload = _parse_json_payload(request)
+    if isinstance(payload, JsonResponse):
+        return payload
+
+    try:
+        matrix_request = RouteMatrixRequest.model_validate(payload)
+    except ValidationError as exc:
+        return _validation_error_response(exc)
+
+    try:
+        with get_admission_controller().admit(settings.BATCH_PLAN_MAX_WORKERS) as slot:
+            matrix_service = RouteMatrixService(get_route_planner(), max_workers=slot.permits)
+            result = matrix_service.estimate(matrix_request)
+    except PlannerOverloadedError as exc:
+        return _planner_error_response(exc)
+    matrix_response = RouteMatrixResponse(
+        origins=[_coordinate(point) for point in result.origins],
+        destinations=[_coordinate(point) for point in result.destinations],
+        cells=[_matrix_cell(cell) for cell in result.cells],
+        assumptions={"vehicle_mpg": result.vehicle_mpg},
+    )
+    return HttpResponse(matrix_response.model_dump_json(), content_type="application/json")
+
+
+def _coordinate(point: GeoPoint | None) -> Coordinate | None:
+    if point is None:
+        return None
+    return Coordinate(latitude=round(point.latitude, 6), longitude=round(point.longitude, 6))
+
+
+def _matrix_cell(cell: MatrixCell) -> RouteMatrixCellResponse:
+    return RouteMatrixCellResponse(
+        origin=cell.origin,
+        destination=cell.destination,
+        distance_miles=_rounded(cell.distance_miles, 3),
+        duration_minutes=_rounded(
+            cell.duration_seconds / 60.0 if cell.duration_seconds is not None else None, 2
+        ),
+        estimated_price_per_gallon=_rounded(cell.price_per_gallon, 3),
+        estimated_fuel_gallons=_rounded(cell.fuel_gallons, 3),
+        estimated_fuel_cost=_rounded(cell.fuel_cost, 2),
+        plan=cell.plan,
+        error=_planner_error(cell.error) if cell.error is not None else None,
+    )
+
+
+def _rounded(value: float | None, digits: int) -> float | None:
+    return round(value, digits) if value is not None else None
+
+
+def _wants_ndjson(request: HttpRequest) -> bool:
+    return request.GET.get("format") == "ndjson" or NDJSON_CONTENT_TYPE in request.headers.get(
+        "Accept", ""
+    )
+
+
+def _ndjson_batch_lines(
+    batch_planner: BatchRoutePlanner, items: list[RoutePlanRequest]
+) -> Iterator[bytes]:
+    succeeded = 0
+    failed = 0
+    for result in batch_planner.iter_results(items):
+        item = _batch_item(result)
+        if item.error is None:
+            succeeded += 1
+        else:
+            failed += 1
+        yield item.model_dump_json().encode() + b"\n"
+    yield json.dumps({"summary": {"succeeded": succeeded, "failed": failed}}).encode() + b"\n"
+
+
+def _batch_item(result: BatchItemResult) -> RoutePlanBatchItemResponse:
+    return RoutePlanBatchItemResponse(
+        index=result.index,
+        plan=result.response,
+        error=_planner_error(result.error) if result.error is not None else None,
+    )
 
 
 def _parse_json_payload(request: HttpRequest) -> dict[str, Any] | JsonResponse:
@@ -116,5 +493,33 @@ def _parse_json_payload(request: HttpRequest) -> dict[str, Any] | JsonResponse:
     return payload
 
 
+def _planner_error(exc: RoutePlannerError) -> ErrorDetail:
+    for error_type, code, status in PLANNER_ERRORS:
+        if isinstance(exc, error_type):
+            return ErrorDetail(code=code, message=str(exc), status=status)
+    raise exc
+
+
+def _planner_error_response(exc: RoutePlannerError) -> JsonResponse:
+    error = _planner_error(exc)
+    response = _error_response(error.code, error.message, status=error.status)
+    if isinstance(exc, PlannerOverloadedError):
+        response["Retry-After"] = str(settings.PLAN_RETRY_AFTER_SECONDS)
+    return response
+
+
+def _validation_error_response(exc: ValidationError) -> JsonResponse:
+    return JsonResponse(
+        {
+            "error": {
+                "code": "validation_error",
+                "message": "Invalid request payload",
+                "details": json.loads(exc.json()),
+            }
+        },
+        status=400,
+    )
+
+
 def _error_response(code: str, message: str, status: int) -> JsonResponse:
     return JsonResponse({"error": {"code": code, "message": message}}, status=status)
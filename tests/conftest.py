@@ -8,3 +8,64 @@ def api_client():
     from django.test import Client
 
     return Client()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def locations():
+    from route_planner.services.types import GeoPoint
+
+    return {
+        "austin, tx": GeoPoint(latitude=30.2672, longitude=-97.7431),
+        "houston, tx": GeoPoint(latitude=29.7604, longitude=-95.3698),
+        "dallas, tx": GeoPoint(latitude=32.7767, longitude=-96.7970),
+        "start, tx": GeoPoint(latitude=30.0, longitude=-100.0),
+        "pickup, tx": GeoPoint(latitude=30.0, longitude=-98.0),
+        "drop, tx": GeoPoint(latitude=30.0, longitude=-96.0),
+        "other drop, tx": GeoPoint(latitude=31.0, longitude=-98.0),
+    }
+
+
+@pytest.fixture
+def geocode(locations):
+    """A geocoder ``side_effect`` that resolves ``locations`` and rejects anything else."""
+    from route_planner.exceptions import InvalidLocationError
+    from route_planner.services.types import GeocodeResult
+
+    def geocode(query: str, *, country_code: str = "us"):
+        point = locations.get(query.strip().lower())
+        if point is None:
+            raise InvalidLocationError("Location could not be resolved")
+        return GeocodeResult(point=point, country_code=country_code)
+
+    return geocode
+
+
+@pytest.fixture
+def create_station():
+    from route_planner.models import FuelStation
+
+    def create_station(
+        station_id: int, latitude: float, longitude: float, price: float
+    ) -> FuelStation:
+        return FuelStation.objects.create(
+            opis_truckstop_id=station_id,
+            truckstop_name=f"Station {station_id}",
+            address=f"{station_id} Main",
+            city="Austin",
+            state="TX",
+            retail_price=price,
+            canonical_key=f"{station_id} MAIN|AUSTIN|TX",
+            latitude=latitude,
+            longitude=longitude,
+        )
+
+    return create_station
@@ -7,6 +7,10 @@ import pytest
 
 from route_planner.models import FuelStation
 from route_planner.schemas import Coordinate, RoutePlanResponse, RouteSummaryResponse
+from route_planner.services.station_clusters import StationClusterIndex
+from route_planner.services.station_index import StationSnapshot
+from route_planner.services.station_selection import StationSelector
+from route_planner.services.types import CandidateSet
 
 
 def test_route_map_view_renders(api_client) -> None:
@@ -63,6 +67,40 @@ def test_health_endpoint_returns_station_counts(api_client) -> None:
     assert payload["stations"]["geocoded"] == 1
 
 
+@pytest.mark.django_db
+def test_stations_endpoint_returns_clustered_geojson(api_client, mocker) -> None:
+    FuelStation.objects.create(
+        opis_truckstop_id=1,
+        truckstop_name="Station",
+        address="1 Main",
+        city="Austin",
+        state="TX",
+        retail_price=3.5,
+        canonical_key="1 MAIN|AUSTIN|TX",
+        latitude=30.1,
+        longitude=-97.1,
+    )
+    mocker.patch(
+        "route_planner.views.get_station_cluster_index",
+        return_value=StationClusterIndex(StationSnapshot.load(version=0)),
+    )
+
+    response = api_client.get("/api/v1/stations", {"bbox": "-125,20,-65,50", "zoom": "5"})
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["type"] == "FeatureCollection"
+    assert payload["zoom"] == 5
+    [feature] = payload["features"]
+    assert feature["geometry"]["coordinates"] == [-97.1, 30.1]
+    assert feature["properties"]["count"] == 1
+    assert feature["properties"]["min_price"] == 3.5
+
+    invalid = api_client.get("/api/v1/stations", {"bbox": "-65,20,-125,50", "zoom": "5"})
+    assert invalid.status_code == 400
+    assert invalid.json()["error"]["code"] == "validation_error"
+
+
 def test_route_plan_validation_error_returns_400(api_client) -> None:
     response = api_client.post(
         "/api/v1/route-plan",
@@ -130,9 +168,10 @@ def test_route_plan_success_uses_planner_response(api_client, mocker) -> None:
     planner.plan.assert_called_once()
 
 
+@pytest.mark.django_db
 def test_route_plan_accepts_vehicle_overrides(api_client, mocker) -> None:
     planner = mocker.Mock()
-    planner.plan.return_value = mocker.Mock(model_dump=lambda mode: {"ok": True})
+    planner.plan.return_value = mocker.Mock(model_dump_json=lambda: '{"ok": true}')
     mocker.patch("route_planner.views.get_route_planner", return_value=planner)
 
     response = api_client.post(
@@ -158,3 +197,299 @@ def test_route_plan_accepts_vehicle_overrides(api_client, mocker) -> None:
     assert route_request.vehicle_mpg == 12.5
     assert route_request.tank_capacity_gallons == 70.0
     assert route_request.max_range_miles == 650.0
+
+
+def test_route_plan_batch_returns_per_item_results_and_error_codes(api_client, mocker) -> None:
+    from route_planner.exceptions import InvalidLocationError
+    from route_planner.services.batch import BatchItemResult
+
+    fake_plan = mocker.patch("route_planner.views.BatchRoutePlanner.plan")
+    fake_plan.return_value = [
+        BatchItemResult(index=0, error=InvalidLocationError("Location must be within the USA")),
+    ]
+    mocker.patch("route_planner.views.get_route_planner")
+
+    response = api_client.post(
+        "/api/v1/route-plan/batch",
+        data=json.dumps({"items": [{"start_location": "Paris", "finish_location": "Lyon"}]}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["failed"] == 1
+    assert payload["results"][0]["error"] == {
+        "code": "invalid_location",
+        "message": "Location must be within the USA",
+        "status": 400,
+    }
+
+
+def test_route_plan_batch_validation_error_returns_400(api_client) -> None:
+    response = api_client.post(
+        "/api/v1/route-plan/batch",
+        data=json.dumps({"items": []}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "validation_error"
+
+
+def test_route_plan_batch_streams_ndjson_lines(api_client, mocker) -> None:
+    from route_planner.exceptions import NoFeasibleFuelPlanError
+    from route_planner.services.batch import BatchItemResult
+
+    mocker.patch(
+        "route_planner.views.BatchRoutePlanner.iter_results",
+        return_value=iter(
+            [
+                BatchItemResult(index=1, error=NoFeasibleFuelPlanError("Gap too long")),
+                BatchItemResult(index=0, error=NoFeasibleFuelPlanError("Gap too long")),
+            ]
+        ),
+    )
+    mocker.patch("route_planner.views.get_route_planner")
+    item = {"start_location": "Austin, TX", "finish_location": "Houston, TX"}
+
+    response = api_client.post(
+        "/api/v1/route-plan/batch?format=ndjson",
+        data=json.dumps({"items": [item, item]}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert [line.get("index") for line in lines[:2]] == [1, 0]
+    assert lines[0]["error"]["code"] == "no_feasible_plan"
+    assert lines[-1] == {"summary": {"succeeded": 0, "failed": 2}}
+
+
+@pytest.mark.django_db
+def test_route_plan_serves_cached_bytes_with_etag_until_data_version_changes(
+    api_client, mocker
+) -> None:
+    from route_planner.services.data_version import bump_station_data_version
+
+    planner = mocker.Mock()
+    planner.plan.return_value = mocker.Mock(model_dump_json=lambda: '{"ok": true}')
+    mocker.patch("route_planner.views.get_route_planner", return_value=planner)
+    payload = json.dumps({"start_location": "Austin, TX", "finish_location": "Houston, TX"})
+    equivalent_payload = json.dumps(
+        {"start_location": "  austin,   TX", "finish_location": "Houston, TX", "vehicle_mpg": 10}
+    )
+
+    first = api_client.post("/api/v1/route-plan", data=payload, content_type="application/json")
+    second = api_client.post(
+        "/api/v1/route-plan", data=equivalent_payload, content_type="application/json"
+    )
+
+    assert first.status_code == 200
+    assert second.content == first.content
+    assert second["ETag"] == first["ETag"]
+    planner.plan.assert_called_once()
+
+    not_modified = api_client.post(
+        "/api/v1/route-plan",
+        data=payload,
+        content_type="application/json",
+        headers={"If-None-Match": first["ETag"]},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == first["ETag"]
+
+    bump_station_data_version()
+    api_client.post("/api/v1/route-plan", data=payload, content_type="application/json")
+    assert planner.plan.call_count == 2
+
+
+def test_route_matrix_rejects_detail_pairs_outside_the_matrix(api_client) -> None:
+    response = api_client.post(
+        "/api/v1/route-plan/matrix",
+        data=json.dumps(
+            {
+                "origins": ["Austin, TX"],
+                "destinations": ["Dallas, TX"],
+                "detail": [{"origin": 0, "destination": 1}],
+            }
+        ),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "validation_error"
+
+
+@pytest.mark.django_db
+def test_route_plan_sheds_load_with_retry_after_when_at_capacity(api_client, mocker) -> None:
+    from route_planner.services.admission import AdmissionController
+
+    controller = AdmissionController(max_concurrency=1, queue_timeout_seconds=0)
+    mocker.patch("route_planner.views.get_admission_controller", return_value=controller)
+    planner = mocker.patch("route_planner.views.get_route_planner").return_value
+    item = {"start_location": "Austin, TX", "finish_location": "Houston, TX"}
+
+    with controller.admit():
+        response = api_client.post(
+            "/api/v1/route-plan", data=json.dumps(item), content_type="application/json"
+        )
+        health = api_client.get("/api/v1/health")
+
+    assert response.status_code == 503
+    assert response["Retry-After"] == "2"
+    assert response.json()["error"]["code"] == "overloaded"
+    planner.plan.assert_not_called()
+    assert health.status_code == 200
+    assert health.json()["planner"] == {"in_flight": 1, "max_concurrency": 1}
+
+    mocker.patch("route_planner.views.BatchRoutePlanner.iter_results", return_value=iter([]))
+    streamed = api_client.post(
+        "/api/v1/route-plan/batch?format=ndjson",
+        data=json.dumps({"items": [item]}),
+        content_type="application/json",
+    )
+    assert controller.in_flight == 1
+    b"".join(streamed.streaming_content)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.django_db
+def test_batch_fan_out_is_charged_one_slot_per_planning_thread(
+    api_client, mocker, settings
+) -> None:
+    from route_planner.services.admission import AdmissionController
+
+    settings.BATCH_PLAN_MAX_WORKERS = 4
+    controller = AdmissionController(max_concurrency=3, queue_timeout_seconds=0)
+    mocker.patch("route_planner.views.get_admission_controller", return_value=controller)
+    mocker.patch("route_planner.views.get_route_planner")
+    batch_planner = mocker.patch("route_planner.views.BatchRoutePlanner")
+    batch_planner.return_value.plan.return_value = []
+    item = {"start_location": "Austin, TX", "finish_location": "Houston, TX"}
+
+    with controller.admit():
+        response = api_client.post(
+            "/api/v1/route-plan/batch",
+            data=json.dumps({"items": [item]}),
+            content_type="application/json",
+        )
+        assert controller.in_flight == 1
+
+    assert response.status_code == 200
+    assert batch_planner.call_args.kwargs["max_workers"] == 2
+    assert controller.in_flight == 0
+
+
+@pytest.mark.django_db
+def test_route_plan_reports_stage_timings_and_metrics(api_client, mocker) -> None:
+    from route_planner.services.planner import RoutePlannerService
+    from route_planner.services.types import GeocodeResult, GeoPoint, RouteData
+
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.return_value = GeocodeResult(
+        point=GeoPoint(latitude=30.0, longitude=-97.0), country_code="us"
+    )
+    osrm_client = mocker.Mock()
+    osrm_client.route.return_value = RouteData(
+        coordinates=[(-97.0, 30.0), (-96.0, 30.5)], distance_miles=70.0, duration_seconds=4200.0
+    )
+    station_selector = StationSelector()
+    mocker.patch.object(
+        station_selector,
+        "select_candidate_stations",
+        return_value=CandidateSet.from_stations([]),
+    )
+    mocker.patch(
+        "route_planner.views.get_route_planner",
+        return_value=RoutePlannerService(
+            geocoding_client=geocoding_client,
+            osrm_client=osrm_client,
+            station_selector=station_selector,
+        ),
+    )
+
+    response = api_client.post(
+        "/api/v1/route-plan",
+        data=json.dumps({"start_location": "Austin, TX", "finish_location": "Waco, TX"}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+    assert stages == [
+        "geocode",
+        "route",
+        "select_candidates",
+        "optimize",
+        "prepare_route",
+        "save_trip",
+        "serialize",
+        "total",
+    ]
+
+    metrics_response = api_client.get("/api/v1/metrics")
+    assert metrics_response["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = metrics_response.content.decode()
+    assert 'route_planner_stage_seconds_bucket{stage="optimize",le="+Inf"}' in body
+    assert 'route_planner_cache_requests_total{cache="plan",result="miss"}' in body
+
+
+@pytest.mark.django_db
+def test_route_plan_profiles_requests_with_a_signed_header(
+    api_client, mocker, settings, tmp_path
+) -> None:
+    import pstats
+
+    from route_planner.services.planner import RoutePlannerService
+    from route_planner.services.profiling import make_profile_token
+    from route_planner.services.types import GeocodeResult, GeoPoint, RouteData
+
+    settings.PLAN_PROFILING_ENABLED = True
+    settings.PLAN_PROFILING_DIR = tmp_path
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.return_value = GeocodeResult(
+        point=GeoPoint(latitude=30.0, longitude=-97.0), country_code="us"
+    )
+    osrm_client = mocker.Mock()
+    osrm_client.route.return_value = RouteData(
+        coordinates=[(-97.0, 30.0), (-96.0, 30.5)], distance_miles=70.0, duration_seconds=4200.0
+    )
+    station_selector = StationSelector()
+    mocker.patch.object(
+        station_selector,
+        "select_candidate_stations",
+        return_value=CandidateSet.from_stations([]),
+    )
+    mocker.patch(
+        "route_planner.views.get_route_planner",
+        return_value=RoutePlannerService(
+            geocoding_client=geocoding_client,
+            osrm_client=osrm_client,
+            station_selector=station_selector,
+        ),
+    )
+    body = json.dumps({"start_location": "Austin, TX", "finish_location": "Waco, TX"})
+
+    unsigned = api_client.post(
+        "/api/v1/route-plan",
+        data=body,
+        content_type="application/json",
+        HTTP_X_PLAN_PROFILE="slow-lane",
+    )
+    profiled = api_client.post(
+        "/api/v1/route-plan",
+        data=body,
+        content_type="application/json",
+        HTTP_X_PLAN_PROFILE=make_profile_token("slow lane"),
+    )
+
+    assert unsigned.status_code == 200
+    assert "X-Plan-Profile-Artifact" not in unsigned
+    assert profiled.status_code == 200
+    assert station_selector.select_candidate_stations.call_count == 2
+    artifact = tmp_path / profiled["X-Plan-Profile-Artifact"]
+    assert "slow_lane" in artifact.name
+    assert any(
+        function_name == "plan_route" for _, _, function_name in pstats.Stats(str(artifact)).stats
+    )
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from route_planner.exceptions import InvalidLocationError, PlanningFailedError
+from route_planner.schemas import RoutePlanRequest
+from route_planner.services.batch import BatchRoutePlanner
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.types import GeoPoint, RouteData
+
+
+def _route(start: GeoPoint, finish: GeoPoint) -> RouteData:
+    return RouteData(
+        coordinates=[(start.longitude, start.latitude), (finish.longitude, finish.latitude)],
+        distance_miles=160.0,
+        duration_seconds=9600.0,
+    )
+
+
+@pytest.fixture
+def planner(mocker, geocode) -> RoutePlannerService:
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.side_effect = geocode
+    osrm_client = mocker.Mock()
+    osrm_client.route.side_effect = _route
+    station_selector = mocker.Mock()
+    station_selector.select_candidate_stations.return_value = []
+    return RoutePlannerService(
+        geocoding_client=geocoding_client,
+        osrm_client=osrm_client,
+        station_selector=station_selector,
+    )
+
+
+def test_batch_planner_deduplicates_geocoding_and_routing(planner) -> None:
+    requests = [
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Houston, TX"),
+        RoutePlanRequest(start_location="austin,  TX ", finish_location="Houston, TX"),
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Dallas, TX"),
+        RoutePlanRequest(start_location="Houston, TX", finish_location="Austin, TX"),
+    ]
+
+    results = BatchRoutePlanner(planner, max_workers=2).plan(requests)
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert all(result.response is not None for result in results)
+    assert planner.geocoding_client.geocode.call_count == 3
+    assert planner.osrm_client.route.call_count == 3
+
+
+def test_batch_planner_reports_per_item_errors(planner) -> None:
+    requests = [
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Houston, TX"),
+        RoutePlanRequest(start_location="Nowhere", finish_location="Houston, TX"),
+    ]
+
+    results = BatchRoutePlanner(planner, max_workers=2).plan(requests)
+
+    assert results[0].response is not None
+    assert results[1].response is None
+    assert isinstance(results[1].error, InvalidLocationError)
+
+
+def test_batch_planner_reports_unexpected_errors_per_item(planner, mocker) -> None:
+    plan_route = planner.plan_route
+    mocker.patch.object(
+        planner,
+        "plan_route",
+        side_effect=lambda request, *args, **kwargs: (
+            plan_route(request, *args, **kwargs)
+            if request.finish_location == "Houston, TX"
+            else 1 / 0
+        ),
+    )
+    requests = [
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Houston, TX"),
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Dallas, TX"),
+    ]
+
+    results = BatchRoutePlanner(planner, max_workers=2).plan(requests)
+
+    assert results[0].response is not None
+    assert isinstance(results[1].error, PlanningFailedError)
+
+
+def test_batch_planner_streams_items_of_one_lane_as_they_finish(planner, mocker) -> None:
+    release = threading.Event()
+    plan_route = planner.plan_route
+
+    def blocking_plan_route(request, *args, **kwargs):
+        if request.start_fuel_percent == 50:
+            release.wait(timeout=5)
+        return plan_route(request, *args, **kwargs)
+
+    mocker.patch.object(planner, "plan_route", side_effect=blocking_plan_route)
+    requests = [
+        RoutePlanRequest(
+            start_location="Austin, TX", finish_location="Houston, TX", start_fuel_percent=50
+        ),
+        RoutePlanRequest(start_location="Austin, TX", finish_location="Houston, TX"),
+    ]
+
+    results = BatchRoutePlanner(planner, max_workers=2).iter_results(requests)
+
+    assert next(results).index == 1
+    release.set()
+    assert next(results).index == 0
+    assert planner.osrm_client.route.call_count == 1
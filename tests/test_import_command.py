@@ -4,8 +4,10 @@ from pathlib import Path
 
 import pytest
 from django.core.management import call_command
+from django.core.management.base import CommandError
 
-from route_planner.models import FuelStation
+from route_planner.models import FuelImportBatch, FuelPriceHistory, FuelStation
+from route_planner.services.data_version import get_station_data_version
 
 
 @pytest.mark.django_db
@@ -32,3 +34,198 @@ def test_import_fuel_prices_deduplicates_and_uses_cheapest(tmp_path: Path) -> No
     tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
     assert float(tulsa.retail_price) == pytest.approx(3.2)
     assert tulsa.opis_truckstop_id == 2
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_stream_mode_keeps_cheapest_across_batches(tmp_path: Path) -> None:
+    csv_path = tmp_path / "stations.csv"
+    csv_path.write_text(
+        "\n".join(
+            [
+                "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price",
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.500",
+                "4,Stop C,300 Lake Dr,Austin,TX,30,3.900",
+                "2,Stop A Duplicate,100 Main St,Tulsa,OK,11,3.200",
+                "5,Stop C Duplicate,300 Lake Dr,Austin,TX,31,4.100",
+                "3,Stop B,200 River Rd,Denver,CO,20,0",
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    call_command("import_fuel_prices", csv_path=str(csv_path), stream=True, batch_size=1)
+
+    assert FuelStation.objects.count() == 2
+    tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
+    assert float(tulsa.retail_price) == pytest.approx(3.2)
+    assert tulsa.opis_truckstop_id == 2
+    austin = FuelStation.objects.get(canonical_key="300 LAKE DR|AUSTIN|TX")
+    assert float(austin.retail_price) == pytest.approx(3.9)
+    assert austin.opis_truckstop_id == 4
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_upsert_mode_writes_only_changed_rows(tmp_path: Path, capsys) -> None:
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+    csv_path = tmp_path / "stations.csv"
+    csv_path.write_text(
+        "\n".join(
+            [
+                header,
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.500",
+                "4,Stop C,300 Lake Dr,Austin,TX,30,3.900",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    call_command("import_fuel_prices", csv_path=str(csv_path), upsert=True)
+    austin_updated_at = FuelStation.objects.get(canonical_key="300 LAKE DR|AUSTIN|TX").updated_at
+
+    csv_path.write_text(
+        "\n".join(
+            [
+                header,
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.250",
+                "4,Stop C,300 Lake Dr,Austin,TX,30,3.900",
+                "5,Stop D,400 Hill Rd,Boise,ID,40,4.100",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    capsys.readouterr()
+    call_command("import_fuel_prices", csv_path=str(csv_path), upsert=True, stream=True)
+
+    output = capsys.readouterr().out
+    assert "3 rows normalized, 1 created, 1 updated, 1 unchanged" in output
+    assert FuelStation.objects.count() == 3
+    tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
+    assert float(tulsa.retail_price) == pytest.approx(3.25)
+    austin = FuelStation.objects.get(canonical_key="300 LAKE DR|AUSTIN|TX")
+    assert austin.updated_at == austin_updated_at
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_streamed_upsert_counts_each_station_once(
+    tmp_path: Path, capsys
+) -> None:
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+    csv_path = tmp_path / "stations.csv"
+    csv_path.write_text(f"{header}\n1,Stop A,100 Main St,Tulsa,OK,10,3.500", encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path), upsert=True)
+
+    csv_path.write_text(
+        "\n".join(
+            [
+                header,
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.400",
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.300",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    capsys.readouterr()
+    call_command(
+        "import_fuel_prices", csv_path=str(csv_path), upsert=True, stream=True, batch_size=1
+    )
+
+    assert "2 rows normalized, 0 created, 1 updated, 0 unchanged" in capsys.readouterr().out
+    tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
+    assert float(tulsa.retail_price) == pytest.approx(3.3)
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_delta_mode_records_history_and_bumps_version(
+    tmp_path: Path, capsys
+) -> None:
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+    csv_path = tmp_path / "stations.csv"
+    first_feed = "\n".join(
+        [
+            header,
+            "1,Stop A,100 Main St,Tulsa,OK,10,3.500",
+            "4,Stop C,300 Lake Dr,Austin,TX,30,3.900",
+        ]
+    )
+    csv_path.write_text(first_feed, encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path), delta=True)
+    assert get_station_data_version() == 1
+    assert FuelPriceHistory.objects.count() == 2
+
+    capsys.readouterr()
+    call_command("import_fuel_prices", csv_path=str(csv_path), delta=True)
+    assert "2 unchanged, 0 price changes recorded" in capsys.readouterr().out
+    assert get_station_data_version() == 1
+    assert FuelPriceHistory.objects.count() == 2
+
+    csv_path.write_text(first_feed.replace("3.500", "3.4999"), encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path), delta=True)
+    assert get_station_data_version() == 1
+
+    csv_path.write_text(first_feed.replace("3.500", "3.350"), encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path), delta=True, stream=True)
+
+    assert get_station_data_version() == 2
+    tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
+    assert float(tulsa.retail_price) == pytest.approx(3.35)
+    prices = [float(entry.retail_price) for entry in tulsa.price_history.order_by("batch_id")]
+    assert prices == pytest.approx([3.5, 3.35])
+    latest_batch = FuelImportBatch.objects.order_by("-pk").first()
+    assert latest_batch is not None
+    assert latest_batch.rows_changed == 1
+    assert latest_batch.station_data_version == 2
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_streamed_delta_keeps_one_history_row_and_protects_it(
+    tmp_path: Path,
+) -> None:
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+    csv_path = tmp_path / "stations.csv"
+    csv_path.write_text(f"{header}\n1,Stop A,100 Main St,Tulsa,OK,10,3.500", encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path), delta=True)
+
+    csv_path.write_text(
+        "\n".join(
+            [
+                header,
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.400",
+                "1,Stop A,100 Main St,Tulsa,OK,10,3.300",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    call_command(
+        "import_fuel_prices", csv_path=str(csv_path), delta=True, stream=True, batch_size=1
+    )
+
+    tulsa = FuelStation.objects.get(canonical_key="100 MAIN ST|TULSA|OK")
+    prices = [float(entry.retail_price) for entry in tulsa.price_history.order_by("batch_id")]
+    assert prices == pytest.approx([3.5, 3.3])
+
+    with pytest.raises(CommandError, match="--delta"):
+        call_command("import_fuel_prices", csv_path=str(csv_path), delta=True, replace=True)
+    with pytest.raises(CommandError, match="price history"):
+        call_command("import_fuel_prices", csv_path=str(csv_path), replace=True)
+    assert FuelPriceHistory.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_fuel_prices_streamed_replace_rejects_bad_csv_before_deleting(
+    tmp_path: Path,
+) -> None:
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price"
+    csv_path = tmp_path / "stations.csv"
+    csv_path.write_text(f"{header}\n1,Stop A,100 Main St,Tulsa,OK,10,3.500", encoding="utf-8")
+    call_command("import_fuel_prices", csv_path=str(csv_path))
+
+    bad_path = tmp_path / "bad.csv"
+    bad_path.write_text("OPIS Truckstop ID,Address\n2,200 River Rd", encoding="utf-8")
+    for mode in ({}, {"upsert": True}):
+        with pytest.raises(CommandError, match="Missing expected columns"):
+            call_command(
+                "import_fuel_prices", csv_path=str(bad_path), stream=True, replace=True, **mode
+            )
+
+    assert list(FuelStation.objects.values_list("canonical_key", flat=True)) == [
+        "100 MAIN ST|TULSA|OK"
+    ]
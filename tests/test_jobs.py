@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from route_planner.exceptions import NoFeasibleFuelPlanError
+from route_planner.models import StoredPlanJob
+from route_planner.services.jobs import PlanJob, PlanJobQueue
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plan_jobs_run_off_the_request_thread_and_long_poll(api_client, mocker) -> None:
+    job_queue = PlanJobQueue(workers=1, max_queued=1)
+    mocker.patch("route_planner.services.jobs._plan_job_queue", job_queue)
+    release = threading.Event()
+
+    def plan(route_request, plan_id=None):
+        release.wait(5)
+        if route_request.finish_location == "Nowhere, TX":
+            raise NoFeasibleFuelPlanError("Gap too long")
+        return mocker.Mock(model_dump_json=lambda: '{"ok": true}')
+
+    planner = mocker.Mock()
+    planner.plan.side_effect = plan
+    mocker.patch("route_planner.views.get_route_planner", return_value=planner)
+
+    def submit(finish_location: str):
+        return api_client.post(
+            "/api/v1/route-plan/jobs",
+            data=json.dumps({"start_location": "Austin, TX", "finish_location": finish_location}),
+            content_type="application/json",
+        )
+
+    first = submit("Houston, TX")
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    for _ in range(100):
+        if job_queue.running:
+            break
+        time.sleep(0.01)
+    second = submit("Nowhere, TX")
+    assert second.status_code == 202
+    assert submit("Dallas, TX").status_code == 503
+
+    pending = api_client.get(first["Location"])
+    assert pending.json()["status"] == "running"
+    job_id = pending.json()["job_id"]
+    # Another web process sees the same job, and a poll past the waiter limit does not block.
+    assert PlanJobQueue(max_waiters=0).wait(job_id, 5).status == "running"
+
+    release.set()
+    done = api_client.get(first["Location"], {"wait": 5}).json()
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"ok": True}
+    assert PlanJobQueue().get(job_id).result == b'{"ok": true}'
+    failed = api_client.get(second["Location"], {"wait": 5}).json()
+    assert failed["status"] == "failed"
+    assert failed["error"]["code"] == "no_feasible_plan"
+
+    assert api_client.get("/api/v1/route-plan/jobs/unknown").status_code == 404
+
+
+def test_waiting_pollers_always_leave_a_web_thread_free(settings) -> None:
+    settings.GUNICORN_THREADS = 4
+    settings.PLAN_JOB_MAX_WAITERS = 4
+
+    assert PlanJobQueue().max_waiters == 3
+    assert PlanJobQueue(max_waiters=2).max_waiters == 2
+    settings.GUNICORN_THREADS = 1
+    assert PlanJobQueue().max_waiters == 0
+
+
+@pytest.mark.django_db
+def test_jobs_left_unfinished_by_an_exited_process_are_failed_on_startup(
+    api_client, settings
+) -> None:
+    settings.PLAN_JOB_STALE_SECONDS = 60
+    exited = PlanJobQueue()
+    for job_id in ("lost", "fresh"):
+        exited._store(PlanJob(job_id=job_id, kind="plan", status="running", submitted_at=0.0))
+    StoredPlanJob.objects.filter(job_id="lost").update(
+        updated_at=timezone.now() - timedelta(seconds=120)
+    )
+
+    PlanJobQueue()._start_workers()
+
+    failed = api_client.get("/api/v1/route-plan/jobs/lost").json()
+    assert failed["status"] == "failed"
+    assert failed["error"]["code"] == "job_failed"
+    assert PlanJobQueue().get("fresh").status == "running"
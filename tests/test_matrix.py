@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import pytest
+
+from route_planner.exceptions import InvalidLocationError
+from route_planner.models import FuelStation
+from route_planner.schemas import RouteMatrixRequest
+from route_planner.services.matrix import RouteMatrixService
+from route_planner.services.osrm import METERS_TO_MILES, OsrmClient
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.price_surface import PriceSurface
+from route_planner.services.station_index import StationSnapshot
+from route_planner.services.types import GeoPoint, RouteData, TableData
+
+
+def _table(sources: list[GeoPoint], destinations: list[GeoPoint]) -> TableData:
+    distances = [
+        [100.0 * (row + 1) + column for column in range(len(destinations))]
+        for row in range(len(sources))
+    ]
+    return TableData(
+        distances_miles=distances,
+        durations_seconds=[[value * 60.0 for value in row] for row in distances],
+    )
+
+
+@pytest.mark.django_db
+def test_matrix_estimates_pairs_from_table_and_plans_detail_pairs(mocker, geocode) -> None:
+    FuelStation.objects.create(
+        opis_truckstop_id=1,
+        truckstop_name="Station",
+        address="1 Main",
+        city="Austin",
+        state="TX",
+        retail_price=3.0,
+        canonical_key="1 MAIN|AUSTIN|TX",
+        latitude=30.5,
+        longitude=-96.5,
+    )
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.side_effect = geocode
+    osrm_client = mocker.Mock()
+    osrm_client.table.side_effect = _table
+    osrm_client.route.return_value = RouteData(
+        coordinates=[(-97.7431, 30.2672), (-95.3698, 29.7604)],
+        distance_miles=160.0,
+        duration_seconds=9600.0,
+    )
+    station_selector = mocker.Mock()
+    station_selector.select_candidate_stations.return_value = []
+    planner = RoutePlannerService(
+        geocoding_client=geocoding_client,
+        osrm_client=osrm_client,
+        station_selector=station_selector,
+    )
+    request = RouteMatrixRequest(
+        origins=["Austin, TX", "Nowhere, ZZ"],
+        destinations=["Houston, TX", "Dallas, TX"],
+        detail=[{"origin": 0, "destination": 0}],
+        vehicle_mpg=10,
+    )
+
+    result = RouteMatrixService(
+        planner, price_surface=PriceSurface(StationSnapshot.load(version=0))
+    ).estimate(request)
+
+    assert osrm_client.table.call_count == 1
+    assert osrm_client.route.call_count == 1
+    assert result.origins[1] is None
+    austin_houston, austin_dallas, *unresolved = result.cells
+    assert austin_houston.distance_miles == 100.0
+    assert austin_houston.price_per_gallon == pytest.approx(3.0)
+    assert austin_houston.fuel_cost == pytest.approx(30.0)
+    assert austin_houston.plan is not None
+    assert austin_dallas.distance_miles == 101.0
+    assert austin_dallas.plan is None
+    assert all(isinstance(cell.error, InvalidLocationError) for cell in unresolved)
+
+
+def test_osrm_table_splits_large_matrices_into_blocks(mocker, settings) -> None:
+    settings.OSRM_TABLE_MAX_COORDINATES = 4
+
+    def fake_get(endpoint: str, params: dict[str, str], timeout: float):
+        sources = params["sources"].split(";")
+        destinations = params["destinations"].split(";")
+        points = endpoint.rsplit("/", 1)[1].split(";")
+        assert len(points) <= 4
+        response = mocker.Mock()
+        response.json.return_value = {
+            "code": "Ok",
+            "distances": [
+                [float(points[int(destination)].split(",")[0]) for destination in destinations]
+                for _ in sources
+            ],
+            "durations": [[1.0 for _ in destinations] for _ in sources],
+        }
+        return response
+
+    get = mocker.patch("route_planner.services.osrm.httpx.get", side_effect=fake_get)
+    sources = [GeoPoint(latitude=30.0, longitude=float(index)) for index in range(3)]
+    destinations = [GeoPoint(latitude=31.0, longitude=float(10 + index)) for index in range(5)]
+
+    table = OsrmClient().table(sources, destinations)
+
+    assert get.call_count == 6
+    assert table.distances_miles[2] == [
+        pytest.approx((10 + index) * METERS_TO_MILES) for index in range(5)
+    ]
+
+
+def test_osrm_round_trips_read_paired_legs_from_blocked_tables(mocker, settings) -> None:
+    settings.OSRM_TABLE_MAX_COORDINATES = 4
+
+    def fake_get(endpoint: str, params: dict[str, str], timeout: float):
+        points = [
+            tuple(float(value) for value in pair.split(","))
+            for pair in endpoint.rsplit("/", 1)[1].split(";")
+        ]
+        assert len(points) <= 4
+        assert params["sources"] == params["destinations"]
+        response = mocker.Mock()
+        response.json.return_value = {
+            "code": "Ok",
+            "distances": [
+                [None if 99.0 in (start[0], end[0]) else abs(end[0] - start[0]) for end in points]
+                for start in points
+            ],
+            "durations": [[10.0 for _ in points] for _ in points],
+        }
+        return response
+
+    get = mocker.patch("route_planner.services.osrm.httpx.get", side_effect=fake_get)
+    origins = [GeoPoint(latitude=30.0, longitude=float(index)) for index in range(3)]
+    destinations = [
+        GeoPoint(latitude=30.1, longitude=longitude) for longitude in (1000.0, 2000.0, 99.0)
+    ]
+
+    trips = OsrmClient().round_trips(origins, destinations)
+
+    assert get.call_count == 2
+    assert trips[0] == (pytest.approx(2000 * METERS_TO_MILES), 20.0)
+    assert trips[1] == (pytest.approx(2 * 1999 * METERS_TO_MILES), 20.0)
+    assert trips[2] is None
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+from dataclasses import replace
+
 import pytest
 
-from route_planner.exceptions import NoFeasibleFuelPlanError
-from route_planner.services.optimization import optimize_fuel_plan
-from route_planner.services.types import CandidateStation
+from route_planner.exceptions import NoFeasibleFuelPlanError, StaleStationDataError
+from route_planner.services.optimization import (
+    choose_fuel_purchases,
+    fuel_plan_result,
+    optimize_fuel_plan,
+)
+from route_planner.services.station_selection import candidate_points, load_candidate_stations
+from route_planner.services.types import CandidateSet, CandidateStation, GeoPoint
 
 
 def _station(station_id: int, milepost: float, price: float) -> CandidateStation:
@@ -104,3 +111,85 @@ def test_max_range_override_restricts_reachability() -> None:
             max_range_miles=150.0,
             optimizer="baseline",
         )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("optimizer", ["baseline", "ortools"])
+def test_candidate_set_plans_match_lists_and_hydrate_only_chosen_stops_in_one_query(
+    optimizer: str, django_assert_num_queries
+) -> None:
+    from route_planner.models import FuelStation
+
+    candidates = []
+    for index, (milepost, price) in enumerate([(60.0, 4.1), (120.0, 3.8), (180.0, 3.4)]):
+        station = FuelStation.objects.create(
+            opis_truckstop_id=index,
+            truckstop_name=f"Station {index}",
+            address="123 Test St",
+            city="Test City",
+            state="TX",
+            retail_price=price,
+            canonical_key=f"{index}|TEST CITY|TX",
+            latitude=30.0,
+            longitude=-97.0,
+        )
+        candidates.append(
+            replace(_station(station.id, milepost, price), station_name=station.truckstop_name)
+        )
+    arguments = {
+        "route_distance_miles": 330.0,
+        "start_fuel_gallons": 9.0,
+        "mpg": 10.0,
+        "tank_capacity_gallons": 50.0,
+        "max_range_miles": 500.0,
+        "optimizer": optimizer,
+    }
+
+    from_list = optimize_fuel_plan(candidates=candidates, **arguments)
+    candidate_set = CandidateSet.from_stations(candidates)
+    with django_assert_num_queries(0):
+        plan = choose_fuel_purchases(candidate_set, **arguments)
+    with django_assert_num_queries(1):
+        stations = load_candidate_stations(candidate_set, plan.indexes)
+    from_set = fuel_plan_result(candidate_set, plan, stations)
+
+    assert from_set == from_list
+    assert from_set.stops
+
+
+@pytest.mark.django_db
+def test_candidates_whose_station_was_deleted_do_not_crash_planning() -> None:
+    from route_planner.models import FuelStation
+
+    kept, deleted = (
+        FuelStation.objects.create(
+            opis_truckstop_id=index,
+            truckstop_name=f"Station {index}",
+            address="123 Test St",
+            city="Test City",
+            state="TX",
+            retail_price=3.5,
+            canonical_key=f"{index}|TEST CITY|TX",
+            latitude=30.0 + index,
+            longitude=-97.0,
+        )
+        for index in range(2)
+    )
+    candidates = CandidateSet.from_stations(
+        [_station(kept.id, 100.0, 3.9), _station(deleted.id, 200.0, 3.0)]
+    )
+    deleted.delete()
+
+    assert candidate_points(candidates) == [GeoPoint(latitude=30.0, longitude=-97.0), None]
+    plan = choose_fuel_purchases(
+        candidates,
+        route_distance_miles=300.0,
+        start_fuel_gallons=12.0,
+        mpg=10.0,
+        tank_capacity_gallons=50.0,
+        max_range_miles=500.0,
+        optimizer="baseline",
+    )
+    assert 1 in plan.indexes
+    with pytest.raises(StaleStationDataError):
+        load_candidate_stations(candidates, plan.indexes)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from array import array
+
+import pytest
+
+from route_planner.exceptions import NoFeasibleFuelPlanError
+from route_planner.models import FuelStation
+from route_planner.schemas import RoutePlanRequest
+from route_planner.services.detours import detour_price_adjustments
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.station_selection import StationSelector
+from route_planner.services.types import CandidateSet, GeoPoint, RouteData
+
+
+@pytest.mark.django_db
+def test_auto_widen_widens_only_the_gap_and_projects_once(mocker, create_station) -> None:
+    create_station(1, 30.0, -99.0, 3.5)
+    create_station(2, 30.22, -95.0, 3.4)  # ~15 miles off route, alone in the gap
+    create_station(3, 30.0, -93.0, 3.6)
+    create_station(4, 30.0, -91.0, 3.7)
+    create_station(5, 30.22, -99.5, 1.0)  # as far off route, but not in a gap
+    selector = StationSelector(backend="database")
+    stations_in_bbox = mocker.spy(selector, "_stations_in_bbox")
+    osrm_client = mocker.Mock()
+    osrm_client.route_through.side_effect = lambda points: RouteData(
+        coordinates=[(point.longitude, point.latitude) for point in points],
+        distance_miles=600.0,
+        duration_seconds=36000.0,
+    )
+    planner = RoutePlannerService(
+        geocoding_client=mocker.Mock(), osrm_client=osrm_client, station_selector=selector
+    )
+    request = RoutePlanRequest(
+        start_location="Start, TX",
+        finish_location="Finish, LA",
+        vehicle_mpg=10,
+        tank_capacity_gallons=25,
+        max_range_miles=250,
+        max_corridor_miles=20,
+    )
+
+    response = planner.plan_route(
+        request,
+        GeoPoint(latitude=30.0, longitude=-100.0),
+        GeoPoint(latitude=30.0, longitude=-90.0),
+        RouteData(
+            coordinates=[(-100.0, 30.0), (-90.0, 30.0)],
+            distance_miles=599.0,
+            duration_seconds=36000.0,
+        ),
+    )
+
+    stop_names = {stop.station_name for stop in response.stops}
+    assert "Station 2" in stop_names
+    assert "Station 5" not in stop_names
+    assert response.assumptions["widest_corridor_miles"] == 16.0
+    assert stations_in_bbox.call_count == 1
+
+    request = request.model_copy(update={"max_corridor_miles": 12.0})
+    with pytest.raises(NoFeasibleFuelPlanError):
+        planner.plan_route(
+            request,
+            GeoPoint(latitude=30.0, longitude=-100.0),
+            GeoPoint(latitude=30.0, longitude=-90.0),
+            RouteData(
+                coordinates=[(-100.0, 30.0), (-90.0, 30.0)],
+                distance_miles=599.0,
+                duration_seconds=36000.0,
+            ),
+        )
+
+
+@pytest.mark.django_db
+def test_detour_aware_plan_prices_in_the_drive_off_route(mocker, settings, create_station) -> None:
+    settings.DETOUR_COST_PER_HOUR = 60.0
+    create_station(1, 30.0, -98.0, 3.50)
+    create_station(2, 30.1, -98.0, 3.45)  # ~7 miles off route, slightly cheaper
+    osrm_client = mocker.Mock()
+    osrm_client.route_through.side_effect = lambda points: RouteData(
+        coordinates=[(point.longitude, point.latitude) for point in points],
+        distance_miles=600.0,
+        duration_seconds=36000.0,
+    )
+    osrm_client.table_max_coordinates = 100
+    osrm_client.round_trips.side_effect = lambda origins, destinations: [
+        (
+            2 * abs(destination.latitude - 30.0) * 69 * 1.3,
+            2 * abs(destination.latitude - 30.0) * 3600,
+        )
+        for destination in destinations
+    ]
+    planner = RoutePlannerService(
+        geocoding_client=mocker.Mock(),
+        osrm_client=osrm_client,
+        station_selector=StationSelector(backend="database"),
+    )
+    route = RouteData(
+        coordinates=[(-100.0, 30.0), (-96.0, 30.0)],
+        distance_miles=240.0,
+        duration_seconds=14400.0,
+    )
+    request = RoutePlanRequest(
+        start_location="Start, TX",
+        finish_location="Finish, TX",
+        start_fuel_percent=50,
+        vehicle_mpg=10,
+        tank_capacity_gallons=25,
+        max_range_miles=250,
+    )
+    start = GeoPoint(latitude=30.0, longitude=-100.0)
+    finish = GeoPoint(latitude=30.0, longitude=-96.0)
+
+    plain = planner.plan_route(request, start, finish, route)
+    detour_aware = planner.plan_route(
+        request.model_copy(update={"detour_aware": True}), start, finish, route
+    )
+
+    assert [stop.station_name for stop in plain.stops] == ["Station 2"]
+    assert [stop.station_name for stop in detour_aware.stops] == ["Station 1"]
+    assert detour_aware.stops[0].price_per_gallon == 3.5
+    assert detour_aware.assumptions["detour_cost_per_hour"] == 60.0
+    osrm_client.round_trips.assert_called_once()
+    origins, destinations = osrm_client.round_trips.call_args.args
+    assert len(origins) == len(destinations) == 2
+    assert all(origin.latitude == pytest.approx(30.0) for origin in origins)
+
+
+@pytest.mark.django_db
+def test_detour_pricing_fits_one_table_request_and_calibrates_the_rest(
+    mocker, settings, create_station
+) -> None:
+    settings.DETOUR_COST_PER_HOUR = 36.0
+    for station_id, latitude in ((1, 30.01), (2, 30.02), (3, 30.01)):
+        create_station(station_id, latitude, -98.0, 3.0)
+    station_ids = list(
+        FuelStation.objects.order_by("opis_truckstop_id").values_list("id", flat=True)
+    )
+    candidates = CandidateSet(
+        station_ids=array("q", station_ids),
+        mileposts=array("d", [100.0, 110.0, 120.0]),
+        prices=array("d", [3.0, 3.0, 3.5]),
+        offsets_miles=array("d", [1.0, 2.0, 1.0]),
+    )
+    osrm_client = mocker.Mock()
+    osrm_client.table_max_coordinates = 4
+    osrm_client.round_trips.return_value = [(3.0, 360.0), (6.0, 720.0)]
+
+    adjustments = detour_price_adjustments(
+        candidates,
+        PreparedRoute.build([(-100.0, 30.0), (-96.0, 30.0)]),
+        osrm_client,
+        mpg=10.0,
+        tank_capacity_gallons=25.0,
+    )
+
+    osrm_client.round_trips.assert_called_once()
+    origins, destinations = osrm_client.round_trips.call_args.args
+    assert len(origins) == len(destinations) == 2
+    assert [point.latitude for point in destinations] == [30.01, 30.02]
+    # The third candidate is estimated at the measured 1.5x road factor and 30 mph.
+    assert adjustments == pytest.approx(
+        [
+            (3.0 / 10 * 3.0 + 360 * 0.01) / 25,
+            (6.0 / 10 * 3.0 + 720 * 0.01) / 25,
+            (3.0 / 10 * 3.5 + 360 * 0.01) / 25,
+        ]
+    )
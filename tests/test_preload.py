@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import gc
+
+import pytest
+
+from route_planner import preload, views
+from route_planner.services.station_index import StationSnapshotProvider
+
+
+@pytest.mark.django_db
+def test_preload_builds_shared_station_state_and_freezes_it(mocker, create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.10)
+    provider = StationSnapshotProvider(check_interval_seconds=3600)
+    mocker.patch(
+        "route_planner.services.station_clusters.get_station_snapshot_provider",
+        return_value=provider,
+    )
+    mocker.patch(
+        "route_planner.services.price_surface.get_station_snapshot_provider",
+        return_value=provider,
+    )
+    mocker.patch("route_planner.views._planner_service", None)
+    close_all = mocker.patch.object(preload.connections, "close_all")
+
+    try:
+        preload.preload_planner_state()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+    assert views._planner_service is not None
+    assert provider.current().derived["station_clusters"].snapshot is provider.current()
+    assert provider.current().derived["price_surface"].snapshot is provider.current()
+    assert len(provider.current()) == 1
+    close_all.assert_called_once()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import random
+from itertools import pairwise
+
+import pytest
+
+from route_planner.services.geo import haversine_miles, lon_lat_to_miles_xy
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.types import GeoPoint
+
+
+def test_prepared_route_projection_matches_scanning_every_segment() -> None:
+    rng = random.Random(5)
+    route = [(-100.0 + index * 0.05, 35.0 + 0.8 * ((index % 40) / 40)) for index in range(300)]
+    route[120] = route[119]
+    stations = [
+        (index, rng.uniform(34.5, 36.3), rng.uniform(-100.5, -84.5), 3.0) for index in range(400)
+    ]
+
+    def scan(longitude: float, latitude: float) -> tuple[float, float]:
+        best_distance, best_milepost, cumulative = float("inf"), 0.0, 0.0
+        for (start_lon, start_lat), (end_lon, end_lat) in pairwise(route):
+            segment_miles = haversine_miles(start_lat, start_lon, end_lat, end_lon)
+            ref_lat = (start_lat + end_lat) / 2.0
+            start_x, start_y = lon_lat_to_miles_xy(start_lon, start_lat, ref_lat)
+            end_x, end_y = lon_lat_to_miles_xy(end_lon, end_lat, ref_lat)
+            point_x, point_y = lon_lat_to_miles_xy(longitude, latitude, ref_lat)
+            vector_x, vector_y = end_x - start_x, end_y - start_y
+            norm_sq = vector_x * vector_x + vector_y * vector_y
+            if norm_sq:
+                t = ((point_x - start_x) * vector_x + (point_y - start_y) * vector_y) / norm_sq
+                t = max(0.0, min(1.0, t))
+                distance = (
+                    (point_x - (start_x + t * vector_x)) ** 2
+                    + (point_y - (start_y + t * vector_y)) ** 2
+                ) ** 0.5
+                if distance < best_distance:
+                    best_distance, best_milepost = distance, cumulative + t * segment_miles
+            cumulative += segment_miles
+        return best_distance, best_milepost
+
+    expected = {}
+    for station_id, latitude, longitude, _ in stations:
+        distance, milepost = scan(longitude, latitude)
+        if distance <= 8.0:
+            expected[station_id] = (distance, milepost)
+
+    projected = {
+        station[0]: (distance, milepost)
+        for station, distance, milepost in PreparedRoute.build(route).project(stations, 8.0)
+    }
+
+    assert projected.keys() == expected.keys()
+    assert len(expected) > 20
+    for station_id, (distance, milepost) in expected.items():
+        assert projected[station_id] == pytest.approx((distance, milepost), abs=1e-9)
+
+
+def test_locate_prefers_the_pass_after_the_last_known_milepost() -> None:
+    out = [(-100.0 + index * 0.1, 35.0) for index in range(21)]
+    route = PreparedRoute.build([*out, *reversed(out[:-1])])
+    half = route.cumulative_miles[-1] / 2
+    point = GeoPoint(latitude=35.01, longitude=-99.5)
+
+    _, outbound = route.locate(point, 5.0)
+    _, inbound = route.locate(point, 5.0, after_milepost=half + 10.0)
+    _, fallback = route.locate(point, 5.0, after_milepost=2 * half)
+
+    assert outbound == pytest.approx(half / 4, abs=0.1)
+    assert inbound == pytest.approx(half * 7 / 4, abs=0.1)
+    assert fallback == pytest.approx(outbound)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import pytest
+
+from route_planner.models import FuelStation
+from route_planner.services.data_version import bump_station_data_version
+from route_planner.services.price_surface import get_price_surface
+from route_planner.services.station_clusters import StationClusterIndex, get_station_cluster_index
+from route_planner.services.station_index import StationSnapshotProvider
+from route_planner.services.station_selection import StationSelector
+from route_planner.services.types import BoundingBox
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_provider_swaps_in_rebuilt_snapshot_after_version_bump(create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    bump_station_data_version()
+    provider = StationSnapshotProvider(check_interval_seconds=0)
+
+    first = provider.current()
+    assert first.version == 1
+    assert len(first) == 1
+
+    create_station(2, 30.5, -97.2, 3.1)
+    bump_station_data_version()
+
+    assert provider.current() is first
+    assert provider._rebuild_thread is not None
+    provider._rebuild_thread.join(timeout=5)
+
+    second = provider.current()
+    assert second.version == 2
+    assert len(second) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_derived_indexes_are_rebuilt_in_the_background_with_the_snapshot(
+    mocker, create_station
+) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    bump_station_data_version()
+    provider = StationSnapshotProvider(check_interval_seconds=0)
+    mocker.patch(
+        "route_planner.services.station_clusters.get_station_snapshot_provider",
+        return_value=provider,
+    )
+    mocker.patch(
+        "route_planner.services.price_surface.get_station_snapshot_provider",
+        return_value=provider,
+    )
+    first = get_station_cluster_index()
+    first_surface = get_price_surface()
+
+    create_station(2, 30.5, -97.2, 3.1)
+    bump_station_data_version()
+
+    assert get_station_cluster_index() is first
+    assert get_price_surface() is first_surface
+    assert provider._rebuild_thread is not None
+    provider._rebuild_thread.join(timeout=5)
+
+    rebuilt = provider._snapshot
+    assert rebuilt is not None
+    assert rebuilt.version == 2
+    assert "station_clusters" in rebuilt.derived
+    assert get_station_cluster_index() is rebuilt.derived["station_clusters"]
+    assert get_price_surface() is rebuilt.derived["price_surface"]
+    assert get_price_surface().national_average == pytest.approx(3.3)
+
+
+@pytest.mark.django_db
+def test_snapshot_bbox_lookup_filters_latitude_and_longitude(create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    create_station(2, 30.1, -90.0, 3.1)
+    create_station(3, 35.0, -97.0, 3.3)
+
+    snapshot = StationSnapshotProvider(check_interval_seconds=0).current()
+    rows = list(
+        snapshot.within(
+            BoundingBox(min_latitude=29.5, max_latitude=30.5, min_longitude=-98, max_longitude=-96)
+        )
+    )
+
+    assert [row[0] for row in rows] == [FuelStation.objects.get(opis_truckstop_id=1).id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("backend", ["memory", "rtree"])
+def test_indexed_backends_select_same_candidates_as_database(
+    backend: str, mocker, settings, create_station
+) -> None:
+    settings.CANDIDATE_CACHE_TTL_SECONDS = 0
+    create_station(1, 30.0, -97.0, 3.5)
+    create_station(2, 30.02, -96.5, 3.1)
+    create_station(3, 31.0, -96.5, 3.3)
+    mocker.patch(
+        "route_planner.services.station_selection.get_station_snapshot_provider",
+        return_value=StationSnapshotProvider(check_interval_seconds=0),
+    )
+    route = [(-97.2, 30.0), (-96.0, 30.0)]
+
+    database_selector = StationSelector(backend="database")
+    index_selector = StationSelector(backend=backend)
+    database_lookup = mocker.spy(database_selector, "_stations_in_bbox")
+    index_lookup = mocker.spy(index_selector, "_stations_in_bbox")
+
+    from_database = database_selector.select_candidate_stations(route, 8.0)
+    from_index = index_selector.select_candidate_stations(route, 8.0)
+
+    assert database_lookup.call_count == 1
+    assert index_lookup.call_count == 1
+    assert from_index == from_database
+    assert len(from_index) == 2
+
+
+@pytest.mark.django_db
+def test_rtree_tracks_station_inserts_geocodes_and_deletes(create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    FuelStation.objects.create(
+        opis_truckstop_id=2,
+        truckstop_name="Pending",
+        address="2 Main",
+        city="Dallas",
+        state="TX",
+        retail_price=3.2,
+        canonical_key="2 MAIN|DALLAS|TX",
+    )
+    bbox = BoundingBox(min_latitude=25, max_latitude=35, min_longitude=-100, max_longitude=-90)
+    selector = StationSelector(backend="rtree")
+
+    assert [row[0] for row in selector._stations_in_bbox(bbox)] == [
+        FuelStation.objects.get(opis_truckstop_id=1).id
+    ]
+
+    pending = FuelStation.objects.get(opis_truckstop_id=2)
+    pending.latitude = 32.8
+    pending.longitude = -96.8
+    pending.save(update_fields=["latitude", "longitude"])
+    FuelStation.objects.filter(opis_truckstop_id=1).delete()
+
+    assert [row[0] for row in selector._stations_in_bbox(bbox)] == [pending.id]
+
+
+@pytest.mark.django_db
+def test_cluster_index_merges_nearby_stations_and_caps_features(create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    create_station(2, 30.01, -97.01, 3.1)
+    create_station(3, 40.0, -80.0, 3.3)
+    snapshot = StationSnapshotProvider(check_interval_seconds=0).current()
+    index = StationClusterIndex(snapshot)
+    bbox = BoundingBox(min_latitude=20, max_latitude=50, min_longitude=-125, max_longitude=-65)
+
+    zoom, clusters = index.query(bbox, zoom=4, max_features=10)
+    assert zoom == 4
+    assert sorted(cluster.count for cluster in clusters) == [1, 2]
+    texas = next(cluster for cluster in clusters if cluster.count == 2)
+    assert texas.min_price == pytest.approx(3.1)
+    assert texas.avg_price == pytest.approx(3.3)
+
+    zoom, stations = index.query(bbox, zoom=15, max_features=10)
+    assert zoom == 15
+    assert {station.name for station in stations} == {"Station 1", "Station 2", "Station 3"}
+
+    zoom, clusters = index.query(bbox, zoom=15, max_features=1)
+    assert len(clusters) == 1
+    assert clusters[0].count == 2
+
+
+@pytest.mark.django_db
+def test_candidate_selection_is_cached_until_data_version_changes(mocker, create_station) -> None:
+    create_station(1, 30.0, -97.0, 3.5)
+    selector = StationSelector(backend="database")
+    stations_in_bbox = mocker.spy(selector, "_stations_in_bbox")
+    route = [(-97.2, 30.0), (-96.0, 30.0)]
+
+    first = selector.select_candidate_stations(route, 8.0)
+    assert selector.select_candidate_stations(route, 8.0) == first
+    assert stations_in_bbox.call_count == 1
+
+    bump_station_data_version()
+    selector.select_candidate_stations(route, 8.0)
+    assert stations_in_bbox.call_count == 2
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import json
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from route_planner.models import FuelStation, StoredTripPlan
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.prepared_route import PreparedRoute
+from route_planner.services.station_selection import StationSelector
+from route_planner.services.trips import TripPlan, TripStore
+from route_planner.services.types import CandidateSet, GeocodeResult, GeoPoint, RouteData
+
+
+def _trip(distance_miles: float) -> TripPlan:
+    return TripPlan(
+        route=PreparedRoute.build([(-100.0, 35.0), (-99.0, 35.0)]),
+        candidates=CandidateSet(
+            station_ids=array("q"),
+            mileposts=array("d"),
+            prices=array("d"),
+            offsets_miles=array("d"),
+        ),
+        finish=GeoPoint(latitude=35.0, longitude=-99.0),
+        route_distance_miles=distance_miles,
+        route_duration_seconds=3600.0,
+        vehicle_mpg=10.0,
+        tank_capacity_gallons=50.0,
+        max_range_miles=500.0,
+        corridor_miles=8.0,
+        optimizer="baseline",
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_trip_saves_all_land_without_locking_errors() -> None:
+    store = TripStore()
+
+    def save(index: int) -> None:
+        try:
+            store.save(f"plan-{index % 4}", _trip(float(index)))
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(save, range(32)))
+
+    assert StoredTripPlan.objects.count() == 4
+    assert {store.get(f"plan-{index}").route_distance_miles for index in range(4)} <= {
+        float(index) for index in range(32)
+    }
+
+
+@pytest.mark.django_db
+def test_expired_trips_are_purged_outside_of_saves() -> None:
+    store = TripStore()
+    store.save("old", _trip(1.0))
+    StoredTripPlan.objects.filter(plan_id="old").update(
+        expires_at=timezone.now() - timedelta(seconds=1)
+    )
+
+    store.save("new", _trip(2.0))
+
+    assert StoredTripPlan.objects.count() == 2
+    assert TripStore.purge_expired() == 1
+    assert list(StoredTripPlan.objects.values_list("plan_id", flat=True)) == ["new"]
+
+
+@pytest.mark.django_db
+def test_replan_reuses_trip_candidates_from_current_position(api_client, mocker) -> None:
+    for index, longitude in enumerate([-98.0, -95.0, -92.0]):
+        FuelStation.objects.create(
+            opis_truckstop_id=index,
+            truckstop_name=f"Station {index}",
+            address=f"{index} Interstate",
+            city="City",
+            state="OK",
+            retail_price=3.0 + index * 0.1,
+            canonical_key=f"{index} INTERSTATE|CITY|OK",
+            latitude=35.01,
+            longitude=longitude,
+        )
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.side_effect = [
+        GeocodeResult(point=GeoPoint(latitude=35.0, longitude=-100.0), country_code="us"),
+        GeocodeResult(point=GeoPoint(latitude=35.0, longitude=-90.0), country_code="us"),
+    ]
+    osrm_client = mocker.Mock()
+    osrm_client.route.return_value = RouteData(
+        coordinates=[(-100.0 + step * 0.1, 35.0) for step in range(101)],
+        distance_miles=566.0,
+        duration_seconds=30_000.0,
+    )
+    osrm_client.route_through.return_value = osrm_client.route.return_value
+    planner = RoutePlannerService(
+        geocoding_client=geocoding_client,
+        osrm_client=osrm_client,
+        station_selector=StationSelector(backend="database"),
+    )
+    mocker.patch("route_planner.views.get_route_planner", return_value=planner)
+
+    plan = api_client.post(
+        "/api/v1/route-plan",
+        data=json.dumps(
+            {
+                "start_location": "Start, OK",
+                "finish_location": "Finish, TN",
+                "start_fuel_percent": 50,
+            }
+        ),
+        content_type="application/json",
+    ).json()
+    select_candidates = mocker.spy(planner.station_selector, "select_candidate_stations")
+    cache.clear()  # as seen from another web process: trips are shared through the database
+
+    replan = api_client.post(
+        "/api/v1/route-plan/replan",
+        data=json.dumps(
+            {
+                "plan_id": plan["plan_id"],
+                "latitude": 35.02,
+                "longitude": -96.0,
+                "current_fuel_percent": 20,
+            }
+        ),
+        content_type="application/json",
+    )
+
+    assert replan.status_code == 200
+    body = replan.json()
+    assert body["plan_id"] == plan["plan_id"]
+    assert body["current_milepost"] == pytest.approx(226.0, abs=2.0)
+    assert body["summary"]["distance_miles"] == pytest.approx(566.0 - body["current_milepost"])
+    assert [stop["station_id"] for stop in body["stops"]] == [
+        FuelStation.objects.get(opis_truckstop_id=1).id
+    ]
+    assert body["route_geojson"]["coordinates"][0] == [-96.0, 35.02]
+    select_candidates.assert_not_called()
+    assert geocoding_client.geocode.call_count == 2
+
+    off_route = api_client.post(
+        "/api/v1/route-plan/replan",
+        data=json.dumps(
+            {
+                "plan_id": plan["plan_id"],
+                "latitude": 40.0,
+                "longitude": -96.0,
+                "current_fuel_percent": 20,
+            }
+        ),
+        content_type="application/json",
+    )
+    unknown = api_client.post(
+        "/api/v1/route-plan/replan",
+        data=json.dumps(
+            {"plan_id": "missing", "latitude": 35.0, "longitude": -96.0, "current_fuel_percent": 20}
+        ),
+        content_type="application/json",
+    )
+    assert off_route.json()["error"]["code"] == "invalid_location"
+    assert unknown.status_code == 404
+    assert unknown.json()["error"]["code"] == "plan_not_found"
+
+
+@pytest.mark.django_db
+def test_replan_on_an_out_and_back_route_snaps_past_the_last_milepost(
+    api_client, mocker, create_station
+) -> None:
+    create_station(1, 35.01, -95.0, 3.0)
+    out = [(-100.0 + step * 0.1, 35.0) for step in range(51)]
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.return_value = GeocodeResult(
+        point=GeoPoint(latitude=35.0, longitude=-100.0), country_code="us"
+    )
+    osrm_client = mocker.Mock()
+    osrm_client.route.return_value = RouteData(
+        coordinates=[*out, *reversed(out[:-1])], distance_miles=566.6, duration_seconds=30_000.0
+    )
+    osrm_client.route_through.return_value = osrm_client.route.return_value
+    planner = RoutePlannerService(
+        geocoding_client=geocoding_client,
+        osrm_client=osrm_client,
+        station_selector=StationSelector(backend="database"),
+    )
+    mocker.patch("route_planner.views.get_route_planner", return_value=planner)
+    plan = api_client.post(
+        "/api/v1/route-plan",
+        data=json.dumps(
+            {
+                "start_location": "Depot, OK",
+                "finish_location": "Depot, OK",
+                "start_fuel_percent": 60,
+            }
+        ),
+        content_type="application/json",
+    ).json()
+
+    def replan(**reading: float) -> dict:
+        return api_client.post(
+            "/api/v1/route-plan/replan",
+            data=json.dumps(
+                {
+                    "plan_id": plan["plan_id"],
+                    "latitude": 35.02,
+                    "longitude": -97.0,
+                    **reading,
+                }
+            ),
+            content_type="application/json",
+        ).json()
+
+    # The same position lies on both legs; only the last milepost tells them apart.
+    outbound = replan(current_fuel_percent=30)
+    inbound = replan(current_fuel_percent=40, last_milepost=300.0)
+
+    assert outbound["current_milepost"] == pytest.approx(170.0, abs=2.0)
+    assert [stop["milepost"] for stop in outbound["stops"]] == [pytest.approx(113.3, abs=2.0)]
+    assert inbound["current_milepost"] == pytest.approx(396.6, abs=2.0)
+    assert inbound["summary"]["distance_miles"] == pytest.approx(170.0, abs=2.0)
+    assert inbound["stops"] == []
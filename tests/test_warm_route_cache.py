@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+
+from route_planner.exceptions import NoRouteFoundError
+from route_planner.services.types import GeocodeResult, GeoPoint, RouteData
+
+
+@pytest.fixture
+def planner(mocker):
+    planner = mocker.Mock()
+    planner.geocoding_client.geocode.side_effect = lambda query, country_code: GeocodeResult(
+        point=GeoPoint(latitude=30.0, longitude=-97.0), country_code=country_code
+    )
+    planner.osrm_client.route.return_value = RouteData(
+        coordinates=[(-97.0, 30.0), (-96.0, 31.0)], distance_miles=90.0, duration_seconds=5400.0
+    )
+    mocker.patch(
+        "route_planner.management.commands.warm_route_cache.RoutePlannerService",
+        return_value=planner,
+    )
+    return planner
+
+
+def test_warm_route_cache_ranks_request_log_lanes(tmp_path: Path, planner, capsys) -> None:
+    log_path = tmp_path / "requests.ndjson"
+    bodies = [
+        {"start_location": "Austin, TX", "finish_location": "Dallas, TX"},
+        {"start_location": "Tulsa, OK", "finish_location": "Denver, CO"},
+        {"start_location": "austin,  tx", "finish_location": "Dallas, TX"},
+        {"start_location": "Austin, TX", "finish_location": "Dallas, TX", "corridor_miles": 12},
+    ]
+    log_path.write_text(
+        "\n".join([*(json.dumps(body) for body in bodies), "not json"]), encoding="utf-8"
+    )
+
+    call_command("warm_route_cache", request_log=str(log_path), top=2, concurrency=2)
+
+    selected = planner.station_selector.select_candidate_stations.call_args_list
+    assert len(selected) == 2
+    assert {call.kwargs["corridor_miles"] for call in selected} == {8.0}
+    assert planner.geocoding_client.geocode.call_args_list[0].args == ("Austin, TX",)
+    output = capsys.readouterr().out
+    assert "Skipped 1 unreadable log lines" in output
+    assert "Lanes warmed: 2, failed: 0" in output
+
+
+def test_warm_route_cache_reports_failed_lanes(tmp_path: Path, planner, capsys) -> None:
+    lanes_path = tmp_path / "lanes.csv"
+    lanes_path.write_text(
+        "start_location,finish_location,corridor_miles\nAustin TX,Dallas TX,5\n", encoding="utf-8"
+    )
+    planner.osrm_client.route.side_effect = NoRouteFoundError("Could not compute route")
+
+    call_command("warm_route_cache", lanes_file=str(lanes_path))
+
+    output = capsys.readouterr().out
+    assert "Austin TX -> Dallas TX: Could not compute route" in output
+    assert "Lanes warmed: 0, failed: 1" in output
+
+
+def test_warm_route_cache_warms_waypoint_lanes_leg_by_leg(tmp_path: Path, planner) -> None:
+    legs = (
+        RouteData(
+            coordinates=[(-97.0, 30.0), (-96.5, 30.5)], distance_miles=45.0, duration_seconds=2700.0
+        ),
+        RouteData(
+            coordinates=[(-96.5, 30.5), (-96.0, 31.0)], distance_miles=45.0, duration_seconds=2700.0
+        ),
+    )
+    planner.osrm_client.route_legs.return_value = RouteData(
+        coordinates=[(-97.0, 30.0), (-96.5, 30.5), (-96.0, 31.0)],
+        distance_miles=90.0,
+        duration_seconds=5400.0,
+        legs=legs,
+    )
+    log_path = tmp_path / "requests.ndjson"
+    body = {
+        "start_location": "Austin, TX",
+        "waypoints": ["Bryan, TX"],
+        "finish_location": "Tyler, TX",
+    }
+    log_path.write_text(json.dumps(body), encoding="utf-8")
+
+    call_command("warm_route_cache", request_log=str(log_path))
+
+    assert planner.osrm_client.route_legs.call_count == 1
+    planner.osrm_client.route.assert_not_called()
+    selected = planner.station_selector.select_candidate_stations.call_args_list
+    assert [call.kwargs["route_coordinates"] for call in selected] == [
+        leg.coordinates for leg in legs
+    ]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from array import array
+from itertools import pairwise
+
+import pytest
+
+from route_planner.schemas import RoutePlanRequest
+from route_planner.services.geo import haversine_miles
+from route_planner.services.osrm import METERS_TO_MILES, OsrmClient
+from route_planner.services.planner import RoutePlannerService
+from route_planner.services.station_selection import CorridorProjection, StationSelector
+from route_planner.services.types import CandidateSet, GeoPoint, RouteData
+
+
+def _straight_route(waypoints: list[GeoPoint]) -> RouteData:
+    return RouteData(
+        coordinates=[(point.longitude, point.latitude) for point in waypoints],
+        distance_miles=sum(
+            haversine_miles(start.latitude, start.longitude, end.latitude, end.longitude)
+            for start, end in pairwise(waypoints)
+        ),
+        duration_seconds=3600.0 * len(waypoints),
+    )
+
+
+def test_route_legs_caches_each_leg_and_joins_them(mocker, locations) -> None:
+    def fake_get(endpoint: str, params: dict[str, str], timeout: float):
+        points = [
+            [float(value) for value in pair.split(",")]
+            for pair in endpoint.rsplit("/", 1)[1].split(";")
+        ]
+        response = mocker.Mock()
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [
+                {
+                    "distance": 1000.0,
+                    "duration": 60.0,
+                    "geometry": {"type": "LineString", "coordinates": points},
+                }
+            ],
+        }
+        return response
+
+    get = mocker.patch("route_planner.services.osrm.httpx.get", side_effect=fake_get)
+    client = OsrmClient()
+    start, pickup, drop = (locations[name] for name in ("start, tx", "pickup, tx", "drop, tx"))
+
+    route = client.route_legs([start, pickup, drop])
+    assert get.call_count == 2
+    assert route.coordinates == [(-100.0, 30.0), (-98.0, 30.0), (-96.0, 30.0)]
+    assert route.distance_miles == pytest.approx(2000 * METERS_TO_MILES)
+    assert [leg.coordinates for leg in route.legs] == [
+        [(-100.0, 30.0), (-98.0, 30.0)],
+        [(-98.0, 30.0), (-96.0, 30.0)],
+    ]
+
+    client.route_legs([start, pickup, locations["other drop, tx"]])
+    assert get.call_count == 3
+
+
+@pytest.mark.django_db
+def test_multi_stop_plan_optimizes_once_over_continuous_mileposts(
+    mocker, create_station, geocode
+) -> None:
+    create_station(1, 30.0, -99.0, 3.5)
+    create_station(2, 30.0, -97.0, 3.4)
+    geocoding_client = mocker.Mock()
+    geocoding_client.geocode.side_effect = geocode
+    osrm_client = OsrmClient()
+    route_through = mocker.patch.object(osrm_client, "route_through", side_effect=_straight_route)
+    selector = StationSelector(backend="database")
+    stations_in_bbox = mocker.spy(selector, "_stations_in_bbox")
+    planner = RoutePlannerService(
+        geocoding_client=geocoding_client, osrm_client=osrm_client, station_selector=selector
+    )
+    request = RoutePlanRequest(
+        start_location="Start, TX",
+        waypoints=["Pickup, TX"],
+        finish_location="Drop, TX",
+        start_fuel_percent=50,
+        vehicle_mpg=10,
+        tank_capacity_gallons=15,
+        max_range_miles=150,
+    )
+
+    response = planner.plan(request)
+
+    leg_miles = response.waypoints[0].milepost
+    assert leg_miles == pytest.approx(119.8, abs=0.5)
+    assert [stop.station_name for stop in response.stops] == ["Station 1", "Station 2"]
+    assert response.stops[1].milepost == pytest.approx(leg_miles + leg_miles / 2, abs=0.5)
+    stop_route = route_through.call_args_list[-1].args[0]
+    assert [(point.latitude, point.longitude) for point in stop_route] == [
+        (30.0, -100.0),
+        (30.0, -99.0),
+        (30.0, -98.0),
+        (30.0, -97.0),
+        (30.0, -96.0),
+    ]
+    assert stations_in_bbox.call_count == 2
+
+    planner.plan(request.model_copy(update={"finish_location": "Other drop, TX"}))
+    assert stations_in_bbox.call_count == 3
+
+
+def test_joined_legs_clamp_mileposts_to_the_next_leg_offset() -> None:
+    # Leg mileposts come from simplified geometry and can overshoot the OSRM leg distance.
+    first = CandidateSet(
+        station_ids=array("q", [1, 2]),
+        mileposts=array("d", [40.0, 101.5]),
+        prices=array("d", [3.5, 3.4]),
+        offsets_miles=array("d", [1.0, 0.5]),
+    )
+    second = CandidateSet(
+        station_ids=array("q", [3]),
+        mileposts=array("d", [0.5]),
+        prices=array("d", [3.3]),
+        offsets_miles=array("d", [2.0]),
+    )
+
+    joined = CandidateSet.joined([(0.0, first), (100.0, second)])
+
+    assert joined.station_ids.tolist() == [1, 2, 3]
+    assert joined.mileposts.tolist() == [40.0, 100.0, 100.5]
+    projection = CorridorProjection.joined(
+        [
+            (0.0, CorridorProjection(rows=[(101.5, 3.4, 2, 0.5)], max_corridor_miles=10.0)),
+            (100.0, CorridorProjection(rows=[(0.5, 3.3, 3, 2.0)], max_corridor_miles=10.0)),
+        ]
+    )
+    assert [row[0] for row in projection.rows] == [100.0, 100.5]